@@ -8,9 +8,2140 @@ This module is used internally by the TemplateProcessorLibrary Robot Framework l
 __version__ = "1.0.0"
 
 import re
+import bisect
+import copy
+import csv
 import datetime
+import functools
+import hashlib
+import itertools
+import json
+import marshal
+import mmap
+import operator
+import random
+import secrets
+import sys
+import time
+from collections import ChainMap, deque
+from collections.abc import Iterable, Iterator as IteratorABC, Mapping, Sequence, Sized
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta
-from typing import Dict, Any
+from pathlib import Path
+from decimal import Decimal, ROUND_HALF_EVEN, localcontext
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+
+# Numeric placeholder arguments may also reference Robot variables, e.g. %%%LOOPINC@${start}@1%%%
+_NUMBER_ARG = r"(?:[-\d.]|\$\{[^{}]*\})+"
+# So may LOOPLIST IDs, e.g. %%%LOOPLIST@${column}%%%
+_LIST_ID_ARG = r"(?:[A-Za-z0-9_]|\$\{[^{}]*\})+"
+
+# Every placeholder is found by this one pattern in a single left-to-right scan.
+# The outer named group of each alternative tells which handler builds the node.
+TOKEN_PATTERN = re.compile(
+    r"%%%(?:"
+    r"(?P<LOOP_END>LOOP@END@(?P<end_name>.+?))"
+    r"|(?P<LOOP>LOOP@(?P<loop_input>.+?)@(?P<loop_name>.+?))"
+    r"|(?P<DATE>(?P<date_operation>NOW|MONTHDELTA)@(?P<date_offset>-?(?:\d+|\$\{[^{}]*\})?)@(?P<date_format>.*?))"
+    r"|(?P<CONSTANT>CONSTANT@(?P<const_id>\S*?))"
+    r"|(?P<INC>INC@(?P<inc_base>" + _NUMBER_ARG + r")@(?P<inc_increment>" + _NUMBER_ARG + r"))"
+    r"|(?P<LOOPINC>LOOPINC@(?P<loopinc_base>" + _NUMBER_ARG + r")@(?P<loopinc_increment>" + _NUMBER_ARG + r"))"
+    r"|(?P<LOOPLIST>LOOPLIST@(?P<list_id>" + _LIST_ID_ARG + r"))"
+    r"|(?P<RANDOM>RANDOM@(?P<random_min>" + _NUMBER_ARG + r")@(?P<random_max>" + _NUMBER_ARG + r"))"
+    r"|(?P<RANDOMLIST>RANDOMLIST@(?P<random_list_id>[A-Za-z0-9_]+))"
+    r"|(?P<INDEX>INDEX)"
+    r"|(?P<NAMED>(?P<ref_loop>[^%@\s]+)\.(?P<ref_attribute>INDEX|VALUE))"
+    r")%%%"
+    r"|(?P<VARIABLE>\$\{(?P<variable>[^{}]*)\})"
+)
+
+# Number of buffered output pieces after which streaming rendering hands out a chunk
+CHUNK_PIECES = 4096
+
+# Loop inputs and LOOPLIST values starting with this prefix read a column of a data file
+DATA_FILE_PREFIX = "file:"
+
+# Marks the end of a LOOPLIST source
+_EXHAUSTED = object()
+
+# Characters of identical loop iterations joined into one chunk when a loop body never changes
+REPEAT_CHUNK_CHARS = 1 << 20
+
+# Smallest number of iterations a top-level loop hands to one worker process
+PARALLEL_MIN_CHUNK = 1000
+
+# Values of a large loop input or LOOPLIST that analyze() measures to estimate their text length
+ANALYZE_SAMPLE = 10000
+
+# Values a RANDOM or RANDOMLIST placeholder draws from one sub-seed: loops are cut into
+# blocks of this many iterations, each seeded from RANDOMSEED, the placeholder and the block
+RANDOM_BLOCK = 1024
+
+# Identifies the layout of CompiledTemplate.to_bytes() data; bump when node classes change
+COMPILED_FORMAT = "tplc-3"
+
+# Parts of a datetime from coarsest to finest, and the value truncation resets each to
+_DATE_PARTS = (('year', None), ('month', 1), ('day', 1), ('hour', 0), ('minute', 0),
+               ('second', 0), ('microsecond', 0))
+
+# strftime directives by the finest date part they print; unknown directives count as microsecond
+_DIRECTIVE_RESOLUTION = {
+    **dict.fromkeys('YyCzZnt%', 0),
+    **dict.fromkeys('mbBh', 1),
+    **dict.fromkeys('daAwujUWVGgxDFe', 2),
+    **dict.fromkeys('HIklp', 3),
+    **dict.fromkeys('MR', 4),
+    **dict.fromkeys('SsTXcr', 5),
+}
+DIRECTIVE_PATTERN = re.compile(r"%[-_0^#]?(.)")
+
+VARIABLE_PATTERN = re.compile(r"\$\{([^{}]*)\}")
+NUMBER_PATTERN = re.compile(r"[-\d.]+")
+OFFSET_PATTERN = re.compile(r"[-]?\d*")
+
+
+def expand_variables(text: str, parameters: Dict[str, Any]) -> str:
+    """
+    Replace Robot Framework-style ${name} references in text.
+
+    Only names present in parameters with scalar values are replaced,
+    list and dict values leave the reference untouched.
+    """
+    def replace(match):
+        name = match.group(1)
+        if name not in parameters or isinstance(parameters[name], (list, dict)):
+            return match.group(0)
+        return str(parameters[name])
+
+    return VARIABLE_PATTERN.sub(replace, text)
+
+
+def _variable_text(name: str, raw: str, parameters: Dict[str, Any]) -> str:
+    """expand_variables(raw, parameters) for raw being the single reference ${name}."""
+    if name not in parameters:
+        return raw
+    value = parameters[name]
+    return raw if isinstance(value, (list, dict)) else str(value)
+
+
+class TemplateNode:
+    """Base class for nodes of a compiled template."""
+
+    __slots__ = ('raw',)
+    phase = ''  # name under which render statistics count this node
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    def render(self, context: 'RenderContext', out: List[str]) -> None:
+        """Append rendered text of this node to out."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.raw!r})"
+
+
+class TextNode(TemplateNode):
+    """Literal text copied to the output as is."""
+
+    __slots__ = ()
+    phase = 'text'
+
+    def render(self, context, out):
+        out.append(self.raw)
+
+
+class VariableNode(TemplateNode):
+    """Robot Framework-style ${name} reference."""
+
+    __slots__ = ('name',)
+    phase = 'variable'
+
+    def __init__(self, raw: str, name: str):
+        super().__init__(raw)
+        self.name = name
+
+    def render(self, context, out):
+        # Every variable is looked up once per render, not once per occurrence
+        text = context.expansions.get(self.raw)
+        if text is None:
+            text = context.expansions[self.raw] = _variable_text(self.name, self.raw, context.parameters)
+        out.append(text)
+
+
+class DateNode(TemplateNode):
+    """%%%NOW@offset@format%%% and %%%MONTHDELTA@offset@format%%% placeholders."""
+
+    __slots__ = ('operation', 'offset', 'date_format', 'key')
+    phase = 'date'
+
+    def __init__(self, raw: str, operation: str, offset: str, date_format: str):
+        super().__init__(raw)
+        self.operation = operation
+        self.offset = offset
+        self.date_format = date_format
+        # Arguments without ${...} are parsed once here instead of on every render,
+        # ones that don't parse are left to fail when the placeholder is rendered
+        self.key = None
+        if '${' not in raw:
+            try:
+                self.key = (operation, int(offset) if offset else 0, date_format)
+            except ValueError:
+                pass
+
+    def render(self, context, out):
+        if self.key is not None:
+            out.append(context.processor._format_date(*self.key))
+            return
+        offset = context.expand(self.offset)
+        date_format = context.expand(self.date_format)
+        if not OFFSET_PATTERN.fullmatch(offset):
+            out.append(context.expand(self.raw))
+            return
+        out.append(context.processor._format_date(self.operation, int(offset) if offset else 0, date_format))
+
+
+class ConstantNode(TemplateNode):
+    """%%%CONSTANT@ID%%% placeholder."""
+
+    __slots__ = ('const_id',)
+    phase = 'constant'
+
+    def __init__(self, raw: str, const_id: str):
+        super().__init__(raw)
+        self.const_id = const_id
+
+    def render(self, context, out):
+        if '${' in self.const_id:
+            out.append(context.processor._constant_value(context.expand(self.const_id), context.expand(self.raw),
+                                                         context.parameters))
+            return
+        out.append(context.processor._constant_value(self.const_id, self.raw, context.parameters))
+
+
+class _CounterNode(TemplateNode):
+    """Shared argument handling for INC and LOOPINC placeholders."""
+
+    __slots__ = ('base', 'increment', 'key')
+
+    def __init__(self, raw: str, base: str, increment: str):
+        super().__init__(raw)
+        self.base = base
+        self.increment = increment
+        # Counter key of arguments without ${...} is known at compile time,
+        # arguments that don't parse are left to fail when the placeholder is rendered
+        self.key = None
+        if '${' not in raw:
+            try:
+                self.key = (float(base), float(increment))
+            except ValueError:
+                pass
+
+    def _arguments(self, context) -> Optional[Tuple[float, float]]:
+        if self.key is not None:
+            return self.key
+        base = context.expand(self.base)
+        increment = context.expand(self.increment)
+        if not (NUMBER_PATTERN.fullmatch(base) and NUMBER_PATTERN.fullmatch(increment)):
+            return None
+        return float(base), float(increment)
+
+
+class IncNode(_CounterNode):
+    """%%%INC@base@increment%%% placeholder (global counter)."""
+
+    __slots__ = ()
+    phase = 'inc'
+
+    def render(self, context, out):
+        arguments = self._arguments(context)
+        if arguments is None:
+            out.append(context.expand(self.raw))
+            return
+        out.append(context.processor._next_inc(*arguments))
+
+
+class LoopIncNode(_CounterNode):
+    """%%%LOOPINC@base@increment%%% placeholder (counter scoped to the innermost loop)."""
+
+    __slots__ = ('depth',)
+    phase = 'loopinc'
+
+    def __init__(self, raw: str, base: str, increment: str, depth: int):
+        super().__init__(raw, base, increment)
+        self.depth = depth
+
+    def render(self, context, out):
+        arguments = self._arguments(context)
+        if arguments is None:
+            out.append(context.expand(self.raw))
+            return
+        out.append(context.processor._next_loopinc(context.scopes[self.depth].loop_state, *arguments))
+
+
+class LoopListNode(TemplateNode):
+    """%%%LOOPLIST@ID%%% placeholder (item of a list iterated together with the innermost loop)."""
+
+    __slots__ = ('list_id', 'depth')
+    phase = 'looplist'
+
+    def __init__(self, raw: str, list_id: str, depth: int):
+        super().__init__(raw)
+        self.list_id = list_id
+        self.depth = depth
+
+    def render(self, context, out):
+        list_id = self.list_id
+        if '${' in list_id:
+            list_id = context.expand(list_id)
+        out.append(str(context.scopes[self.depth].looplist_items[list_id]))
+
+
+class IndexNode(TemplateNode):
+    """%%%INDEX%%% and %%%loopname.INDEX%%% placeholders, depth is the nesting level of the loop."""
+
+    __slots__ = ('depth', 'loop_name')
+    phase = 'index'
+
+    def __init__(self, raw: str, depth: int, loop_name: Optional[str] = None):
+        super().__init__(raw)
+        self.depth = depth
+        self.loop_name = loop_name
+
+    def render(self, context, out):
+        out.append(context.scopes[self.depth].index_text)
+
+
+class ValueNode(TemplateNode):
+    """%%%loopname.VALUE%%% placeholder, depth is the nesting level of the loop."""
+
+    __slots__ = ('depth', 'loop_name')
+    phase = 'value'
+
+    def __init__(self, raw: str, depth: int, loop_name: str):
+        super().__init__(raw)
+        self.depth = depth
+        self.loop_name = loop_name
+
+    def render(self, context, out):
+        out.append(context.scopes[self.depth].value_text)
+
+
+class _RandomNode(TemplateNode):
+    """
+    Shared block drawing of RANDOM and RANDOMLIST placeholders.
+
+    The value in iteration index of the innermost loop (0 outside loops) comes
+    from a generator seeded with RANDOMSEED, the placeholder's position in the
+    template, the indexes of the enclosing loops and the block index falls in.
+    It doesn't depend on what was rendered before, so serial, parallel and
+    sharded renders agree. Blocks are drawn lazily, a few values at first.
+    """
+
+    __slots__ = ('position', 'depth')
+
+    def __init__(self, raw: str, position: int, depth: int):
+        super().__init__(raw)
+        self.position = position
+        self.depth = depth
+
+    def render(self, context, out):
+        depth = self.depth
+        if depth > 0:
+            scopes = context.scopes
+            out.append(self.text(context, tuple([scope.index for scope in scopes[:depth]]), scopes[depth].index))
+        else:
+            out.append(self.text(context, (), context.scopes[0].index if depth == 0 else 0))
+
+    def text(self, context: 'RenderContext', path: Tuple[int, ...], index: int) -> str:
+        """Value in iteration index of the innermost loop, path holding the indexes of the outer loops."""
+        state = context.random_blocks.get(self)
+        if state is not None and state[0] == path:
+            offset = index - state[1]
+            values = state[2]
+            if 0 <= offset < len(values):
+                return values[offset]
+        return self.refill(context, path, index)
+
+    def refill(self, context: 'RenderContext', path: Tuple[int, ...], index: int) -> str:
+        """Draw values of the block holding index up to it and return its value."""
+        block, offset = divmod(index, RANDOM_BLOCK)
+        state = context.random_blocks.get(self)
+        if state is None or state[0] != path or state[1] != index - offset:
+            digest = hashlib.blake2b(f"{context.random_seed}/{self.position}/{path}/{block}".encode(),
+                                     digest_size=8).digest()
+            state = context.random_blocks[self] = (path, index - offset, [], random.Random(digest))
+        values = state[2]
+        count = max(offset + 1 - len(values), min(max(len(values), 16), RANDOM_BLOCK - len(values)))
+        values.extend(self.draw(context, state[3], count))
+        return values[offset]
+
+    def draw(self, context: 'RenderContext', generator: random.Random, count: int) -> List[str]:
+        """Next count values of generator as text, drawn one after another so blocks are prefix stable."""
+        raise NotImplementedError
+
+
+class RandomNode(_RandomNode):
+    """%%%RANDOM@min@max%%% placeholder: integer, or number with the decimals of its arguments, in [min, max]."""
+
+    __slots__ = ('minimum', 'maximum')
+    phase = 'random'
+
+    def __init__(self, raw: str, minimum: str, maximum: str, position: int, depth: int):
+        super().__init__(raw, position, depth)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def bounds(self, context) -> Optional[Tuple[int, int, Optional[int]]]:
+        """
+        (min, max, decimal places or None for integers), None if arguments are not numbers.
+        
+        Decimal limits come scaled to integers in units of their last decimal
+        place, so every number with those decimals is equally likely.
+        """
+        minimum = context.expand(self.minimum)
+        maximum = context.expand(self.maximum)
+        try:
+            if '.' in minimum or '.' in maximum:
+                limits = [Decimal(text) for text in (minimum, maximum)]
+                if not all(limit.is_finite() for limit in limits):
+                    return None
+                places = max(0, *(-limit.as_tuple().exponent for limit in limits))
+                with localcontext() as decimal_context:
+                    decimal_context.prec = len(minimum) + len(maximum)  # more digits than either limit has
+                    low, high = (int(limit.scaleb(places)) for limit in limits)
+            else:
+                places = None
+                low, high = int(minimum), int(maximum)
+        except (ValueError, ArithmeticError):
+            return None
+        if low > high:
+            raise ValueError(f"RANDOM minimum {minimum} is greater than maximum {maximum} in pattern: {self.raw}")
+        return low, high, places
+
+    def refill(self, context, path, index):
+        # Arguments are checked once per render, before the first value is drawn
+        if self not in context.random_blocks and self.bounds(context) is None:
+            return context.expand(self.raw)
+        return super().refill(context, path, index)
+
+    def draw(self, context, generator, count):
+        low, high, places = self.bounds(context)
+        # randrange() draws exactly and uniformly from spans of any size
+        span = high - low + 1
+        if places is None:
+            return [str(low + generator.randrange(span)) for _ in range(count)]
+        return [_scaled_text(low + generator.randrange(span), places) for _ in range(count)]
+
+
+def _scaled_text(number: int, places: int) -> str:
+    """Text of number / 10 ** places with exactly places decimals."""
+    if not places:
+        return str(number)
+    digits = str(abs(number)).rjust(places + 1, '0')
+    return f"{'-' if number < 0 else ''}{digits[:-places]}.{digits[-places:]}"
+
+
+class RandomListNode(_RandomNode):
+    """%%%RANDOMLIST@ID%%% placeholder: random item of the list parameter ID."""
+
+    __slots__ = ('list_id',)
+    phase = 'randomlist'
+
+    def __init__(self, raw: str, list_id: str, position: int, depth: int):
+        super().__init__(raw, position, depth)
+        self.list_id = list_id
+
+    def population(self, context) -> Sequence:
+        """The list items are drawn from."""
+        if self.list_id not in context.parameters:
+            raise ValueError(f"Missing RANDOMLIST list for ID: {self.list_id}")
+        items = context.parameters[self.list_id]
+        if not isinstance(items, Sequence) or isinstance(items, (str, bytes)) or not items:
+            raise ValueError(f"RANDOMLIST '{self.list_id}' must be a non-empty list")
+        return items
+
+    def draw(self, context, generator, count):
+        return [str(value) for value in generator.choices(self.population(context), k=count)]
+
+
+# Nodes whose text depends on nothing but the parameters, so it is the same in every iteration
+_INVARIANT_NODES = (TextNode, VariableNode, ConstantNode, DateNode)
+
+
+class _InvariantRun(TemplateNode):
+    """
+    Consecutive loop body nodes that render the same text in every iteration.
+
+    The text is rendered where the run is first reached in a render and reused
+    from context.invariants afterwards, so errors surface at the same point.
+    """
+
+    __slots__ = ('nodes',)
+    phase = 'text'
+
+    def __init__(self, nodes: List[TemplateNode]):
+        super().__init__(''.join(node.raw for node in nodes))
+        self.nodes = nodes
+
+    def render(self, context, out):
+        text = context.invariants.get(self)
+        if text is None:
+            pieces = []
+            for node in self.nodes:
+                node.render(context, pieces)
+            text = context.invariants[self] = ''.join(pieces)
+        out.append(text)
+
+
+def _hoist_invariants(body: List[TemplateNode]) -> List[TemplateNode]:
+    """Body with runs of iteration independent nodes replaced by an _InvariantRun each."""
+    plan, run = [], []
+    for node in body:
+        if isinstance(node, _INVARIANT_NODES):
+            run.append(node)
+            continue
+        plan.extend([_InvariantRun(run)] if len(run) > 1 else run)
+        plan.append(node)
+        run = []
+    if run:
+        plan.extend([_InvariantRun(run)] if len(run) > 1 or not plan else run)
+    return plan
+
+
+class LoopNode(TemplateNode):
+    """
+    %%%LOOP@INPUT@name%%% ... %%%LOOP@END@name%%% block.
+
+    Marker-only lines are resolved at compile time: the body is already trimmed
+    and the flags describe how iterations are joined into the surrounding text.
+    depth is the position of the loop's scope in RenderContext.scopes; the index
+    and value text of an iteration is only built when the body refers to it.
+    plan is the body as iterations render it, with invariant parts hoisted.
+    """
+
+    __slots__ = ('input_name', 'name', 'depth', 'body', 'looplist_ids', 'uses_index', 'uses_value',
+                 'start_is_standalone', 'end_is_standalone', 'has_newline_after_end', 'plan')
+    phase = 'loop'
+
+    def __init__(self, raw: str, input_name: str, name: str, depth: int, body: List[TemplateNode],
+                 start_is_standalone: bool, end_is_standalone: bool, has_newline_after_end: bool):
+        super().__init__(raw)
+        self.input_name = input_name
+        self.name = name
+        self.depth = depth
+        self.body = body
+        self.looplist_ids = tuple(dict.fromkeys(
+            node.list_id for node in body if isinstance(node, LoopListNode)
+        ))
+        references = [node for node in _iter_descendants(body) if getattr(node, 'depth', None) == depth]
+        self.uses_index = any(isinstance(node, IndexNode) for node in references)
+        self.uses_value = any(isinstance(node, ValueNode) for node in references)
+        self.start_is_standalone = start_is_standalone
+        self.end_is_standalone = end_is_standalone
+        self.has_newline_after_end = has_newline_after_end
+        self.plan = _hoist_invariants(body)
+
+    def iter_render(self, context, out):
+        """
+        Append rendered iterations to out, yielding buffered text as it grows.
+        
+        Nested loops are rendered through their own iter_render, so memory held in
+        out stays bounded by CHUNK_PIECES no matter how many iterations run.
+        """
+        loop_values, looplists = self.loop_input(context)
+        scope = LoopScope(looplists)
+        yield from self.iter_iterations(context, out, scope, loop_values, 0)
+        self.check_looplists_exhausted(scope)
+        self.render_tail(out)
+
+    def loop_input(self, context) -> Tuple[Iterable, Dict[str, Iterable]]:
+        """
+        Validate and return the loop values and LOOPLIST sources for this render.
+
+        IDs may hold ${...} references, sources are keyed by the expanded LOOPLIST IDs.
+        """
+        parameters = context.parameters
+        context.index_shift  # INDEXSHIFT is validated before the loop input
+
+        input_name = context.expand(self.input_name)
+        if input_name not in parameters:
+            raise ValueError(f"Missing loop input for ID: {input_name} in pattern: {self.raw}")
+
+        looplist_ids = tuple(dict.fromkeys(context.expand(list_id) for list_id in self.looplist_ids))
+        parameters = context.processor._resolve_data_files((input_name,) + looplist_ids, parameters)
+        loop_values = context.processor._loop_values(input_name, parameters[input_name])
+        loop_size = len(loop_values) if isinstance(loop_values, Sized) else None
+        looplists = context.processor._looplist_data(looplist_ids, loop_size, parameters)
+        # Data file columns are opened afresh on every entry, only passed-in iterators are single use
+        for name, source in ((input_name, loop_values), *looplists.items()):
+            if source is context.parameters.get(name):
+                context.claim_iterator(name, source)
+        return loop_values, looplists
+
+    def iter_iterations(self, context, out, scope: 'LoopScope', loop_values, start: int):
+        """
+        Render loop_values as the iterations numbered from start on.
+        
+        Iterations after the first of the whole loop are preceded by the separator,
+        so consecutive ranges rendered separately join into the full loop output.
+        LOOPLIST items are taken from the scope's sources in lockstep with loop_values.
+        """
+        separator = '\n' if self.start_is_standalone else ''
+        plan = self.plan
+        if len(plan) == 1 and isinstance(plan[0], _InvariantRun):
+            yield from self.iter_repeated(context, out, scope, loop_values, start, separator)
+            return
+        has_loops = any(isinstance(node, LoopNode) for node in plan)
+        uses_index, uses_value = self.uses_index, self.uses_value
+        index_shift = context.index_shift
+        looplists, looplist_items = scope.looplists, scope.looplist_items
+        context.scopes.append(scope)
+        try:
+            for index, value in enumerate(loop_values, start):
+                if index and separator:
+                    out.append(separator)
+                scope.index = index
+                if uses_index:
+                    scope.index_text = str(index + index_shift)
+                if uses_value:
+                    scope.value_text = str(value)
+                if looplists:
+                    try:
+                        for list_id, items in looplists:
+                            looplist_items[list_id] = next(items)
+                    except StopIteration:
+                        raise _looplist_too_short(list_id, index) from None
+                if has_loops:
+                    yield from _iter_render_nodes(plan, context, out)
+                else:
+                    for node in plan:
+                        node.render(context, out)
+                if len(out) >= CHUNK_PIECES:
+                    yield ''.join(out)
+                    out.clear()
+        finally:
+            context.scopes.pop()
+
+    def iter_repeated(self, context, out, scope: 'LoopScope', loop_values, start: int, separator: str):
+        """
+        iter_iterations() for a body that is a single _InvariantRun.
+
+        Every iteration is the same text, so iterations are only counted and
+        their text is appended in batches of up to REPEAT_CHUNK_CHARS.
+        """
+        values = iter(loop_values)
+        if next(values, _EXHAUSTED) is _EXHAUSTED:
+            return
+        pieces = []
+        self.plan[0].render(context, pieces)
+        text = pieces[0]
+        out.append(separator + text if start else text)
+        scope.index = start
+        unit = separator + text
+        batch = max(1, min(CHUNK_PIECES, REPEAT_CHUNK_CHARS // max(len(unit), 1)))
+        while True:
+            count = len(list(itertools.islice(values, batch)))
+            if not count:
+                break
+            out.append(unit * count)
+            scope.index += count
+            if len(out) >= CHUNK_PIECES or count == batch:
+                yield ''.join(out)
+                out.clear()
+
+    def check_looplists_exhausted(self, scope: 'LoopScope') -> None:
+        """Raise ValueError if a LOOPLIST source has items left after the whole loop ran."""
+        loop_size = scope.index + 1
+        for list_id, items in scope.looplists:
+            if next(items, _EXHAUSTED) is not _EXHAUSTED:
+                raise ValueError(
+                    f"LOOPLIST '{list_id}' length (at least {loop_size + 1}) "
+                    f"does not match loop size ({loop_size})"
+                )
+
+    def render_tail(self, out):
+        """Append the line break kept after the loop's END marker."""
+        if (self.start_is_standalone or self.end_is_standalone) and self.has_newline_after_end:
+            out.append('\n')
+
+
+def _looplist_too_short(list_id: str, index: int) -> ValueError:
+    """Error for a LOOPLIST source that ran out before iteration index of its loop."""
+    return ValueError(f"LOOPLIST '{list_id}' length ({index}) does not match loop size (at least {index + 1})")
+
+
+class LoopScope:
+    """
+    State of one running loop while a compiled template is rendered.
+    
+    Scopes form a stack in RenderContext.scopes, placeholders refer to their
+    loop by its position in that stack, which is known at compile time.
+    """
+
+    __slots__ = ('index', 'index_text', 'value_text', 'looplists', 'looplist_items', 'loop_state')
+
+    def __init__(self, looplists: Dict[str, Iterable], start: int = 0):
+        self.index = start - 1
+        self.index_text = ''
+        self.value_text = ''
+        self.looplists = tuple(
+            (list_id, iter(source) if not start else iter(_iter_range(source, start)))
+            for list_id, source in looplists.items()
+        )
+        self.looplist_items = {}
+        self.loop_state = {'LOOPINC': {}}
+
+
+class RenderContext:
+    """Per-render state: parameters, owning processor and the stack of running loops."""
+
+    __slots__ = ('parameters', 'processor', 'scopes', 'stats', 'expansions', 'invariants', 'random_blocks',
+                 '_index_shift', '_random_seed', '_claimed_iterators')
+
+    def __init__(self, processor: 'TemplateProcessor', parameters: Dict[str, Any]):
+        self.parameters = parameters
+        self.processor = processor
+        self.scopes = []
+        self.stats = None
+        self.expansions = {}  # text -> text with ${...} references expanded, parameters don't change while rendering
+        self.invariants = {}  # _InvariantRun -> its text, the same in every iteration
+        self.random_blocks = {}  # RANDOM/RANDOMLIST node -> (path, first index, values drawn, generator) of its block
+        self._index_shift = None
+        self._random_seed = None
+        self._claimed_iterators = set()
+
+    @property
+    def index_shift(self) -> int:
+        if self._index_shift is None:
+            self._index_shift = self.processor._index_shift(self.parameters)
+        return self._index_shift
+
+    @property
+    def random_seed(self) -> str:
+        """RANDOMSEED parameter as text, or a seed chosen for this render only when it is not given."""
+        if self._random_seed is None:
+            seed = self.parameters.get('RANDOMSEED')
+            self._random_seed = str(seed) if seed is not None else secrets.token_hex(16)
+        return self._random_seed
+
+    def expand(self, text: str) -> str:
+        """expand_variables(text, parameters), computed once per render for each text."""
+        expanded = self.expansions.get(text)
+        if expanded is None:
+            expanded = self.expansions[text] = expand_variables(text, self.parameters)
+        return expanded
+
+    def claim_iterator(self, name: str, source: Iterable) -> None:
+        """Raise ValueError if a one-shot iterator is looped over a second time in this render."""
+        if not isinstance(source, IteratorABC):
+            return
+        if id(source) in self._claimed_iterators:
+            raise ValueError(
+                f"Loop input '{name}' is an iterator that is already used up; "
+                f"use a list, range or other collection to loop over it more than once"
+            )
+        self._claimed_iterators.add(id(source))
+
+
+def _date_token(match: re.Match, loop_names: Tuple[str, ...]) -> TemplateNode:
+    return DateNode(match.group(0), match.group('date_operation'),
+                    match.group('date_offset'), match.group('date_format'))
+
+
+def _constant_token(match: re.Match, loop_names: Tuple[str, ...]) -> TemplateNode:
+    return ConstantNode(match.group(0), match.group('const_id'))
+
+
+def _inc_token(match: re.Match, loop_names: Tuple[str, ...]) -> TemplateNode:
+    return IncNode(match.group(0), match.group('inc_base'), match.group('inc_increment'))
+
+
+def _variable_token(match: re.Match, loop_names: Tuple[str, ...]) -> TemplateNode:
+    return VariableNode(match.group(0), match.group('variable'))
+
+
+def _loopinc_token(match: re.Match, loop_names: Tuple[str, ...]) -> Optional[TemplateNode]:
+    if not loop_names:
+        return None
+    return LoopIncNode(match.group(0), match.group('loopinc_base'), match.group('loopinc_increment'),
+                       len(loop_names) - 1)
+
+
+def _looplist_token(match: re.Match, loop_names: Tuple[str, ...]) -> Optional[TemplateNode]:
+    if not loop_names:
+        return None
+    return LoopListNode(match.group(0), match.group('list_id'), len(loop_names) - 1)
+
+
+def _random_token(match: re.Match, loop_names: Tuple[str, ...]) -> TemplateNode:
+    return RandomNode(match.group(0), match.group('random_min'), match.group('random_max'),
+                      match.start(), len(loop_names) - 1)
+
+
+def _random_list_token(match: re.Match, loop_names: Tuple[str, ...]) -> TemplateNode:
+    return RandomListNode(match.group(0), match.group('random_list_id'), match.start(), len(loop_names) - 1)
+
+
+def _index_token(match: re.Match, loop_names: Tuple[str, ...]) -> Optional[TemplateNode]:
+    if not loop_names:
+        return None
+    return IndexNode(match.group(0), len(loop_names) - 1)
+
+
+def _named_token(match: re.Match, loop_names: Tuple[str, ...]) -> Optional[TemplateNode]:
+    loop_name = match.group('ref_loop')
+    if loop_name not in loop_names:
+        return None
+    depth = loop_names.index(loop_name)
+    if match.group('ref_attribute') == 'INDEX':
+        return IndexNode(match.group(0), depth, loop_name)
+    return ValueNode(match.group(0), depth, loop_name)
+
+
+# Token kind -> node factory. Factories return None for placeholders that have
+# no meaning at their position (e.g. INDEX outside loops), which stay as text.
+_TOKEN_HANDLERS = {
+    'DATE': _date_token,
+    'CONSTANT': _constant_token,
+    'INC': _inc_token,
+    'VARIABLE': _variable_token,
+    'LOOPINC': _loopinc_token,
+    'LOOPLIST': _looplist_token,
+    'RANDOM': _random_token,
+    'RANDOMLIST': _random_list_token,
+    'INDEX': _index_token,
+    'NAMED': _named_token,
+}
+
+
+class TemplateParser:
+    """
+    Builds the node tree of a template from a single scan over its text.
+    
+    Loop blocks end at the first matching %%%LOOP@END@name%%% inside the enclosing
+    body, a loop marker on a line of its own produces no output line, and
+    placeholders that cannot be resolved are kept as literal text.
+    """
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = list(TOKEN_PATTERN.finditer(text))
+        self.loop_ends = {}  # loop name -> indexes of its END tokens
+        for index, token in enumerate(self.tokens):
+            if token.lastgroup == 'LOOP_END':
+                self.loop_ends.setdefault(token.group('end_name'), []).append(index)
+    
+    def parse(self) -> List[TemplateNode]:
+        """Return nodes of the whole template."""
+        return self._parse_range(0, len(self.tokens), 0, len(self.text), ())
+    
+    def _find_end(self, start_index: int, stop_index: int, loop_name: str) -> Optional[int]:
+        """Index of the first END token of loop_name after start_index, None if not before stop_index."""
+        ends = self.loop_ends.get(loop_name, ())
+        position = bisect.bisect_right(ends, start_index)
+        if position < len(ends) and ends[position] < stop_index:
+            return ends[position]
+        return None
+    
+    def _parse_range(self, first: int, stop: int, lo: int, hi: int,
+                     loop_names: Tuple[str, ...]) -> List[TemplateNode]:
+        """Parse tokens[first:stop] lying in text[lo:hi], the body of the loops in loop_names."""
+        text = self.text
+        tokens = self.tokens
+        nodes = []
+        pos = lo
+        index = first
+        
+        while index < stop:
+            token = tokens[index]
+            kind = token.lastgroup
+            index += 1
+            
+            if kind == 'LOOP_END':
+                continue  # END without a START stays as text
+            
+            if kind != 'LOOP':
+                node = _TOKEN_HANDLERS[kind](token, loop_names)
+                if node is not None:
+                    if token.start() > pos:
+                        nodes.append(TextNode(text[pos:token.start()]))
+                    nodes.append(node)
+                    pos = token.end()
+                continue
+            
+            loop_name = token.group('loop_name')
+            end_index = self._find_end(index - 1, stop, loop_name)
+            if end_index is None:
+                continue  # START without an END stays as text
+            end_token = tokens[end_index]
+            
+            start_pos = token.start()
+            after_start_pos = token.end()
+            end_marker_start = end_token.start()
+            after_end_pos = end_token.end()
+            next_char_after_end = text[after_end_pos:min(after_end_pos + 1, hi)]
+            
+            # START is standalone if line has only whitespace before it and newline after it
+            line_start = max(text.rfind('\n', lo, start_pos) + 1, lo)
+            start_is_standalone = (text[line_start:start_pos].strip() == ''
+                                   and text[after_start_pos:after_start_pos + 1] in ('\n', '\r'))
+            
+            # END is standalone if its line has only whitespace before it and newline (or EOF) after it
+            end_line_start = text.rfind('\n', start_pos, end_marker_start)
+            end_is_standalone = (end_line_start != -1
+                                 and text[end_line_start + 1:end_marker_start].strip() == ''
+                                 and next_char_after_end in ('\n', '\r', ''))
+            has_newline_after_end = next_char_after_end in ('\n', '\r')
+            
+            # Body without the lines holding only markers
+            body_lo, body_hi = after_start_pos, end_marker_start
+            if start_is_standalone:
+                if text.startswith('\r\n', body_lo):
+                    body_lo += 2
+                elif text.startswith('\n', body_lo):
+                    body_lo += 1
+            if end_is_standalone:
+                while body_hi > body_lo and text[body_hi - 1].isspace():
+                    body_hi -= 1
+            
+            text_end = line_start if start_is_standalone else start_pos
+            if text_end > pos:
+                nodes.append(TextNode(text[pos:text_end]))
+            nodes.append(LoopNode(
+                text[start_pos:after_end_pos], token.group('loop_input'), loop_name, len(loop_names),
+                self._parse_range(index, end_index, body_lo, body_hi, loop_names + (loop_name,)),
+                start_is_standalone, end_is_standalone, has_newline_after_end
+            ))
+            
+            pos = after_end_pos
+            if end_is_standalone:
+                if text.startswith('\r\n', pos) and pos + 2 <= hi:
+                    pos += 2
+                elif text.startswith('\n', pos) and pos + 1 <= hi:
+                    pos += 1
+            index = end_index + 1
+        
+        if hi > pos:
+            nodes.append(TextNode(text[pos:hi]))
+        return nodes
+
+
+# Node classes by the number identifying them in serialized templates
+_NODE_CLASSES = (TextNode, VariableNode, DateNode, ConstantNode, IncNode, LoopIncNode,
+                 LoopListNode, IndexNode, ValueNode, LoopNode, RandomNode, RandomListNode)
+_NODE_CLASS_IDS = {cls: number for number, cls in enumerate(_NODE_CLASSES)}
+# Slot descriptors of every node class, base class slots first
+_NODE_SLOTS = tuple(
+    tuple(getattr(cls, slot) for base in reversed(cls.__mro__)
+          for slot in base.__dict__.get('__slots__', ()) if slot != 'plan')  # rebuilt from body on load
+    for cls in _NODE_CLASSES
+)
+_LOOP_CLASS_ID = _NODE_CLASS_IDS[LoopNode]
+
+
+def _dump_nodes(nodes: List[TemplateNode]) -> tuple:
+    """Nodes as nested tuples of class number and slot values, which marshal can store."""
+    dumped = []
+    for node in nodes:
+        number = _NODE_CLASS_IDS[type(node)]
+        values = [slot.__get__(node) for slot in _NODE_SLOTS[number]]
+        if number == _LOOP_CLASS_ID:
+            values = [_dump_nodes(value) if slot.__name__ == 'body' else value
+                      for slot, value in zip(_NODE_SLOTS[number], values)]
+        dumped.append((number, *values))
+    return tuple(dumped)
+
+
+def _load_nodes(dumped: tuple) -> List[TemplateNode]:
+    """Rebuild nodes from _dump_nodes output without running their constructors."""
+    nodes = []
+    for number, *values in dumped:
+        node = object.__new__(_NODE_CLASSES[number])
+        for slot, value in zip(_NODE_SLOTS[number], values):
+            if number == _LOOP_CLASS_ID and slot.__name__ == 'body':
+                value = _load_nodes(value)
+            slot.__set__(node, value)
+        if number == _LOOP_CLASS_ID:
+            node.plan = _hoist_invariants(node.body)
+        nodes.append(node)
+    return nodes
+
+
+def _iter_descendants(nodes: List[TemplateNode]) -> Iterator[TemplateNode]:
+    """Yield nodes and, depth first, everything inside the loops among them."""
+    for node in nodes:
+        yield node
+        if isinstance(node, LoopNode):
+            yield from _iter_descendants(node.body)
+
+
+def _iter_render_nodes(nodes: List[TemplateNode], context: 'RenderContext', out: List[str]):
+    """Render nodes into out, passing on text flushed by loops."""
+    for node in nodes:
+        if isinstance(node, LoopNode):
+            yield from node.iter_render(context, out)
+        else:
+            node.render(context, out)
+
+
+def _counter_steps(nodes: List[TemplateNode], context: 'RenderContext',
+                   depth: int) -> Optional[Dict[Tuple[bool, Tuple[float, float]], int]]:
+    """
+    Count how often each counter advances when nodes render once.
+    
+    Keys are (is_loopinc, (base, increment)); only LOOPINC counters of the loop at
+    depth are counted, the ones of nested loops restart in every iteration.
+    Returns None if a nested loop input has no known length.
+    """
+    steps = {}
+    return steps if _add_counter_steps(nodes, context, depth, 1, steps) else None
+
+
+def _add_counter_steps(nodes: List[TemplateNode], context: 'RenderContext', depth: int,
+                       multiplier: int, steps: Dict[Tuple[bool, Tuple[float, float]], int]) -> bool:
+    for node in nodes:
+        if isinstance(node, IncNode) or (isinstance(node, LoopIncNode) and node.depth == depth):
+            try:
+                arguments = node._arguments(context)
+            except ValueError:
+                arguments = None  # rendering raises the error itself
+            if arguments is not None:
+                key = (isinstance(node, LoopIncNode), arguments)
+                steps[key] = steps.get(key, 0) + multiplier
+        elif isinstance(node, LoopNode):
+            input_name = context.expand(node.input_name)
+            if _is_data_file_reference(context.parameters.get(input_name)):
+                return False
+            try:
+                values = context.processor._loop_values(input_name, context.parameters.get(input_name))
+            except ValueError:
+                values = ()  # rendering raises the error itself
+            if not isinstance(values, Sized):
+                return False
+            if not _add_counter_steps(node.body, context, depth, multiplier * len(values), steps):
+                return False
+    return True
+
+
+# (compiled template, parameters, random seed) of the render a pool worker process takes part in
+_worker_state = None
+
+
+def _init_loop_worker(source: str, parameters: Dict[str, Any], now: datetime.datetime, random_seed: str) -> None:
+    """Compile the template once in a freshly started pool worker."""
+    global _worker_state
+    processor = TemplateProcessor()
+    processor.now = now
+    _worker_state = (processor.compile(source), parameters, random_seed)
+
+
+def _iter_range(source: Iterable, start: int, stop: Optional[int] = None) -> Iterable:
+    """Items start..stop of source, taken by index from sequences instead of skipping the ones before."""
+    if isinstance(source, Sequence):
+        return source[start:stop] if stop is not None else map(source.__getitem__, range(start, len(source)))
+    return itertools.islice(source, start, stop)
+
+
+def _render_loop_chunk(node_index: int, start: int, stop: int,
+                       inc_values: Dict, loopinc_values: Dict) -> str:
+    """Render iterations start..stop of a top-level loop, counters continue from the given values."""
+    compiled, parameters, random_seed = _worker_state
+    compiled.processor.inc_values = inc_values
+    context = RenderContext(compiled.processor, parameters)
+    context._random_seed = random_seed
+    node = compiled.nodes[node_index]
+    loop_values, looplists = node.loop_input(context)
+    scope = LoopScope(looplists, start)
+    scope.loop_state['LOOPINC'] = loopinc_values
+    out = []
+    pieces = list(node.iter_iterations(context, out, scope, _iter_range(loop_values, start, stop), start))
+    pieces.extend(out)
+    return ''.join(pieces)
+
+
+class _CounterSequence:
+    """
+    Values of an INC/LOOPINC counter in closed form.
+    
+    The first value is base rounded to the decimal places of increment, value k
+    is first + k * increment computed on integers scaled by 10**places, so it is
+    exact and independent of the values before it.
+    """
+
+    __slots__ = ('first', 'start', 'step', 'scale')
+
+    def __init__(self, base_value: float, increment_value: float):
+        with localcontext() as decimal_context:
+            decimal_context.prec = 1000  # enough for every float to be exact
+            increment = Decimal(repr(increment_value))
+            places = max(0, -increment.as_tuple().exponent)
+            self.first = round(base_value, places)
+            self.start = int(Decimal(self.first).scaleb(places).to_integral_value(ROUND_HALF_EVEN))
+            self.step = int(increment.scaleb(places))
+        self.scale = 10 ** places
+
+    def value(self, index: int) -> float:
+        if index == 0:
+            return self.first  # keeps the sign of a rounded negative zero
+        return (self.start + index * self.step) / self.scale
+
+
+_counter_sequence = functools.lru_cache(maxsize=1024)(_CounterSequence)
+
+
+class RenderStats:
+    """
+    Where the time of one profiled render went.
+    
+    Phase times are wall time per node type; the 'loop' phase is the time not
+    spent in any placeholder or text, i.e. loop expansion and chunk assembly.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.bytes = 0
+        self.phase_seconds = {}  # phase -> seconds
+        self.placeholder_counts = {}  # phase -> rendered placeholders
+        self.loop_iterations = {}  # loop name -> iterations
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Statistics as plain dictionaries, with times in seconds."""
+        phases = dict(self.phase_seconds)
+        phases['loop'] = max(0.0, self.seconds - sum(phases.values()))
+        return {
+            'seconds': self.seconds,
+            'bytes': self.bytes,
+            'phases': phases,
+            'placeholders': dict(self.placeholder_counts),
+            'loops': dict(self.loop_iterations),
+        }
+
+    def summary(self) -> str:
+        """Human readable multi-line summary, slowest phases first."""
+        stats = self.as_dict()
+        lines = [f"Rendered {stats['bytes']} bytes in {stats['seconds']:.3f} s"]
+        for phase, seconds in sorted(stats['phases'].items(), key=lambda item: -item[1]):
+            count = stats['placeholders'].get(phase)
+            share = seconds / stats['seconds'] if stats['seconds'] else 0.0
+            lines.append(f"  {phase:<9} {seconds:8.3f} s {share:6.1%}" + (f"  {count} placeholders" if count else ""))
+        for name, iterations in stats['loops'].items():
+            lines.append(f"  loop {name}: {iterations} iterations")
+        return '\n'.join(lines)
+
+
+class _ProfiledNode(TemplateNode):
+    """Wraps a leaf node to add its render time and count to context.stats."""
+
+    __slots__ = ('node',)
+
+    def __init__(self, node: TemplateNode):
+        super().__init__(node.raw)
+        self.node = node
+
+    def render(self, context, out):
+        started = time.perf_counter()
+        self.node.render(context, out)
+        elapsed = time.perf_counter() - started
+        stats = context.stats
+        phase = self.node.phase
+        stats.phase_seconds[phase] = stats.phase_seconds.get(phase, 0.0) + elapsed
+        if phase != 'text':
+            stats.placeholder_counts[phase] = stats.placeholder_counts.get(phase, 0) + 1
+
+
+class _ProfiledLoopNode(LoopNode):
+    """LoopNode counting its iterations in context.stats."""
+
+    __slots__ = ()
+
+    def iter_iterations(self, context, out, scope, loop_values, start):
+        try:
+            yield from super().iter_iterations(context, out, scope, loop_values, start)
+        finally:
+            iterations = context.stats.loop_iterations
+            iterations[self.name] = iterations.get(self.name, 0) + scope.index + 1 - start
+
+
+def _profiled_nodes(nodes: List[TemplateNode]) -> List[TemplateNode]:
+    """Copy of a node tree with every node reporting to the render statistics."""
+    profiled = []
+    for node in nodes:
+        if isinstance(node, LoopNode):
+            loop = copy.copy(node)
+            loop.__class__ = _ProfiledLoopNode
+            loop.body = loop.plan = _profiled_nodes(node.body)  # every placeholder renders to be counted
+            profiled.append(loop)
+        else:
+            profiled.append(_ProfiledNode(node))
+    return profiled
+
+
+def _text_size(text: str) -> int:
+    """Size of text in bytes when written as UTF-8."""
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+class _CodeGenerator:
+    """
+    Translates a node tree into Python source of a generator function.
+    
+    The function behaves like _iter_render_nodes(nodes, context, out): loops become
+    native for loops, INDEX/VALUE text, LOOPLIST items and INC/LOOPINC counters
+    local variables, and variables, constants and dates are looked up once per
+    render. Placeholders with ${...} in their arguments are rendered by their node;
+    INC counters (or a loop's LOOPINC counters) then all stay in the processor (or
+    loop scope) so that both kinds share one state.
+    """
+
+    def __init__(self):
+        self.namespace = {
+            'LoopScope': LoopScope, '_EXHAUSTED': _EXHAUSTED, 'CHUNK_PIECES': CHUNK_PIECES,
+            '_looplist_too_short': _looplist_too_short, '_variable_text': _variable_text,
+        }
+        self.constants = {}  # id(value) -> (value, name), values kept alive for the ids
+        self.numbers = itertools.count()
+        self.prologue = []  # lines run once at the start of a render
+        self.lazy = {}  # (kind, key) -> local name of a value looked up once per render
+        self.counters = {}  # INC key -> local name
+        self.shared_inc = False
+        # per running loop: (index text name, value text name, LOOPLIST names, LOOPINC names, index name)
+        self.loops = []
+
+    def name(self, prefix: str) -> str:
+        return f"{prefix}{next(self.numbers)}"
+
+    def constant(self, value: Any) -> str:
+        """Name under which value is available to the generated code."""
+        entry = self.constants.get(id(value))
+        if entry is None:
+            entry = self.constants[id(value)] = (value, self.name('_k'))
+            self.namespace[entry[1]] = value
+        return entry[1]
+
+    def generate(self, nodes: List[TemplateNode]) -> Callable:
+        """Compile nodes into a generator function taking (context, out)."""
+        self.shared_inc = any(isinstance(node, IncNode) and node.key is None for node in _iter_descendants(nodes))
+        body = []
+        self.block(nodes, body, 2)
+        lines = [
+            "def render(context, out):",
+            "    append = out.append",
+            "    parameters = context.parameters",
+            "    processor = context.processor",
+            "    inc_values = processor.inc_values",
+            *(f"    {line}" for line in self.prologue),
+            *(f"    {name} = inc_values.get({self.constant(key)}, 0)" for key, name in self.counters.items()),
+            "    try:",
+            *body,
+            "        yield from ()",
+            "    finally:",
+            *(f"        if {name}: inc_values[{self.constant(key)}] = {name}" for key, name in self.counters.items()),
+            "        pass",
+        ]
+        source = '\n'.join(lines) + '\n'
+        exec(compile(source, '<template>', 'exec'), self.namespace)
+        return self.namespace['render']
+
+    def block(self, nodes: List[TemplateNode], lines: List[str], indent: int) -> None:
+        """Append statements rendering nodes to lines; consecutive leaves become one append."""
+        pad = '    ' * indent
+        pieces = []
+        for node in nodes:
+            if isinstance(node, LoopNode):
+                self.flush(pieces, lines, pad)
+                self.loop(node, lines, indent)
+            elif self.is_native(node):
+                pieces.append(self.leaf(node, lines, pad))
+            else:
+                self.flush(pieces, lines, pad)
+                lines.append(f"{pad}{self.constant(node)}.render(context, out)")
+        self.flush(pieces, lines, pad)
+
+    def flush(self, pieces: List[str], lines: List[str], pad: str) -> None:
+        if len(pieces) == 1:
+            lines.append(f"{pad}append({pieces[0]})")
+        elif pieces:
+            lines.append(f"{pad}append(f'{''.join('{' + piece + '}' for piece in pieces)}')")
+        pieces.clear()
+
+    def is_native(self, node: TemplateNode) -> bool:
+        """Whether node is translated, rather than rendered by itself."""
+        if isinstance(node, DateNode):
+            return node.key is not None
+        if isinstance(node, IncNode):
+            return not self.shared_inc
+        if isinstance(node, LoopIncNode):
+            return self.loops[node.depth][3] is not None
+        if isinstance(node, ConstantNode):
+            return '${' not in node.const_id
+        if isinstance(node, (TextNode, VariableNode, LoopListNode, IndexNode, ValueNode, _RandomNode)):
+            return True
+        raise _NotGenerated(node)
+
+    def leaf(self, node: TemplateNode, lines: List[str], pad: str) -> str:
+        """Emit statements node needs and return an expression for its text."""
+        if isinstance(node, TextNode):
+            return self.constant(node.raw)
+        if isinstance(node, VariableNode):
+            name = self.lazy.get(('variable', node.raw))
+            if name is None:
+                name = self.lazy['variable', node.raw] = self.name('v')
+                self.prologue.append(
+                    f"{name} = _variable_text({self.constant(node.name)}, {self.constant(node.raw)}, parameters)")
+            return name
+        if isinstance(node, ConstantNode):
+            return self.lazy_value('constant', node.raw, lines, pad, f"processor._constant_value("
+                                   f"{self.constant(node.const_id)}, {self.constant(node.raw)}, parameters)")
+        if isinstance(node, DateNode):
+            return self.lazy_value('date', node.key, lines, pad,
+                                   f"processor._format_date(*{self.constant(node.key)})")
+        if isinstance(node, IncNode):
+            counter = self.counters.get(node.key)
+            if counter is None:
+                counter = self.counters[node.key] = self.name('c')
+            return self.counter(node.key, counter, lines, pad)
+        if isinstance(node, LoopIncNode):
+            loop_counters = self.loops[node.depth][3]
+            counter = loop_counters.get(node.key)
+            if counter is None:
+                counter = loop_counters[node.key] = self.name('l')
+            return self.counter(node.key, counter, lines, pad)
+        if isinstance(node, LoopListNode):
+            return f"str({self.loops[node.depth][2][node.list_id]})"
+        if isinstance(node, IndexNode):
+            return self.loops[node.depth][0]
+        if isinstance(node, _RandomNode):
+            if node.depth < 0:
+                return f"{self.constant(node)}.text(context, (), 0)"
+            path = ''.join(f"{loop[4]}, " for loop in self.loops[:node.depth])
+            return f"{self.constant(node)}.text(context, ({path}), {self.loops[node.depth][4]})"
+        return self.loops[node.depth][1]
+
+    def lazy_value(self, kind: str, key: Any, lines: List[str], pad: str, expression: str) -> str:
+        """Name of a value looked up where it is first rendered, so errors surface at the same point."""
+        name = self.lazy.get((kind, key))
+        if name is None:
+            name = self.lazy[kind, key] = self.name('v')
+            self.prologue.append(f"{name} = None")
+        lines.append(f"{pad}if {name} is None: {name} = {expression}")
+        return name
+
+    def counter(self, key: Tuple[float, float], counter: str, lines: List[str], pad: str) -> str:
+        """Emit statements handing out the next value of a counter kept in a local variable."""
+        sequence = _counter_sequence(*key)
+        first, start, step, scale = (self.constant(value) for value in (
+            str(sequence.first), sequence.start, sequence.step, sequence.scale))
+        text = self.name('t')
+        lines.append(f"{pad}{text} = {first} if {counter} == 0 else str(({start} + {counter} * {step}) / {scale})")
+        lines.append(f"{pad}{counter} += 1")
+        return text
+
+    def loop(self, node: 'LoopNode', lines: List[str], indent: int) -> None:
+        """Emit a for loop with the input validation, separators and checks of LoopNode.iter_render."""
+        if any('${' in list_id for list_id in node.looplist_ids):
+            raise _NotGenerated(node)  # sources are keyed by IDs known only at render time
+        pad, inner = '    ' * indent, '    ' * (indent + 1)
+        number = next(self.numbers)
+        loop, scope, index, value = (f"{prefix}{number}" for prefix in ('loop', 'scope', 'index', 'value'))
+        self.namespace[loop] = node
+        looplists = {list_id: self.name('item') for list_id in node.looplist_ids}
+        scoped_loopinc = any(isinstance(child, LoopIncNode) and child.key is None for child in node.body)
+        loop_counters = None if scoped_loopinc else {}
+        body = []
+        self.loops.append((f"index_text{number}", f"value_text{number}", looplists, loop_counters, index))
+        self.block(node.body, body, indent + 1)
+        self.loops.pop()
+
+        lines.append(f"{pad}values{number}, looplists{number} = {loop}.loop_input(context)")
+        lines.append(f"{pad}{scope} = LoopScope(looplists{number})")
+        if looplists:
+            lines.append(f"{pad}sources{number} = dict({scope}.looplists)")
+            lines.extend(f"{pad}{item}_source = sources{number}[{list_id!r}]" for list_id, item in looplists.items())
+        if node.uses_index:
+            lines.append(f"{pad}shift{number} = context.index_shift")
+        lines.extend(f"{pad}{counter} = 0" for counter in (loop_counters or {}).values())
+        lines.append(f"{pad}context.scopes.append({scope})")
+        lines.append(f"{pad}{index} = -1")
+        lines.append(f"{pad}for {index}, {value} in enumerate(values{number}):")
+        if node.start_is_standalone:
+            lines.append(f"{inner}if {index}: append('\\n')")
+        if node.uses_index:
+            lines.append(f"{inner}index_text{number} = str({index} + shift{number})")
+        if node.uses_value:
+            lines.append(f"{inner}value_text{number} = str({value})")
+        for list_id, item in looplists.items():
+            lines.append(f"{inner}{item} = next({item}_source, _EXHAUSTED)")
+            lines.append(f"{inner}if {item} is _EXHAUSTED: raise _looplist_too_short({list_id!r}, {index})")
+        lines.extend(body)
+        lines.append(f"{inner}if len(out) >= CHUNK_PIECES:")
+        lines.append(f"{inner}    yield ''.join(out)")
+        lines.append(f"{inner}    out.clear()")
+        lines.append(f"{pad}context.scopes.pop()")
+        lines.append(f"{pad}{scope}.index = {index}")
+        lines.append(f"{pad}{loop}.check_looplists_exhausted({scope})")
+        lines.append(f"{pad}{loop}.render_tail(out)")
+
+
+class _NotGenerated(Exception):
+    """Raised by _CodeGenerator for nodes it has no translation for."""
+
+
+class _Uncacheable(Exception):
+    """Raised while building a cache key for parameters whose content cannot be hashed."""
+
+
+def _data_file_fingerprint(value: str) -> str:
+    """Stable text identifying a file:path#column reference by the path, size and mtime of the file."""
+    path = value[len(DATA_FILE_PREFIX):].rpartition('#')[0] or value[len(DATA_FILE_PREFIX):]
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        raise _Uncacheable(value)
+    return f"file({value!r},{stat.st_size},{stat.st_mtime_ns})"
+
+
+def _parameter_fingerprint(value: Any) -> str:
+    """Stable text identifying a parameter value."""
+    if value is None or isinstance(value, (str, bytes, bool, int, float, range,
+                                           datetime.date, datetime.time, datetime.timedelta)):
+        return f"{type(value).__name__}({value!r})"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}({','.join(map(_parameter_fingerprint, value))})"
+    if isinstance(value, Mapping):
+        items = sorted((_parameter_fingerprint(key), _parameter_fingerprint(item)) for key, item in value.items())
+        return f"dict({','.join(f'{key}:{item}' for key, item in items)})"
+    # Iterators are consumed by rendering and other objects may print differently each time
+    raise _Uncacheable(value)
+
+
+def _parameters_fingerprint(parameters: Mapping, data_file_names: set) -> str:
+    """Stable text identifying parameters, file: references of data_file_names by their data file."""
+    items = []
+    for name, value in parameters.items():
+        if name in data_file_names and _is_data_file_reference(value):
+            text = _data_file_fingerprint(value)
+        else:
+            text = _parameter_fingerprint(value)
+        items.append(f"{_parameter_fingerprint(name)}:{text}")
+    return f"dict({','.join(sorted(items))})"
+
+
+def _template_date_resolution(nodes: List[TemplateNode]) -> Optional[int]:
+    """
+    Index into _DATE_PARTS of the finest part any date placeholder depends on, None without dates.
+
+    That is the finest part its format prints, but at least the day for NOW with
+    a day offset, since shifting by days can change the month or year it prints.
+    """
+    resolution = None
+    for node in _iter_descendants(nodes):
+        if isinstance(node, DateNode):
+            if node.key is None:
+                return len(_DATE_PARTS) - 1
+            operation, offset, date_format = node.key
+            parts = [_DIRECTIVE_RESOLUTION.get(directive, len(_DATE_PARTS) - 1)
+                     for directive in DIRECTIVE_PATTERN.findall(date_format)]
+            if operation == 'NOW' and offset:
+                parts.append(2)
+            resolution = max(parts + [resolution or 0])
+    return resolution
+
+
+def _number_text_total(first: int, count: int) -> int:
+    """Total length of str(number) for the count integers from first on."""
+    total = 0
+    stop = first + count
+    if first < 0:
+        negative_stop = min(stop, 0)
+        # str(-k) is the text of k with a sign in front
+        total += (negative_stop - first) + _number_text_total(1 - negative_stop, negative_stop - first)
+        first = negative_stop
+    width = len(str(first))
+    while first < stop:
+        band_stop = min(stop, 10 ** width)
+        total += (band_stop - first) * width
+        first, width = band_stop, width + 1
+    return total
+
+
+def _sample_texts(values: Iterable) -> Tuple[float, float]:
+    """Average UTF-8 size and line breaks of str(value), measured on at most ANALYZE_SAMPLE values."""
+    count = len(values) if isinstance(values, Sized) else None
+    if count is not None and count > ANALYZE_SAMPLE and isinstance(values, Sequence):
+        sample = (values[position * count // ANALYZE_SAMPLE] for position in range(ANALYZE_SAMPLE))
+    else:
+        sample = itertools.islice(values, ANALYZE_SAMPLE)
+    size = lines = measured = 0
+    for value in sample:
+        text = str(value)
+        size += _text_size(text)
+        lines += text.count('\n')
+        measured += 1
+    return (size / measured, lines / measured) if measured else (0.0, 0.0)
+
+
+def _counter_text_size(arguments: Tuple[float, float], first: int, steps: int) -> float:
+    """Average text size of the steps values of an INC/LOOPINC counter from value first on."""
+    if steps <= 0:
+        return 0.0
+    sequence = _counter_sequence(*arguments)
+    positions = range(first, first + steps)
+    if steps > ANALYZE_SAMPLE:
+        positions = (first + position * steps // ANALYZE_SAMPLE for position in range(ANALYZE_SAMPLE))
+    return sum(len(str(sequence.value(position))) for position in positions) / min(steps, ANALYZE_SAMPLE)
+
+
+class _LoopEstimate:
+    """What analyze() knows about one iteration of a loop: its count and the size of its placeholders."""
+
+    __slots__ = ('size', 'index', 'value', 'looplists')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.index = 0.0  # average UTF-8 size of the index text
+        self.value = (0.0, 0.0)  # average (size, line breaks) of the value text
+        self.looplists = {}  # list ID -> average (size, line breaks) of its items
+
+
+class _Analyzer:
+    """
+    Walks a node tree the way rendering does, measuring text instead of producing it.
+
+    nodes() returns the estimated UTF-8 size and line breaks of one rendering of
+    the given nodes; multiplicity is how often that rendering happens in the whole
+    output, which sizes counters and totals loop iterations. Errors are collected
+    instead of raised, so one walk reports all of them.
+    """
+
+    def __init__(self, context: 'RenderContext', has_loops: bool):
+        self.context = context
+        self.errors = {}  # message -> None, in the order found
+        self.warnings = {}
+        self.iterations = {}  # loop name -> total iterations, None if unknown
+        self.complete = True  # False when the size of a loop is unknown
+        self.inc_steps = {}  # INC counter key -> values handed out before the node analyzed next
+        self.scopes = []
+        if not has_loops:
+            return  # rendering never reads INDEXSHIFT then
+        try:
+            context.index_shift
+        except ValueError as error:
+            # Reported once, loops are checked as if there was no shift
+            self.report(error)
+            context._index_shift = 0
+
+    def report(self, error: Exception) -> None:
+        self.errors.setdefault(str(error), None)
+
+    def nodes(self, nodes: List[TemplateNode], multiplicity: int) -> Tuple[float, float]:
+        size = lines = 0.0
+        for node in nodes:
+            node_size, node_lines = (self.loop if isinstance(node, LoopNode) else self.leaf)(node, multiplicity)
+            size += node_size
+            lines += node_lines
+        return size, lines
+
+    def leaf(self, node: TemplateNode, multiplicity: int) -> Tuple[float, float]:
+        context = self.context
+        if isinstance(node, _CounterNode):
+            try:
+                arguments = node._arguments(context)
+            except ValueError as error:
+                self.report(error)
+                return 0.0, 0.0
+            if arguments is not None:
+                if isinstance(node, IncNode):
+                    # INC placeholders sharing a counter take their values one after another
+                    first = self.inc_steps.get(arguments, context.processor.inc_values.get(arguments, 0))
+                    self.inc_steps[arguments] = first + multiplicity
+                    return _counter_text_size(arguments, first, multiplicity), 0.0
+                return _counter_text_size(arguments, 0, self.scopes[node.depth].size), 0.0
+        elif isinstance(node, IndexNode):
+            return self.scopes[node.depth].index, 0.0
+        elif isinstance(node, ValueNode):
+            return self.scopes[node.depth].value
+        elif isinstance(node, LoopListNode):
+            return self.scopes[node.depth].looplists.get(context.expand(node.list_id), (0.0, 0.0))
+        elif isinstance(node, _RandomNode):
+            try:
+                return self.random_text(node)
+            except ValueError as error:
+                self.report(error)
+                return 0.0, 0.0
+        out = []
+        try:
+            if isinstance(node, _CounterNode):
+                out.append(context.expand(node.raw))
+            else:
+                node.render(context, out)
+        except ValueError as error:
+            self.report(error)
+            return 0.0, 0.0
+        return _text_size(out[0]), out[0].count('\n')
+
+    def random_text(self, node: '_RandomNode') -> Tuple[float, float]:
+        if isinstance(node, RandomListNode):
+            return _sample_texts(node.population(self.context))
+        bounds = node.bounds(self.context)
+        if bounds is None:
+            text = self.context.expand(node.raw)
+            return _text_size(text), text.count('\n')
+        low, high, places = bounds
+        if places is None:
+            count = high - low + 1
+            return _number_text_total(low, count) / count, 0.0
+        # Sizes of evenly spaced values stand in for the uniformly drawn ones
+        return _sample_texts([_scaled_text(low + (high - low) * step // 100, places) for step in range(101)])
+
+    def loop(self, node: 'LoopNode', multiplicity: int) -> Tuple[float, float]:
+        context = self.context
+        try:
+            loop_values, looplists = node.loop_input(context)
+        except ValueError as error:
+            self.report(error)
+            # The loop can't be sized, still look for errors in its body
+            self.complete = False
+            self.body(node, _LoopEstimate(1), 0)
+            return 0.0, 0.0
+        input_name = context.expand(node.input_name)
+        if multiplicity > 1:
+            for name, source in ((input_name, loop_values), *looplists.items()):
+                if source is context.parameters.get(name):
+                    try:
+                        context.claim_iterator(name, source)  # rendering claims it once per entry
+                    except ValueError as error:
+                        self.report(error)
+
+        estimate = self.measure(node, loop_values, looplists)
+        if estimate is None:
+            self.complete = False
+            self.warnings.setdefault(
+                f"Size of loop '{node.name}' is unknown, its input '{input_name}' is an iterator", None
+            )
+            for nested in (node, *_iter_descendants(node.body)):
+                if isinstance(nested, LoopNode):
+                    self.iterations[nested.name] = None
+            self.body(node, _LoopEstimate(1), multiplicity)
+            return 0.0, 0.0
+
+        loop_size = estimate.size
+        total = self.iterations.get(node.name, 0)
+        if total is not None:
+            self.iterations[node.name] = total + multiplicity * loop_size
+        tail = 1.0 if (node.start_is_standalone or node.end_is_standalone) and node.has_newline_after_end else 0.0
+        if not loop_size:
+            # The body is never rendered, so it can't fail either
+            for nested in _iter_descendants(node.body):
+                if isinstance(nested, LoopNode):
+                    self.iterations.setdefault(nested.name, 0)
+            return tail, tail
+        body_size, body_lines = self.body(node, estimate, multiplicity * loop_size)
+        separators = loop_size - 1 if node.start_is_standalone else 0
+        return (loop_size * body_size + separators + tail,
+                loop_size * body_lines + separators + tail)
+
+    def body(self, node: 'LoopNode', estimate: _LoopEstimate, multiplicity: int) -> Tuple[float, float]:
+        self.scopes.append(estimate)
+        try:
+            return self.nodes(node.body, multiplicity)
+        finally:
+            self.scopes.pop()
+
+    def measure(self, node: 'LoopNode', loop_values: Iterable,
+                looplists: Dict[str, Iterable]) -> Optional[_LoopEstimate]:
+        """
+        Count the iterations of a loop and measure its values, None when the count is unknown.
+
+        Collections are measured on a sample. Data file columns are read in
+        lockstep to count them; iterators passed in as parameters are left
+        untouched, rendering consumes them.
+        """
+        parameters = self.context.parameters
+        sources = [(self.context.expand(node.input_name), loop_values)] + list(looplists.items())
+        counts, measured = {}, {}
+        readable = []
+        for position, (name, source) in enumerate(sources):
+            if isinstance(source, Sized):
+                counts[position] = len(source)
+                if position or node.uses_value:
+                    measured[position] = _sample_texts(source)
+            elif source is not parameters.get(name):
+                readable.append(position)
+            elif position:
+                self.warnings.setdefault(
+                    f"LOOPLIST '{name}' is an iterator, its length is not checked and its items are not estimated",
+                    None
+                )
+        if readable:
+            try:
+                self.read_columns(sources, readable, counts, measured)
+            except (ValueError, FileNotFoundError) as error:
+                # Counts are incomplete, rendering would stop here
+                self.report(error)
+                return _LoopEstimate(0)
+
+        loop_size = counts.get(0)
+        if loop_size is None:
+            return None
+        estimate = _LoopEstimate(loop_size)
+        if node.uses_index:
+            estimate.index = _number_text_total(self.context.index_shift, loop_size) / loop_size if loop_size else 0.0
+        estimate.value = measured.get(0, (0.0, 0.0))
+        for position, (list_id, _) in enumerate(sources[1:], 1):
+            if position in counts and counts[position] != loop_size:
+                self.report(ValueError(
+                    f"LOOPLIST '{list_id}' length ({counts[position]}) does not match loop size ({loop_size})"
+                ))
+            estimate.looplists[list_id] = measured.get(position, (0.0, 0.0))
+        return estimate
+
+    @staticmethod
+    def read_columns(sources: List[Tuple[str, Iterable]], positions: List[int],
+                     counts: Dict[int, int], measured: Dict[int, Tuple[float, float]]) -> None:
+        """Read the sources at positions in lockstep, as columns of one file share a single pass."""
+        totals = {position: [0, 0, 0] for position in positions}
+        for row in itertools.zip_longest(*(sources[position][1] for position in positions), fillvalue=_EXHAUSTED):
+            for position, value in zip(positions, row):
+                if value is not _EXHAUSTED:
+                    text = str(value)
+                    total = totals[position]
+                    total[0] += 1
+                    total[1] += _text_size(text)
+                    total[2] += text.count('\n')
+        for position, (count, size, lines) in totals.items():
+            counts[position] = count
+            measured[position] = (size / count, lines / count) if count else (0.0, 0.0)
+
+
+class CompiledTemplate:
+    """
+    Parsed template that can be rendered many times with different parameters.
+
+    Created by TemplateProcessor.compile(). Rendering uses the date and INC state
+    of the processor passed to render(), or of the processor that compiled it.
+    """
+
+    def __init__(self, source: str, nodes: List[TemplateNode], processor: 'TemplateProcessor'):
+        self.source = source
+        self.nodes = nodes
+        self.processor = processor
+        self._profiled = None  # node tree used when the processor profiles, built on first use
+        self._generated = None  # render function of the codegen backend, False if not translatable
+        self._source_digest = None
+
+    def render(self, parameters: Dict[str, Any], processor: Optional['TemplateProcessor'] = None) -> str:
+        """
+        Render template with given parameters.
+
+        Args:
+            parameters: Dictionary of parameter name -> value
+            processor: Processor providing `now` and INC state (defaults to the compiling one)
+
+        Returns:
+            Processed template string
+        """
+        return ''.join(self.iter_render(parameters, processor))
+
+    def iter_render(self, parameters: Dict[str, Any],
+                    processor: Optional['TemplateProcessor'] = None) -> Iterator[str]:
+        """
+        Render template with given parameters as a stream of text chunks.
+
+        Chunks are produced while loops run, so the full output is never held in memory.
+
+        Args:
+            parameters: Dictionary of parameter name -> value
+            processor: Processor providing `now` and INC state (defaults to the compiling one)
+
+        Yields:
+            Consecutive pieces of the processed template
+        """
+        context = RenderContext(processor or self.processor, parameters)
+        if context.processor.profile:
+            yield from self._iter_render_profiled(context)
+            return
+        out = []
+        workers = context.processor.workers
+        if workers and workers > 1:
+            yield from self._iter_render_parallel(context, out, workers)
+        elif context.processor.codegen and self.generated_function():
+            yield from self._generated(context, out)
+        else:
+            yield from _iter_render_nodes(self.nodes, context, out)
+        if out:
+            yield ''.join(out)
+
+    def generated_function(self) -> Optional[Callable]:
+        """
+        Render function the codegen backend compiled for this template, generated on first use.
+        
+        Returns:
+            Generator function taking (context, out), or None for templates with
+            ${...} inside placeholder arguments, which always render through nodes
+        """
+        if self._generated is None:
+            try:
+                self._generated = _CodeGenerator().generate(self.nodes)
+            except (_NotGenerated, SyntaxError, RecursionError):
+                # SyntaxError: Python limits how deeply loops can be nested in one function
+                self._generated = False
+        return self._generated or None
+
+    def _iter_render_profiled(self, context: 'RenderContext') -> Iterator[str]:
+        """
+        Render in the calling process, recording RenderStats in processor.last_render_stats.
+        
+        Time the consumer of the chunks takes (e.g. writing them) is not counted.
+        """
+        stats = context.stats = context.processor.last_render_stats = RenderStats()
+        if self._profiled is None:
+            self._profiled = _profiled_nodes(self.nodes)
+        out = []
+        
+        def iter_chunks():
+            yield from _iter_render_nodes(self._profiled, context, out)
+            if out:
+                yield ''.join(out)
+        
+        chunks = iter_chunks()
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            stats.seconds += time.perf_counter() - started
+            if chunk is None:
+                return
+            stats.bytes += _text_size(chunk)
+            yield chunk
+
+    def analyze(self, parameters: Dict[str, Any], processor: Optional['TemplateProcessor'] = None,
+                max_bytes: Optional[int] = None, max_lines: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Check a render for errors and estimate its output, without rendering it.
+
+        Every problem rendering would raise one at a time is reported at once:
+        missing constants and loop inputs, a bad INDEXSHIFT, LOOPLIST sources not
+        matching their loop, iterators looped over more than once. Loop sizes come
+        from the parameters; data file columns are read to count them, iterators
+        are left untouched and make the estimate unknown.
+
+        Args:
+            parameters: Dictionary of parameter name -> value
+            processor: Processor providing `now` and INC state (defaults to the compiling one)
+            max_bytes: Report an error if the output is estimated to be larger
+            max_lines: Report an error if the output is estimated to have more line breaks
+
+        Returns:
+            Dictionary with 'valid' (no errors), 'errors' and 'warnings' (lists of
+            messages), 'bytes' and 'lines' (estimated UTF-8 size and line breaks of
+            the output, None when a loop size is unknown) and 'loops' (loop name ->
+            total iterations in the whole output, None when unknown)
+        """
+        analyzer = _Analyzer(RenderContext(processor or self.processor, parameters),
+                             any(isinstance(node, LoopNode) for node in self.nodes))
+        size, lines = analyzer.nodes(self.nodes, 1)
+        size, lines = (round(size), round(lines)) if analyzer.complete else (None, None)
+        if max_bytes is not None and size is not None and size > max_bytes:
+            analyzer.report(ValueError(f"Estimated output size {size} bytes exceeds the limit of {max_bytes} bytes"))
+        if max_lines is not None and lines is not None and lines > max_lines:
+            analyzer.report(ValueError(f"Estimated output of {lines} lines exceeds the limit of {max_lines} lines"))
+        return {
+            'valid': not analyzer.errors,
+            'errors': list(analyzer.errors),
+            'warnings': list(analyzer.warnings),
+            'bytes': size,
+            'lines': lines,
+            'loops': analyzer.iterations,
+        }
+
+    def inc_steps(self, parameters: Dict[str, Any]) -> Optional[Dict[Tuple[float, float], int]]:
+        """
+        Number of values each INC counter hands out when parameters are rendered.
+        
+        Args:
+            parameters: Dictionary of parameter name -> value
+            
+        Returns:
+            INC counter key (base, increment) -> values, None when that depends on
+            a loop whose size is only known while rendering (an iterator or data file)
+        """
+        steps = _counter_steps(self.nodes, RenderContext(self.processor, parameters), -1)
+        return None if steps is None else {key: count for (_, key), count in steps.items()}
+
+    def cache_key(self, parameters: Dict[str, Any], now: datetime.datetime) -> Optional[str]:
+        """
+        Hash identifying the output of rendering parameters at now with a fresh processor.
+        
+        The key covers the template text, the parameter values (data files by path,
+        size and modification time) and now truncated to the finest date part the
+        template's date formats print, so a template printing only %Y-%m-%d gets the
+        same key all day and one without dates the same key forever.
+        
+        Args:
+            parameters: Dictionary of parameter name -> value
+            now: Timestamp the render would use
+            
+        Returns:
+            Hex digest, or None when the output cannot be cached because a parameter
+            is an iterator or an object without a stable value, or because the
+            template has RANDOM/RANDOMLIST placeholders and no RANDOMSEED is given
+        """
+        if self._has_random and 'RANDOMSEED' not in parameters:
+            return None
+        # Only loop inputs and LOOPLIST sources read file: references as data files
+        data_file_names = set()
+        for node in _iter_descendants(self.nodes):
+            if isinstance(node, LoopNode):
+                data_file_names.update(expand_variables(name, parameters)
+                                       for name in (node.input_name, *node.looplist_ids))
+        try:
+            fingerprint = _parameters_fingerprint(parameters, data_file_names)
+        except _Uncacheable:
+            return None
+        date = ''
+        if self._date_resolution is not None:
+            date = now.replace(**{part: reset for part, reset in _DATE_PARTS[self._date_resolution + 1:]}).isoformat()
+        return hashlib.sha256('\0'.join((self.source_digest, fingerprint, date)).encode('utf-8')).hexdigest()
+
+    @property
+    def source_digest(self) -> str:
+        """SHA-256 hex digest of the template text."""
+        if self._source_digest is None:
+            self._source_digest = hashlib.sha256(self.source.encode('utf-8')).hexdigest()
+        return self._source_digest
+
+    @functools.cached_property
+    def _date_resolution(self) -> Optional[int]:
+        return _template_date_resolution(self.nodes)
+
+    @functools.cached_property
+    def _has_random(self) -> bool:
+        return any(isinstance(node, _RandomNode) for node in _iter_descendants(self.nodes))
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the parsed template for TemplateProcessor.load_compiled().
+        
+        The data records the format, library version and Python implementation it
+        was written with and the digest of the template text, so it is only loaded
+        back for the same template by the same library on the same Python.
+        """
+        return marshal.dumps((COMPILED_FORMAT, __version__, sys.implementation.cache_tag,
+                              self.source_digest, _dump_nodes(self.nodes)))
+
+    def split_render(self, parameters: Dict[str, Any], processor: Optional['TemplateProcessor'] = None
+                     ) -> Tuple[str, Iterator[str], str, str]:
+        """
+        Render a template with one top-level loop as header, iterations and footer.
+        
+        header + separator.join(iterations) + footer equals render(parameters), and
+        counters reach the same state once the iterations are exhausted. The footer
+        is rendered up front from the counter values the loop will end with, so
+        output can be cut between any two iterations without rendering twice.
+        
+        Args:
+            parameters: Dictionary of parameter name -> value
+            processor: Processor providing `now` and INC state (defaults to the compiling one)
+            
+        Returns:
+            Tuple of (header, iterator over iteration texts, separator, footer)
+            
+        Raises:
+            ValueError: If the template does not have exactly one top-level loop, or
+                INC placeholders follow a loop whose number of iterations is unknown
+        """
+        loop_indexes = [index for index, node in enumerate(self.nodes) if isinstance(node, LoopNode)]
+        if len(loop_indexes) != 1:
+            raise ValueError(
+                f"Template should have exactly one top-level loop to be split, "
+                f"but has {len(loop_indexes)}"
+            )
+        loop_index = loop_indexes[0]
+        node = self.nodes[loop_index]
+        context = RenderContext(processor or self.processor, parameters)
+        
+        out = []
+        for header_node in self.nodes[:loop_index]:
+            header_node.render(context, out)
+        header = ''.join(out)
+        loop_values, looplists = node.loop_input(context)
+        footer_nodes = self.nodes[loop_index + 1:]
+        
+        # Footer counters continue from where the loop's INC counters will end
+        footer_processor = copy.copy(context.processor)
+        footer_processor.inc_values = dict(context.processor.inc_values)
+        footer_has_inc = any(isinstance(footer_node, IncNode) for footer_node in footer_nodes)
+        if footer_has_inc:
+            steps = _counter_steps(node.body, context, node.depth)
+            if steps is None or not isinstance(loop_values, Sized):
+                raise ValueError("INC placeholders after a split loop need loop inputs of known length")
+            for (is_loopinc, (base, increment)), count in steps.items():
+                if not is_loopinc:
+                    footer_processor._advance_counter(footer_processor.inc_values, base, increment,
+                                                      count * len(loop_values))
+        out = []
+        node.render_tail(out)
+        footer_context = RenderContext(footer_processor, parameters)
+        footer_context._random_seed = context.random_seed
+        for footer_node in footer_nodes:
+            footer_node.render(footer_context, out)
+        footer = ''.join(out)
+        
+        separator = '\n' if node.start_is_standalone else ''
+        
+        def iter_iterations():
+            scope = LoopScope(looplists)
+            for index, value in enumerate(loop_values):
+                out = []
+                pieces = list(node.iter_iterations(context, out, scope, (value,), index))
+                pieces.extend(out)
+                # iter_iterations puts the separator in front of every iteration but the first
+                yield ''.join(pieces)[len(separator) if index else 0:]
+            node.check_looplists_exhausted(scope)
+            if footer_has_inc:
+                context.processor.inc_values = footer_processor.inc_values
+        
+        return header, iter_iterations(), separator, footer
+
+    def _iter_render_parallel(self, context: 'RenderContext', out: List[str], workers: int) -> Iterator[str]:
+        """
+        Render top-level loops in contiguous chunks of iterations across a process pool.
+        
+        Each chunk starts from the INC and LOOPINC values serial rendering would have
+        reached and chunks are joined in order, so the output is identical to serial output.
+        Loops over inputs that are not sequences (generators, sets) render serially.
+        """
+        executor = None
+        try:
+            for node_index, node in enumerate(self.nodes):
+                if not isinstance(node, LoopNode):
+                    node.render(context, out)
+                    continue
+                loop_values, looplists = node.loop_input(context)
+                steps = _counter_steps(node.body, context, node.depth)
+                splittable = (
+                    steps is not None
+                    and all(isinstance(source, Sequence) for source in (loop_values, *looplists.values()))
+                    and len(loop_values) >= 2 * PARALLEL_MIN_CHUNK
+                )
+                if not splittable:
+                    scope = LoopScope(looplists)
+                    yield from node.iter_iterations(context, out, scope, loop_values, 0)
+                    node.check_looplists_exhausted(scope)
+                else:
+                    if executor is None:
+                        executor = ProcessPoolExecutor(
+                            workers, initializer=_init_loop_worker,
+                            initargs=(self.source, context.parameters, context.processor.now, context.random_seed)
+                        )
+                    if out:
+                        yield ''.join(out)
+                        out.clear()
+                    yield from self._iter_loop_chunks(executor, workers, node_index,
+                                                      len(loop_values), steps, context)
+                node.render_tail(out)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def _iter_loop_chunks(self, executor: ProcessPoolExecutor, workers: int, node_index: int, size: int,
+                          steps: Dict[Tuple[bool, Tuple[float, float]], int],
+                          context: 'RenderContext') -> Iterator[str]:
+        """Submit chunks of one top-level loop to the pool and yield their output in order."""
+        processor = context.processor
+        chunk_size = max(PARALLEL_MIN_CHUNK, -(-size // (workers * 4)))
+        
+        loopinc_values = {}
+        pending = deque()
+        for start in range(0, size, chunk_size):
+            stop = min(start + chunk_size, size)
+            pending.append(executor.submit(
+                _render_loop_chunk, node_index, start, stop,
+                dict(processor.inc_values), dict(loopinc_values)
+            ))
+            # Move counters to where serial rendering would be after this chunk; counters
+            # of loops that never run are left out, serial rendering never creates them
+            for (is_loopinc, (base, increment)), count in steps.items():
+                if not count:
+                    continue
+                values = loopinc_values if is_loopinc else processor.inc_values
+                processor._advance_counter(values, base, increment, count * (stop - start))
+            # Keep a bounded number of rendered chunks in flight
+            while len(pending) > 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _is_data_file_reference(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(DATA_FILE_PREFIX)
+
+
+def _iter_data_file_lines(path: str) -> Iterator[str]:
+    """Yield the lines of a UTF-8 text file through a read-only memory map."""
+    try:
+        handle = open(path, 'rb')
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Data file not found: {path}")
+    with handle:
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # an empty file cannot be mapped
+        with mapped:
+            for number, line in enumerate(iter(mapped.readline, b'')):
+                yield line.decode('utf-8-sig' if number == 0 else 'utf-8')
+
+
+def _iter_data_file_rows(path: str, columns: List[Optional[str]]) -> Iterator[tuple]:
+    """
+    Yield a tuple with the requested columns of every record of a data file.
+    
+    .csv and .tsv files have a header row naming the columns, .jsonl and .ndjson
+    files hold one JSON object per line with columns as keys. A column of None
+    stands for the first CSV column or the whole JSON value.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in ('.csv', '.tsv'):
+        reader = csv.reader(_iter_data_file_lines(path), dialect='excel-tab' if suffix == '.tsv' else 'excel')
+        header = next(reader, None)
+        if header is None:
+            return
+        positions = []
+        for column in columns:
+            if column is not None and column not in header:
+                raise ValueError(f"Column '{column}' not found in data file: {path}")
+            positions.append(header.index(column) if column is not None else 0)
+        for row in reader:
+            if not row:
+                continue  # blank line
+            try:
+                yield tuple(row[position] for position in positions)
+            except IndexError:
+                raise ValueError(f"Row {reader.line_num} of data file {path} has fewer columns than its header")
+    elif suffix in ('.jsonl', '.ndjson'):
+        for number, line in enumerate(_iter_data_file_lines(path), 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            values = []
+            for column in columns:
+                if column is None:
+                    values.append(record)
+                elif isinstance(record, dict) and column in record:
+                    values.append(record[column])
+                else:
+                    raise ValueError(f"Line {number} of data file {path} has no key '{column}'")
+            yield tuple(values)
+    else:
+        raise ValueError(f"Unsupported data file '{path}', expected .csv, .tsv, .jsonl or .ndjson")
+
+
+def _data_file_columns(path: str, columns: List[Optional[str]]) -> List[Iterator]:
+    """Iterators over several columns of a data file, all fed by a single pass over it."""
+    streams = itertools.tee(_iter_data_file_rows(path, columns), len(columns))
+    return [map(operator.itemgetter(position), stream) for position, stream in enumerate(streams)]
 
 
 class TemplateProcessor:
@@ -28,16 +2159,36 @@ class TemplateProcessor:
     - %%%loopname.VALUE%%% - Loop item value (accessible in nested loops)
     - %%%LOOPINC@base@increment%%% - Loop-scoped counter
     - %%%LOOPLIST@ID%%% - Synchronized list values in loops
+    - %%%RANDOM@min@max%%% - Random number in [min, max], repeatable with RANDOMSEED
+    - %%%RANDOMLIST@ID%%% - Random item of a list
     """
     
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None, profile: bool = False, codegen: bool = False):
+        """
+        Args:
+            workers: Number of processes top-level loops are rendered with, None or 1
+                renders in the calling process. Parameters must be picklable when set.
+            profile: Record RenderStats of every render in last_render_stats
+                (profiled renders always run in the calling process)
+            codegen: Render through Python functions generated from templates instead
+                of walking their nodes; output is the same, large loops are faster
+        """
         self.now = datetime.datetime.now()
         self.inc_values = {}  # Global INC state
+        self.workers = workers
+        self.profile = profile
+        self.codegen = codegen
+        self.last_render_stats = None
+        self._date_cache = {}  # (operation, offset, format) -> text for self._date_cache_now
+        self._date_cache_now = None
         
     def process(self, template_string: str, parameters: Dict[str, Any]) -> str:
         """
         Process template string with given parameters.
         
+        Placeholders and Robot Framework-style ${...} variables are resolved in a
+        single pass, values inserted into the output are not scanned again.
+        
         Args:
             template_string: Template content with placeholders
             parameters: Dictionary of parameter name -> value
@@ -45,48 +2196,104 @@ class TemplateProcessor:
         Returns:
             Processed template string
         """
-        # First, replace Robot Framework-style variables ${...}
-        # This allows tests to use ${Data} or ${Temppath} and have them replaced
-        for key, value in parameters.items():
-            robot_var_pattern = f"${{{key}}}"
-            if robot_var_pattern in template_string:
-                # Convert value to string for replacement
-                str_value = str(value) if not isinstance(value, (list, dict)) else robot_var_pattern
-                template_string = template_string.replace(robot_var_pattern, str_value)
-        
-        # Process loops first (they may contain other placeholders)
-        result = self._process_loops(template_string, parameters)
-        
-        # Process date/time placeholders
-        result = re.sub(
-            r"%%%(NOW|MONTHDELTA)@([-]?\d*)@(.*?)%%%",
-            self._replace_date,
-            result
-        )
-        
-        # Process CONSTANT placeholders
-        result = re.sub(
-            r"%%%CONSTANT@(\S*?)%%%",
-            lambda m: self._get_constant(m, parameters),
-            result
-        )
+        return self.compile(template_string).render(parameters)
+    
+    def compile(self, template_string: str) -> CompiledTemplate:
+        """
+        Parse template string once for repeated rendering.
         
-        # Process INC placeholders
-        result = re.sub(
-            r"%%%INC@([-\d.]+)@([-\d.]+)%%%",
-            self._process_inc,
-            result
-        )
+        Args:
+            template_string: Template content with placeholders
+            
+        Returns:
+            CompiledTemplate whose render(parameters) gives the same result as process()
+            
+        Example:
+            compiled = processor.compile(template_content)
+            for item_id in ids:
+                result = compiled.render({"ID": item_id})
+        """
+        return CompiledTemplate(template_string, TemplateParser(template_string).parse(), self)
+    
+    def load_compiled(self, data: bytes, template_string: str) -> Optional[CompiledTemplate]:
+        """
+        Load a template serialized by CompiledTemplate.to_bytes() without parsing it.
         
-        return result
+        Args:
+            data: Serialized template
+            template_string: Template content the data is expected to belong to
+            
+        Returns:
+            CompiledTemplate equal to compile(template_string), or None when data was
+            written for another template text, format, library version or Python, or
+            is damaged
+        """
+        try:
+            header, version, cache_tag, digest, dumped = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            return None
+        if (header, version, cache_tag) != (COMPILED_FORMAT, __version__, sys.implementation.cache_tag):
+            return None
+        compiled = CompiledTemplate(template_string, [], self)
+        if digest != compiled.source_digest:
+            return None
+        try:
+            compiled.nodes = _load_nodes(dumped)
+        except (TypeError, ValueError, IndexError):
+            return None
+        return compiled
     
-    def _replace_date(self, match: re.Match) -> str:
-        """Replace date/time placeholders."""
-        operation = match.group(1)
-        offset_str = match.group(2)
-        date_format = match.group(3)
+    def iter_render(self, template_string: str, parameters: Dict[str, Any]) -> Iterator[str]:
+        """
+        Process template string as a stream of text chunks.
+        
+        Joining the chunks gives the result of compile(template_string).render(parameters),
+        but output is produced incrementally so it can be written out while rendering.
+        
+        Args:
+            template_string: Template content with placeholders
+            parameters: Dictionary of parameter name -> value
+            
+        Yields:
+            Consecutive pieces of the processed template
+        """
+        return self.compile(template_string).iter_render(parameters)
+
+    def analyze(self, template_string: str, parameters: Dict[str, Any], max_bytes: Optional[int] = None,
+                max_lines: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Report all errors processing would run into and estimate the output, without rendering.
+
+        Args:
+            template_string: Template content with placeholders
+            parameters: Dictionary of parameter name -> value
+            max_bytes: Report an error if the output is estimated to be larger
+            max_lines: Report an error if the output is estimated to have more line breaks
+
+        Returns:
+            Dictionary described in CompiledTemplate.analyze()
+
+        Example:
+            report = processor.analyze(template_content, {"ROWS": 10 ** 6}, max_bytes=2 * 1024 ** 3)
+            if not report['valid']:
+                raise ValueError('\\n'.join(report['errors']))
+        """
+        return self.compile(template_string).analyze(parameters, self, max_bytes, max_lines)
+
+    def _format_date(self, operation: str, offset: int, date_format: str) -> str:
+        """
+        Format self.now shifted by offset days (NOW) or months (MONTHDELTA).
         
-        offset = int(offset_str) if offset_str else 0
+        Results are memoized until self.now is replaced, since loops repeat the
+        same few date placeholders many times.
+        """
+        if self._date_cache_now is not self.now:
+            self._date_cache = {}
+            self._date_cache_now = self.now
+        key = (operation, offset, date_format)
+        result = self._date_cache.get(key)
+        if result is not None:
+            return result
         
         if operation == "NOW":
             target_date = self.now + timedelta(days=offset)
@@ -95,14 +2302,13 @@ class TemplateProcessor:
         else:
             raise ValueError(f"Unknown date operation: {operation}")
             
-        return target_date.strftime(date_format)
+        result = self._date_cache[key] = target_date.strftime(date_format)
+        return result
     
-    def _get_constant(self, match: re.Match, parameters: Dict[str, Any]) -> str:
-        """Get constant value from parameters."""
-        const_id = match.group(1)
-        
+    def _constant_value(self, const_id: str, pattern: str, parameters: Dict[str, Any]) -> str:
+        """Look up CONSTANT value, pattern is the placeholder text used in error messages."""
         if const_id not in parameters:
-            raise ValueError(f"Missing constant for ID: {const_id} in pattern: {match.group(0)}")
+            raise ValueError(f"Missing constant for ID: {const_id} in pattern: {pattern}")
         
         value = parameters[const_id]
         
@@ -119,301 +2325,99 @@ class TemplateProcessor:
             
         return value
     
-    def _process_inc(self, match: re.Match) -> str:
-        """Process INC placeholder."""
-        base_value = float(match.group(1))
-        increment_value = float(match.group(2))
-        key = (base_value, increment_value)
-        
-        decimal_places = len(str(increment_value).split(".")[1]) if '.' in str(increment_value) else 0
-        
-        if key not in self.inc_values:
-            self.inc_values[key] = base_value
-        else:
-            self.inc_values[key] += increment_value
-            
-        self.inc_values[key] = round(self.inc_values[key], decimal_places)
-        return str(self.inc_values[key])
+    def _next_inc(self, base_value: float, increment_value: float) -> str:
+        """Advance the global counter identified by (base, increment) and return its value."""
+        return str(self._advance_counter(self.inc_values, base_value, increment_value))
     
-    def _process_loopinc(self, match: re.Match, loop_state: Dict) -> str:
-        """Process LOOPINC placeholder (loop-scoped counter)."""
-        base_value = float(match.group(1))
-        increment_value = float(match.group(2))
+    def _next_loopinc(self, loop_state: Dict, base_value: float, increment_value: float) -> str:
+        """Advance the loop-scoped counter identified by (base, increment) and return its value."""
+        return str(self._advance_counter(loop_state['LOOPINC'], base_value, increment_value))
+    
+    def _advance_counter(self, values: Dict, base_value: float, increment_value: float,
+                         steps: int = 1) -> float:
+        """
+        Advance the counter (base, increment) in values by steps and return its value.
+        
+        values maps counter keys to the number of values handed out so far, so
+        skipping ahead any number of steps costs the same as a single one.
+        """
         key = (base_value, increment_value)
+        count = values.get(key, 0) + steps
+        values[key] = count
+        return _counter_sequence(base_value, increment_value).value(count - 1)
+    
+    def _index_shift(self, parameters: Dict[str, Any]) -> int:
+        """Get INDEXSHIFT parameter (offset added to every loop index), 0 if not given."""
+        if 'INDEXSHIFT' not in parameters:
+            return 0
+        try:
+            return int(parameters['INDEXSHIFT'])
+        except (ValueError, TypeError):
+            raise ValueError(f"INDEXSHIFT must be an integer, but got: {parameters['INDEXSHIFT']}")
+    
+    def _loop_values(self, loop_input_name: str, loop_input: Any) -> Iterable:
+        """Convert loop input (int count or any iterable) to the loop values, without copying."""
+        if isinstance(loop_input, int):
+            return range(loop_input)
+        if isinstance(loop_input, Iterable) and not isinstance(loop_input, (str, bytes, Mapping)):
+            return loop_input
+        raise ValueError(
+            f"Loop input '{loop_input_name}' should be a list or int (or another iterable), "
+            f"but got {type(loop_input).__name__}"
+        )
+    
+    def _resolve_data_files(self, names, parameters: Dict[str, Any]) -> Mapping:
+        """
+        Replace file:path#column values of the given parameters by column iterators.
         
-        if key not in loop_state['LOOPINC']:
-            loop_state['LOOPINC'][key] = base_value
-        else:
-            loop_state['LOOPINC'][key] += increment_value
-            
-        decimal_places = len(str(increment_value).split(".")[1]) if '.' in str(increment_value) else 0
-        loop_state['LOOPINC'][key] = round(loop_state['LOOPINC'][key], decimal_places)
-        return str(loop_state['LOOPINC'][key])
+        Columns of the same file share one pass over it, so a loop input and its
+        LOOPLIST sources can all come from one data file.
+        """
+        references = {}
+        for name in names:
+            value = parameters.get(name)
+            if _is_data_file_reference(value):
+                path, separator, column = value[len(DATA_FILE_PREFIX):].rpartition('#')
+                if not separator:
+                    path, column = column, None
+                references.setdefault(path, []).append((name, column or None))
+        if not references:
+            return parameters
+        
+        resolved = {}
+        for path, entries in references.items():
+            columns = _data_file_columns(path, [column for _, column in entries])
+            resolved.update(zip((name for name, _ in entries), columns))
+        return ChainMap(resolved, parameters)
     
-    def _process_loops(self, text: str, parameters: Dict[str, Any]) -> str:
+    def _looplist_data(self, looplist_ids, loop_size: Optional[int],
+                       parameters: Dict[str, Any]) -> Dict[str, Iterable]:
         """
-        Process loop constructs.
+        Collect and validate LOOPLIST sources used by a loop.
         
-        Rule: Loop markers produce NO output. If a line contains ONLY a loop marker
-        (and whitespace), that entire line disappears from output.
+        Lengths are compared here when both sides have one; other sources are
+        checked while the loop runs, when one of them runs out first.
         """
-        loop_pattern = re.compile(
-            r"%%%LOOP@(.+?)@(.+?)%%%([\s\S]*?)%%%LOOP@END@\2%%%",
-            re.MULTILINE
-        )
+        looplist_data = {}
         
-        while True:
-            match = loop_pattern.search(text)
-            if not match:
-                break
-                
-            loop_input_name = match.group(1)
-            loop_name = match.group(2)
-            loop_body = match.group(3)
-            
-            # Find boundaries for replacement
-            # Check if START marker is alone on its line
-            start_pos = match.start()
-            line_start = text.rfind('\n', max(0, start_pos - 100), start_pos)
-            if line_start == -1:
-                line_start = 0
-            else:
-                line_start += 1
-            before_start = text[line_start:start_pos]
-            after_start_pos = start_pos + len(f"%%%LOOP@{loop_input_name}@{loop_name}%%%")
-            
-            # Check what comes after START marker on the same line
-            next_char_after_start = text[after_start_pos:after_start_pos+1] if after_start_pos < len(text) else ''
-            
-            # START is standalone if line has only whitespace before it and newline after it
-            start_is_standalone = (before_start.strip() == '' and next_char_after_start in ['\n', '\r'])
-            
-            # Check if END marker is alone on its line
-            end_marker = f"%%%LOOP@END@{loop_name}%%%"
-            end_marker_start = match.end() - len(end_marker)
-            end_line_start = text.rfind('\n', match.start(), end_marker_start)
-            if end_line_start == -1:
-                end_line_start = 0
-            else:
-                end_line_start += 1
-            before_end = text[end_line_start:end_marker_start]
-            
-            # Check what comes after END marker
-            after_end_pos = match.end()
-            next_char_after_end = text[after_end_pos:after_end_pos+1] if after_end_pos < len(text) else ''
-            
-            # END is standalone if line has only whitespace before it and newline (or EOF) after it
-            end_is_standalone = (before_end.strip() == '' and (next_char_after_end in ['\n', '\r', ''] or after_end_pos >= len(text)))
-            
-            # Check if there's actually a newline to consume after END marker
-            # (different from end_is_standalone which can be True at EOF with no newline)
-            has_newline_after_end = (after_end_pos < len(text) and text[after_end_pos:after_end_pos+1] in ['\n', '\r'])
-            
-            # Extract loop body, removing lines that have ONLY markers
-            if start_is_standalone:
-                # Remove the START marker line (including its newline)
-                if loop_body.startswith('\r\n'):
-                    loop_body = loop_body[2:]
-                elif loop_body.startswith('\n'):
-                    loop_body = loop_body[1:]
-                    
-            if end_is_standalone:
-                # Remove the END marker line (the newline and any whitespace before END marker)
-                loop_body = loop_body.rstrip()
-            
-            # Get INDEXSHIFT if specified
-            index_shift = 0
-            if 'INDEXSHIFT' in parameters:
-                try:
-                    index_shift = int(parameters['INDEXSHIFT'])
-                except (ValueError, TypeError):
-                    raise ValueError(f"INDEXSHIFT must be an integer, but got: {parameters['INDEXSHIFT']}")
-            
-            # Get loop input
-            if loop_input_name not in parameters:
-                raise ValueError(f"Missing loop input for ID: {loop_input_name} in pattern: {match.group(0)}")
-            
-            loop_input = parameters[loop_input_name]
-            
-            # Convert to loop values
-            if isinstance(loop_input, int):
-                loop_values = list(range(loop_input))
-            elif isinstance(loop_input, list):
-                loop_values = loop_input
-            else:
-                raise ValueError(
-                    f"Loop input '{loop_input_name}' should be a list or int, "
-                    f"but got {type(loop_input).__name__}"
-                )
-            
-            # Detect LOOPLIST placeholders
-            looplist_pattern = re.compile(r"%%%LOOPLIST@([A-Za-z0-9_]+)%%%")
-            looplist_ids = list(set(looplist_pattern.findall(loop_body)))
-            looplist_data = {}
-            
-            for list_id in looplist_ids:
-                if list_id not in parameters:
-                    raise ValueError(f"Missing LOOPLIST constant for ID: {list_id}")
-                    
-                entry = parameters[list_id]
+        for list_id in looplist_ids:
+            if list_id not in parameters:
+                raise ValueError(f"Missing LOOPLIST constant for ID: {list_id}")
                 
-                if not isinstance(entry, list):
-                    raise ValueError(f"LOOPLIST '{list_id}' must be a list")
-                    
-                if len(entry) != len(loop_values):
-                    raise ValueError(
-                        f"LOOPLIST '{list_id}' length ({len(entry)}) "
-                        f"does not match loop size ({len(loop_values)})"
-                    )
-                    
-                looplist_data[list_id] = entry
-            
-            # Process loop iterations
-            expanded = []
-            loop_state = {'LOOPINC': {}}
+            entry = parameters[list_id]
             
-            for index, val in enumerate(loop_values):
-                loop_instance = loop_body
-                
-                # Replace loop-specific placeholders, but protect nested loops from interference
-                # Strategy: Only protect INDEX, LOOPINC, and LOOPLIST within nested loops
-                # Allow outer loop's .INDEX and .VALUE to be accessible everywhere
-                
-                # First, replace the current loop's named placeholders (accessible everywhere including nested loops)
-                loop_instance = loop_instance.replace(f"%%%{loop_name}.INDEX%%%", str(index + index_shift))
-                loop_instance = loop_instance.replace(f"%%%{loop_name}.VALUE%%%", str(val))
-                
-                # Protect nested loops' INDEX, LOOPINC, and LOOPLIST from being replaced
-                # by temporarily masking them
-                nested_loops_info = []
-                nested_loop_pattern = re.compile(
-                    r"%%%LOOP@(.+?)@(.+?)%%%([\s\S]*?)%%%LOOP@END@\2%%%",
-                    re.MULTILINE
-                )
+            if not isinstance(entry, Iterable) or isinstance(entry, (str, bytes, Mapping)):
+                raise ValueError(f"LOOPLIST '{list_id}' must be a list or another iterable")
                 
-                def protect_nested_loop(match):
-                    nested_input = match.group(1)
-                    nested_name = match.group(2)
-                    nested_body = match.group(3)
-                    
-                    # Protect INDEX, LOOPINC, and LOOPLIST in nested loop body
-                    protected_body = nested_body
-                    protected_body = protected_body.replace("%%%INDEX%%%", "__NESTED_INDEX__")
-                    protected_body = re.sub(
-                        r"%%%LOOPINC@([-\d.]+)@([-\d.]+)%%%",
-                        r"__NESTED_LOOPINC@\1@\2__",
-                        protected_body
-                    )
-                    protected_body = re.sub(
-                        r"%%%LOOPLIST@([A-Za-z0-9_]+)%%%",
-                        r"__NESTED_LOOPLIST@\1__",
-                        protected_body
-                    )
-                    
-                    placeholder_id = len(nested_loops_info)
-                    nested_loops_info.append({
-                        'input': nested_input,
-                        'name': nested_name,
-                        'body': protected_body
-                    })
-                    return f"__NESTED_LOOP_{placeholder_id}__"
-                
-                # Temporarily replace nested loops with placeholders
-                loop_instance = nested_loop_pattern.sub(protect_nested_loop, loop_instance)
-                
-                # Now safely replace current loop's placeholders
-                loop_instance = loop_instance.replace("%%%INDEX%%%", str(index + index_shift))
-                
-                # Replace LOOPLIST placeholders (only at current level)
-                for list_id, list_values in looplist_data.items():
-                    loop_instance = loop_instance.replace(
-                        f"%%%LOOPLIST@{list_id}%%%",
-                        str(list_values[index])
-                    )
-                
-                # Replace LOOPINC placeholders (only at current level)
-                loop_instance = re.sub(
-                    r"%%%LOOPINC@([-\d.]+)@([-\d.]+)%%%",
-                    lambda m: self._process_loopinc(m, loop_state),
-                    loop_instance
+            if loop_size is not None and isinstance(entry, Sized) and len(entry) != loop_size:
+                raise ValueError(
+                    f"LOOPLIST '{list_id}' length ({len(entry)}) "
+                    f"does not match loop size ({loop_size})"
                 )
                 
-                # Restore nested loops with their protected placeholders
-                for i, nested_info in enumerate(nested_loops_info):
-                    # Reconstruct the nested loop with protected placeholders
-                    nested_loop_text = (
-                        f"%%%LOOP@{nested_info['input']}@{nested_info['name']}%%%"
-                        f"{nested_info['body']}"
-                        f"%%%LOOP@END@{nested_info['name']}%%%"
-                    )
-                    # Unprotect the placeholders so they can be processed by the nested loop
-                    nested_loop_text = nested_loop_text.replace("__NESTED_INDEX__", "%%%INDEX%%%")
-                    nested_loop_text = re.sub(
-                        r"__NESTED_LOOPINC@([-\d.]+)@([-\d.]+)__",
-                        r"%%%LOOPINC@\1@\2%%%",
-                        nested_loop_text
-                    )
-                    nested_loop_text = re.sub(
-                        r"__NESTED_LOOPLIST@([A-Za-z0-9_]+)__",
-                        r"%%%LOOPLIST@\1%%%",
-                        nested_loop_text
-                    )
-                    loop_instance = loop_instance.replace(f"__NESTED_LOOP_{i}__", nested_loop_text)
-                
-                # Recursively process inner placeholders (including nested loops)
-                # Create a new processor to handle nested loops with isolated state
-                inner_processor = TemplateProcessor()
-                inner_processor.now = self.now  # Share timestamp
-                inner_processor.inc_values = self.inc_values  # Share global INC state
-                processed = inner_processor.process(loop_instance, parameters)
-                
-                expanded.append(processed)
-            
-            # Determine how to join iterations based on marker positions
-            # Rule: Lines with ONLY markers disappear completely (including their newline)
-            if start_is_standalone:
-                # START standalone: iterations need newlines between them
-                expanded_text = '\n'.join(expanded)
-                # Add trailing newline ONLY if there's actually a newline to consume after END marker
-                # Don't add if END is at EOF or end of outer loop body (no newline to compensate for)
-                if has_newline_after_end:
-                    expanded_text += '\n'
-            elif end_is_standalone:
-                # START inline, END standalone: concatenate
-                expanded_text = ''.join(expanded)
-                # Add trailing newline only if there's one to consume
-                if has_newline_after_end:
-                    expanded_text += '\n'
-            else:
-                # Both inline: just concatenate
-                expanded_text = ''.join(expanded)
-            
-            # Determine replacement boundaries
-            replace_start = match.start()
-            replace_end = match.end()
-            
-            # If START is standalone, remove from start of its line
-            if start_is_standalone:
-                replace_start = line_start
-                # Also consume the newline after START marker
-                if text[after_start_pos:after_start_pos+2] == '\r\n':
-                    # newline already consumed in body processing
-                    pass
-                elif text[after_start_pos:after_start_pos+1] == '\n':
-                    # newline already consumed in body processing
-                    pass
-                    
-            # If END is standalone, consume the newline after it
-            if end_is_standalone:
-                if text[replace_end:replace_end+2] == '\r\n':
-                    replace_end += 2
-                elif text[replace_end:replace_end+1] == '\n':
-                    replace_end += 1
-            
-            # Replace loop block with expanded content
-            text = text[:replace_start] + expanded_text + text[replace_end:]
+            looplist_data[list_id] = entry
         
-        return text
+        return looplist_data
     
     def _monthdelta(self, date: datetime.datetime, delta: int) -> datetime.datetime:
         """
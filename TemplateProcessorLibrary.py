@@ -7,27 +7,649 @@ Import this library in your Robot Framework tests, not TemplateProcessorCore.
 Example:
     Library    TemplateProcessorLibrary.py
     
+Robot Framework uses the TemplateProcessorLibrary class below, which offers the
+same keywords and can keep INC counters between calls; the functions can also be
+called directly from Python.
+    
 Keywords:
     - generate_file: Generates file from template
     - generate_file_and_return_content: Generates file and returns content + timestamp
+    - render_template: Returns content, or streams it to an output sink, without writing a file
+    - generate_files: Generates many files from one template in parallel
+    - generate_cached_file: Generates file unless an identical output is cached
+    - validate_template: Reports all errors of a generation and estimates its output size
+    - agenerate_file, agenerate_file_and_return_content: asyncio variants run on executor threads
+    - set_async_concurrency: Sets how many async generations run at the same time
+    - reset_inc_counters: Restarts INC counters kept with persistent_inc (class only)
+    - clear_template_cache: Drops parsed templates kept between keyword calls
+    - set_template_cache_size: Sets how many parsed templates are kept
+    - get_template_cache_stats: Returns template cache size and hit/miss counters
+    - set_template_disk_cache: Keeps parsed templates in .tplcache/ for other processes
+    - set_template_codegen: Renders through Python functions generated from templates
+    - set_render_profiling: Turns per-phase timing of renders on or off
+    - get_last_render_stats: Returns timing and counts of the last profiled render
 """
 
 __version__ = "1.0.0"
 
+import asyncio
+import bz2
 import datetime
+import functools
+import gzip
+import io
+import lzma
+import os
+import re
+import shutil
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple
+from typing import Any, BinaryIO, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence, \
+    TextIO, Tuple, Union
+
+from TemplateProcessorCore import TemplateProcessor, CompiledTemplate, RenderStats, _text_size
+
+DEFAULT_TEMPLATE_CACHE_SIZE = 128
+WRITE_BUFFER_SIZE = 1024 * 1024
+DEFAULT_ASYNC_CONCURRENCY = 8
+# Directory next to a template holding its parsed form when the template disk cache is on
+PRECOMPILED_DIR = '.tplcache'
+# Output file extension -> compression it selects
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz'}
+# Compression -> (valid levels, default level)
+COMPRESSION_LEVELS = {'gzip': (range(0, 10), 6), 'bz2': (range(1, 10), 9), 'xz': (range(0, 10), 6)}
+
+
+class TemplateCache:
+    """
+    Bounded LRU cache of compiled templates.
+    
+    Entries are keyed on the resolved template path and validated against the
+    file's mtime and size, so an edited template is parsed again on next use.
+    With disk_cache, templates missing here are loaded from their parsed form in
+    .tplcache/ next to the template, written by whichever process parsed it first.
+    """
+    
+    def __init__(self, capacity: int = DEFAULT_TEMPLATE_CACHE_SIZE, disk_cache: bool = False):
+        self.capacity = capacity
+        self.disk_cache = disk_cache
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # resolved path -> (mtime_ns, size, CompiledTemplate)
+        self._lock = threading.Lock()
+    
+    def get(self, template_file: str) -> CompiledTemplate:
+        """
+        Get compiled template, reading and parsing the file only if needed.
+        
+        Raises:
+            FileNotFoundError: If template file does not exist
+        """
+        template_path = Path(template_file)
+        try:
+            path = template_path.resolve()
+            stat = path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            raise FileNotFoundError(f"Template file not found: {template_file}")
+        
+        key = str(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        
+        compiled = self._compile(path)
+        
+        with self._lock:
+            if self.capacity > 0:
+                self._entries[key] = (stat.st_mtime_ns, stat.st_size, compiled)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+        return compiled
+    
+    def _compile(self, path: Path) -> CompiledTemplate:
+        """Parse the template at path, going through its .tplcache/ file with disk_cache."""
+        text = path.read_text(encoding='utf-8')
+        processor = TemplateProcessor()
+        if not self.disk_cache:
+            return processor.compile(text)
+        
+        precompiled_path = path.parent / PRECOMPILED_DIR / f"{path.name}.tplc"
+        try:
+            compiled = processor.load_compiled(precompiled_path.read_bytes(), text)
+        except OSError:
+            compiled = None
+        if compiled is None:
+            compiled = processor.compile(text)
+            temp_name = precompiled_path.with_name(
+                f".{precompiled_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                precompiled_path.parent.mkdir(exist_ok=True)
+                temp_name.write_bytes(compiled.to_bytes())
+                os.replace(temp_name, precompiled_path)
+            except OSError:
+                # Read-only template directories just parse the template in every process
+                if temp_name.exists():
+                    temp_name.unlink()
+        return compiled
+    
+    def resize(self, capacity: int) -> None:
+        """Change capacity, evicting least recently used entries if needed."""
+        if capacity < 0:
+            raise ValueError(f"Template cache size must be 0 or greater, but got: {capacity}")
+        with self._lock:
+            self.capacity = capacity
+            while len(self._entries) > capacity:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop all entries and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> Dict[str, int]:
+        """Return current size, capacity and hit/miss counters."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+_TEMPLATE_CACHE = TemplateCache()
+
+# Set by set_render_profiling; the stats of the last profiled render are kept for get_last_render_stats
+_RENDER_PROFILING = False
+_LAST_RENDER_STATS = None
+# Set by set_template_codegen
+_CODEGEN = False
+
+
+# Set by set_async_concurrency; every event loop gets its own semaphore enforcing it
+_ASYNC_CONCURRENCY = DEFAULT_ASYNC_CONCURRENCY
+_ASYNC_SEMAPHORES = weakref.WeakKeyDictionary()
+
+# Oldest Robot Framework version that runs async keywords
+ROBOT_ASYNC_VERSION = (6, 1)
+
+
+def _robot_runs_async(version: Optional[str]) -> bool:
+    """Whether Robot Framework of the given version runs async keywords; True without Robot Framework."""
+    if version is None:
+        return True
+    match = re.match(r"(\d+)\.(\d+)", version)
+    return match is not None and (int(match.group(1)), int(match.group(2))) >= ROBOT_ASYNC_VERSION
+
+
+try:
+    from robot.version import VERSION as _ROBOT_VERSION
+except ImportError:
+    _ROBOT_VERSION = None
+
+
+def _processor_options() -> Dict[str, bool]:
+    """Options set_render_profiling and set_template_codegen give new processors."""
+    return {'profile': _RENDER_PROFILING, 'codegen': _CODEGEN}
+
+
+def _new_processor(options: Optional[Dict[str, bool]] = None) -> TemplateProcessor:
+    return TemplateProcessor(**(_processor_options() if options is None else options))
+
+
+def _keep_render_stats(stats: Optional[RenderStats]) -> None:
+    global _LAST_RENDER_STATS
+    if stats is not None:
+        _LAST_RENDER_STATS = stats
+
+
+def _output_compression(output_path: Path, compression: Optional[str],
+                        compression_level: Optional[int]) -> Optional[Tuple[str, int]]:
+    """
+    Compression and level output_path is written with, None for plain text.
+    
+    Without compression the extension decides: .gz, .bz2 and .xz outputs are
+    compressed, anything else is not; 'none' turns compression off.
+    """
+    if compression is None:
+        compression = COMPRESSION_EXTENSIONS.get(output_path.suffix.lower())
+        if compression is None:
+            return None
+    compression = str(compression).lower()
+    if compression == 'none':
+        return None
+    if compression not in COMPRESSION_LEVELS:
+        raise ValueError(f"Compression should be gzip, bz2, xz or none, but got: {compression}")
+    levels, level = COMPRESSION_LEVELS[compression]
+    if compression_level is not None:
+        level = int(compression_level)
+        if level not in levels:
+            raise ValueError(f"Compression level of {compression} should be between {levels[0]} and "
+                             f"{levels[-1]}, but got: {level}")
+    return compression, level
+
+
+def _compressor(raw: BinaryIO, compression: str, level: int, name: str) -> BinaryIO:
+    """Compressing writer on raw; gzip headers name the output and carry no timestamp, so output repeats."""
+    if compression == 'gzip':
+        return gzip.GzipFile(filename=name, mode='wb', compresslevel=level, fileobj=raw, mtime=0)
+    if compression == 'bz2':
+        return bz2.BZ2File(raw, 'wb', compresslevel=level)
+    return lzma.LZMAFile(raw, 'wb', preset=level)
+
+
+@contextmanager
+def _atomic_output(output_path: Path, compression: Optional[str] = None,
+                   compression_level: Optional[int] = None) -> Iterator[TextIO]:
+    """
+    Open a buffered writer for output_path.
+    
+    Output goes to a temporary file next to the target that replaces it only
+    when the block completes, so a failing render leaves no partial file.
+    Compressed output (see _output_compression) is encoded and compressed as
+    it is written, the uncompressed text never reaches the disk.
+    """
+    codec = _output_compression(output_path, compression, compression_level)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_name = output_path.with_name(f".{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if codec is None:
+            with open(temp_name, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as output:
+                yield output
+        else:
+            with open(temp_name, 'wb', buffering=WRITE_BUFFER_SIZE) as raw, \
+                    _compressor(raw, *codec, output_path.name) as stream, \
+                    io.TextIOWrapper(stream, encoding='utf-8') as output:
+                yield output
+        os.replace(temp_name, output_path)
+    except BaseException:
+        if temp_name.exists():
+            temp_name.unlink()
+        raise
+
+
+class OutputSink:
+    """
+    Destination of rendered text.
+    
+    open() is a context manager giving a text writer; rendered segments are
+    passed to its writelines() as they are produced, never joined into one
+    string first. The output is complete when the block exits without error.
+    """
+    
+    def open(self) -> ContextManager[TextIO]:
+        raise NotImplementedError
+
+
+class FileSink(OutputSink):
+    """File written atomically, compressed by extension or as given (see generate_file)."""
+    
+    def __init__(self, path: Union[str, os.PathLike], compression: Optional[str] = None,
+                 compression_level: Optional[int] = None):
+        self.path = Path(path)
+        self.compression = compression
+        self.compression_level = compression_level
+    
+    def open(self) -> ContextManager[TextIO]:
+        return _atomic_output(self.path, self.compression, self.compression_level)
+
+
+class StreamSink(OutputSink):
+    """
+    Open file descriptor (e.g. of a pipe) or file object, text or binary.
+    
+    Binary streams get UTF-8. The stream is flushed after writing but left
+    open, it belongs to the caller.
+    """
+    
+    def __init__(self, stream: Union[int, TextIO, BinaryIO]):
+        self.stream = stream
+    
+    @contextmanager
+    def open(self) -> Iterator[TextIO]:
+        stream = self.stream
+        if isinstance(stream, int):
+            with open(stream, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE, closefd=False) as output:
+                yield output
+        elif isinstance(stream, io.TextIOBase):
+            yield stream
+            stream.flush()
+        else:
+            output = io.TextIOWrapper(stream, encoding='utf-8', write_through=True)
+            try:
+                yield output
+            finally:
+                # Hand the stream back without closing it
+                output.detach()
+
+
+class MemorySink(StreamSink):
+    """In-memory StringIO or BytesIO buffer, a new StringIO by default."""
+    
+    def __init__(self, buffer: Union[io.StringIO, io.BytesIO, None] = None):
+        super().__init__(io.StringIO() if buffer is None else buffer)
+    
+    def getvalue(self) -> Union[str, bytes]:
+        """Everything written to the buffer."""
+        return self.stream.getvalue()
+
+
+class _CallableWriter:
+    """Writer handing every segment to a function."""
+    
+    def __init__(self, function: Callable[[str], Any]):
+        self.write = function
+    
+    def writelines(self, segments: Iterable[str]) -> None:
+        write = self.write
+        for segment in segments:
+            write(segment)
+
+
+class CallableSink(OutputSink):
+    """Function called with every rendered segment, e.g. list.append or a chunked upload."""
+    
+    def __init__(self, function: Callable[[str], Any]):
+        if not callable(function):
+            raise ValueError(f"CallableSink needs a callable, but got: {function!r}")
+        self.function = function
+    
+    @contextmanager
+    def open(self) -> Iterator[_CallableWriter]:
+        yield _CallableWriter(self.function)
+
+
+def _output_sink(target: Any, compression: Optional[str] = None,
+                compression_level: Optional[int] = None) -> OutputSink:
+    """
+    Sink for an output target.
+    
+    Args:
+        target: OutputSink, path, StringIO/BytesIO buffer, file descriptor,
+            file object or callable taking each rendered segment
+        compression: Compression of a path target (see generate_file)
+        compression_level: Compression level of a path target
+        
+    Returns:
+        The OutputSink writing to target
+    """
+    if isinstance(target, (str, os.PathLike)):
+        return FileSink(target, compression, compression_level)
+    if compression is not None or compression_level is not None:
+        raise ValueError(f"Compression only applies to output files, but got: {target!r}")
+    if isinstance(target, OutputSink):
+        return target
+    if isinstance(target, (io.StringIO, io.BytesIO)):
+        return MemorySink(target)
+    if isinstance(target, int) or hasattr(target, 'write'):
+        return StreamSink(target)
+    if callable(target):
+        return CallableSink(target)
+    raise ValueError(f"Output should be a path, buffer, file descriptor, file object, callable or OutputSink, "
+                     f"but got: {target!r}")
+
+
+def _write_chunks(output: Any, chunks: Iterable[str], compression: Optional[str] = None,
+                  compression_level: Optional[int] = None) -> None:
+    """Write text chunks to an output path or sink (see _output_sink)."""
+    with _output_sink(output, compression, compression_level).open() as writer:
+        writer.writelines(chunks)
+
+
+def _copy_file(source: Path, target: Path) -> None:
+    """Atomically replace target by a copy of source, keeping source's modification time."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_name = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        shutil.copy2(source, temp_name)
+        os.replace(temp_name, target)
+    except BaseException:
+        if temp_name.exists():
+            temp_name.unlink()
+        raise
+
+
+class _ShardWriter:
+    """
+    Write loop iterations to numbered files that stay within a size or line cap.
+    
+    Every shard is header + iterations joined by separator + footer; a new shard
+    is started when the next iteration would exceed the cap. An iteration never
+    is split, so one larger than the cap gets a shard of its own. Caps apply to
+    the text, also when shards are compressed.
+    """
+    
+    def __init__(self, output_pattern: str, header: str, separator: str, footer: str,
+                 max_bytes: Optional[int], max_lines: Optional[int], compression: Optional[str] = None,
+                 compression_level: Optional[int] = None):
+        self.output_pattern = output_pattern
+        self.header = header
+        self.separator = separator
+        self.footer = footer
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.compression = compression
+        self.compression_level = compression_level
+        self.paths = []
+        self._fixed_bytes = _text_size(header) + _text_size(footer)
+        self._fixed_newlines = header.count('\n') + footer.count('\n')
+        self._separator_bytes = _text_size(separator)
+        self._output = None
+        self._shard = None
+        self._count = 0
+        
+        if max_bytes is not None and self._fixed_bytes > max_bytes:
+            raise ValueError(f"Header and footer take {self._fixed_bytes} bytes, "
+                             f"more than max_output_bytes {max_bytes}")
+        if max_lines is not None and self._lines(0, '') > max_lines:
+            raise ValueError(f"Header and footer take {self._lines(0, '')} lines, "
+                             f"more than max_output_lines {max_lines}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        if self._shard is not None:
+            self._shard.__exit__(*exc_info)
+            self._shard = None
+    
+    def _lines(self, body_newlines: int, body_last: str) -> int:
+        """Line count of a shard, a last line without line break included."""
+        last = self.footer[-1:] or body_last or self.header[-1:]
+        return self._fixed_newlines + body_newlines + (1 if last not in ('', '\n') else 0)
+    
+    def _fits(self, text: str, text_bytes: int) -> bool:
+        """Whether text still fits into the current shard after the separator."""
+        if self.max_bytes is not None:
+            size = self._fixed_bytes + self._body_bytes + self._separator_bytes + text_bytes
+            if size > self.max_bytes:
+                return False
+        if self.max_lines is not None:
+            newlines = self._body_newlines + self.separator.count('\n') + text.count('\n')
+            if self._lines(newlines, (self.separator + text)[-1:] or self._body_last) > self.max_lines:
+                return False
+        return True
+    
+    def _open(self) -> None:
+        path = Path(self.output_pattern.format(shard=len(self.paths)))
+        self._shard = _atomic_output(path, self.compression, self.compression_level)
+        self._output = self._shard.__enter__()
+        self._output.write(self.header)
+        self.paths.append(path)
+        self._count = 0
+        self._body_bytes = 0
+        self._body_newlines = 0
+        self._body_last = ''
+    
+    def _close(self) -> None:
+        self._output.write(self.footer)
+        shard, self._shard = self._shard, None
+        shard.__exit__(None, None, None)
+    
+    def add(self, text: str) -> None:
+        """Append one iteration, finishing the current shard first if it would not fit."""
+        text_bytes = _text_size(text) if self.max_bytes is not None else 0
+        if self._shard is not None and self._count and not self._fits(text, text_bytes):
+            self._close()
+        if self._shard is None:
+            self._open()
+        if self._count:
+            text = self.separator + text
+            text_bytes += self._separator_bytes
+        self._output.write(text)
+        self._count += 1
+        self._body_bytes += text_bytes
+        self._body_newlines += text.count('\n')
+        self._body_last = text[-1:] or self._body_last
+    
+    def finish(self) -> List[Path]:
+        """Finish the last shard (an empty loop still gives one) and return all shard paths."""
+        if self._shard is None and not self.paths:
+            self._open()
+        if self._shard is not None:
+            self._close()
+        return self.paths
+
+
+def _generate_job(compiled: CompiledTemplate, output_file: str, parameters: Dict[str, Any]) -> datetime.datetime:
+    """Render one batch job with a fresh processor and write it to output_file."""
+    processor = _new_processor()
+    _write_chunks(Path(output_file), compiled.iter_render(parameters, processor))
+    _keep_render_stats(processor.last_render_stats)
+    return processor.now
+
+
+def _generate_job_in_process(template_file: str, output_file: str, parameters: Dict[str, Any],
+                             options: Dict[str, bool]) -> Tuple[datetime.datetime, Optional[RenderStats]]:
+    """
+    Batch job run in a pool process, which parses the template once through its own cache.
+    
+    The pool process does not share the caller's settings, so the processor
+    options come along with the job and the render statistics go back with
+    the timestamp.
+    """
+    processor = _new_processor(options)
+    _write_chunks(Path(output_file), _TEMPLATE_CACHE.get(template_file).iter_render(parameters, processor))
+    return processor.now, processor.last_render_stats
+
+
+def _generate_shards(compiled: CompiledTemplate, output_pattern: str, max_bytes: Optional[int],
+                     max_lines: Optional[int], compression: Optional[str], compression_level: Optional[int],
+                     parameters: Dict[str, Any], processor: TemplateProcessor) -> datetime.datetime:
+    """Write the iterations of the template's top-level loop to size- or line-capped shards."""
+    if not isinstance(output_pattern, str):
+        raise ValueError("max_output_bytes and max_output_lines need an output file pattern, "
+                         f"but got: {output_pattern!r}")
+    try:
+        numbered = output_pattern.format(shard=0) != output_pattern.format(shard=1)
+    except (KeyError, IndexError, ValueError):
+        numbered = False
+    if not numbered:
+        raise ValueError(f"Output file should be a pattern with a {{shard}} field, but got: {output_pattern}")
+    
+    header, iterations, separator, footer = compiled.split_render(parameters, processor)
+    with _ShardWriter(output_pattern, header, separator, footer,
+                      int(max_bytes) if max_bytes is not None else None,
+                      int(max_lines) if max_lines is not None else None,
+                      compression, compression_level) as writer:
+        for text in iterations:
+            writer.add(text)
+        writer.finish()
+    return processor.now
+
+
+def _generate_file(output_file: Any, template_file: str, workers: Optional[int], max_bytes: Optional[int],
+                   max_lines: Optional[int], compression: Optional[str], compression_level: Optional[int],
+                   parameters: Dict[str, Any], processor: TemplateProcessor) -> datetime.datetime:
+    """Body of generate_file, rendering with the given processor's timestamp and INC state."""
+    # Read template (parsed templates are cached between calls)
+    compiled = _TEMPLATE_CACHE.get(template_file)
+    
+    if max_bytes is not None or max_lines is not None:
+        if workers:
+            raise ValueError("render_workers cannot be combined with max_output_bytes or max_output_lines")
+        return _generate_shards(compiled, output_file, max_bytes, max_lines, compression, compression_level,
+                                parameters, processor)
+    
+    # Process template, streaming rendered chunks straight to the output file (through the compressor)
+    processor.workers = int(workers) if workers else None
+    _write_chunks(output_file, compiled.iter_render(parameters, processor), compression, compression_level)
+    _keep_render_stats(processor.last_render_stats)
+    
+    return processor.now
+
+
+def _generate_content(output_file: Any, template_file: str, parameters: Dict[str, Any],
+                      processor: TemplateProcessor) -> Tuple[str, datetime.datetime]:
+    """Body of generate_file_and_return_content, rendering with the given processor."""
+    # Read template (parsed templates are cached between calls)
+    compiled = _TEMPLATE_CACHE.get(template_file)
+    
+    # Process template
+    result = compiled.render(parameters, processor)
+    _keep_render_stats(processor.last_render_stats)
+    
+    # Write output, compressed if the extension asks for it
+    _write_chunks(output_file, (result,))
+    
+    return result, processor.now
+
 
-from TemplateProcessorCore import TemplateProcessor
+def _render_template(template_file: str, sink: Any, parameters: Dict[str, Any],
+                     processor: TemplateProcessor) -> Optional[str]:
+    """Body of render_template, rendering with the given processor."""
+    compiled = _TEMPLATE_CACHE.get(template_file)
+    if sink is None:
+        result = compiled.render(parameters, processor)
+    else:
+        result = None
+        _write_chunks(sink, compiled.iter_render(parameters, processor))
+    _keep_render_stats(processor.last_render_stats)
+    return result
 
 
-def generate_file(output_file: str, template_file: str, **parameters) -> datetime.datetime:
+def generate_file(output_file: Any, template_file: str, *, render_workers: Optional[int] = None,
+                  max_output_bytes: Optional[int] = None, max_output_lines: Optional[int] = None,
+                  output_compression: Optional[str] = None, output_compression_level: Optional[int] = None,
+                  **parameters) -> datetime.datetime:
     """
     Generate file from template.
     
+    With max_output_bytes or max_output_lines the output is split into several
+    files. The template must then have one top-level loop: every file repeats
+    the text before and after the loop and holds as many whole iterations as
+    fit, with INC and LOOPINC counters continuing from file to file.
+    
+    Output files ending in .gz, .bz2 or .xz are compressed while rendering,
+    so the uncompressed text is never written to disk.
+    
+    The options are keyword-only and named apart from template parameters,
+    so a template may take a parameter called e.g. workers.
+    
     Args:
-        output_file: Path to output file
+        output_file: Path to output file, with max_output_bytes or max_output_lines a pattern
+            with a {shard} field numbering the files from 0, e.g. out_{shard:04d}.txt;
+            or any other output taken by render_template, e.g. a BytesIO buffer
         template_file: Path to template file
+        render_workers: Number of processes large top-level loops are rendered with
+            (output is identical to rendering in one process)
+        max_output_bytes: Maximum size of each output file in bytes (of the text, before compression)
+        max_output_lines: Maximum number of lines in each output file
+        output_compression: 'gzip', 'bz2' or 'xz' to compress whatever the extension, 'none' to
+            never compress (default: by extension)
+        output_compression_level: Compression level, 0-9 for gzip and xz (default 6), 1-9 for
+            bz2 (default 9); lower levels are faster
         **parameters: Template parameters (ID=value, LOOP1=[...], etc.)
         
     Returns:
@@ -41,27 +663,12 @@ def generate_file(output_file: str, template_file: str, **parameters) -> datetim
             ITEMS=['A', 'B', 'C']
         )
     """
-    # Read template
-    template_path = Path(template_file)
-    if not template_path.exists():
-        raise FileNotFoundError(f"Template file not found: {template_file}")
-    
-    template_content = template_path.read_text(encoding='utf-8')
-    
-    # Process template
-    processor = TemplateProcessor()
-    result = processor.process(template_content, parameters)
-    
-    # Write output
-    output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(result, encoding='utf-8')
-    
-    return processor.now
+    return _generate_file(output_file, template_file, render_workers, max_output_bytes, max_output_lines,
+                          output_compression, output_compression_level, parameters, _new_processor())
 
 
 def generate_file_and_return_content(
-    output_file: str,
+    output_file: Any,
     template_file: str,
     **parameters
 ) -> Tuple[str, datetime.datetime]:
@@ -69,7 +676,7 @@ def generate_file_and_return_content(
     Generate file from template and return both content and timestamp.
     
     Args:
-        output_file: Path to output file
+        output_file: Path to output file, or any other output taken by render_template
         template_file: Path to template file
         **parameters: Template parameters
         
@@ -83,20 +690,510 @@ def generate_file_and_return_content(
             ID='test123'
         )
     """
-    # Read template
-    template_path = Path(template_file)
-    if not template_path.exists():
-        raise FileNotFoundError(f"Template file not found: {template_file}")
+    return _generate_content(output_file, template_file, parameters, _new_processor())
+
+
+def render_template(template_file: str, sink: Any = None, **parameters) -> Optional[str]:
+    """
+    Render a template without writing a file.
     
-    template_content = template_path.read_text(encoding='utf-8')
+    Without a sink the content is returned. With one, rendered segments are
+    streamed to it as they are produced and never joined into one string.
     
-    # Process template
-    processor = TemplateProcessor()
-    result = processor.process(template_content, parameters)
+    Args:
+        template_file: Path to template file
+        sink: Optional OutputSink, StringIO/BytesIO buffer, file descriptor (e.g. of
+            a pipe), file object or callable taking each segment
+        **parameters: Template parameters
+        
+    Returns:
+        Generated content, None when written to a sink
+        
+    Example:
+        body = render_template('request_TEMPLATE.json', ID='test123')
+        render_template('template.txt', sink=process.stdin, ID='test123')
+    """
+    return _render_template(template_file, sink, parameters, _new_processor())
+
+
+def generate_cached_file(output_file: str, template_file: str, cache_dir: str,
+                         **parameters) -> Tuple[datetime.datetime, bool]:
+    """
+    Generate file from template unless the same output was generated before.
     
-    # Write output
+    Outputs are stored in cache_dir under a hash of the template content, the
+    parameters and the part of the current time the template's date formats
+    print (e.g. the day for %Y-%m-%d), together with the library version. On a hit nothing is rendered: an output
+    file still identical to the cached one is left in place, otherwise it is
+    copied from cache_dir. Parameters that are iterators are never cached.
+    Outputs ending in .gz, .bz2 or .xz are compressed and cached compressed.
+    
+    Args:
+        output_file: Path to output file
+        template_file: Path to template file
+        cache_dir: Directory holding cached outputs, created when missing
+        **parameters: Template parameters
+        
+    Returns:
+        Tuple of (timestamp, cache_hit)
+        
+    Example:
+        now, cache_hit = generate_cached_file(
+            '/tmp/output.txt',
+            'template.txt',
+            '/tmp/template_cache',
+            ID='test123'
+        )
+    """
+    compiled = _TEMPLATE_CACHE.get(template_file)
     output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(result, encoding='utf-8')
+    processor = _new_processor()
+    key = compiled.cache_key(parameters, processor.now)
     
-    return result, processor.now
+    entry = None
+    if key is not None:
+        # Other library versions may render the same job differently, so they don't share entries
+        codec = _output_compression(output_path, None, None)
+        entry = Path(cache_dir) / f"{key}-{__version__}.out{'.' + codec[0] if codec else ''}"
+    if entry is not None and entry.is_file():
+        # Outputs copied from the cache share its size and mtime, anything else was changed since
+        cached, current = entry.stat(), output_path.stat() if output_path.is_file() else None
+        if current is None or (current.st_size, current.st_mtime_ns) != (cached.st_size, cached.st_mtime_ns):
+            _copy_file(entry, output_path)
+        return processor.now, True
+    
+    _write_chunks(output_path, compiled.iter_render(parameters, processor))
+    _keep_render_stats(processor.last_render_stats)
+    if entry is not None:
+        _copy_file(output_path, entry)
+    return processor.now, False
+
+
+def generate_files(template_file: str, jobs: Sequence[Sequence[Any]], workers: Optional[int] = None,
+                   executor: str = 'thread') -> List[datetime.datetime]:
+    """
+    Generate many files from one template.
+    
+    The template is parsed once and every file is rendered with its own INC
+    state and timestamp, exactly as separate generate_file calls would.
+    
+    Args:
+        template_file: Path to template file
+        jobs: List of (output_file, parameters) pairs, parameters being a dictionary
+        workers: Maximum number of files generated at the same time (pool default if not given)
+        executor: 'thread' or 'process'; processes use all CPU cores for rendering,
+            but parameters must be picklable
+        
+    Returns:
+        Timestamps used in generation, in the order of jobs
+        
+    Example:
+        generate_files('template.txt', [
+            ('/tmp/customer_1.txt', {'ID': 'c1'}),
+            ('/tmp/customer_2.txt', {'ID': 'c2'}),
+        ], workers=8)
+    """
+    batch = []
+    for job in jobs:
+        if len(job) != 2 or not isinstance(job[1], dict):
+            raise ValueError(f"Job should be an (output_file, parameters) pair, but got: {job}")
+        batch.append((str(job[0]), dict(job[1])))
+    workers = int(workers) if workers else None
+    
+    # Parse the template in this process first, so a missing file fails before any job starts
+    compiled = _TEMPLATE_CACHE.get(template_file)
+    
+    if executor == 'thread':
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [pool.submit(_generate_job, compiled, output_file, parameters)
+                       for output_file, parameters in batch]
+    elif executor == 'process':
+        options = _processor_options()
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_generate_job_in_process, template_file, output_file, parameters, options)
+                       for output_file, parameters in batch]
+        timestamps = []
+        for future in futures:
+            now, stats = future.result()
+            _keep_render_stats(stats)
+            timestamps.append(now)
+        return timestamps
+    else:
+        raise ValueError(f"Executor should be 'thread' or 'process', but got: {executor}")
+    
+    return [future.result() for future in futures]
+
+
+def validate_template(template_file: str, max_output_bytes: Optional[int] = None,
+                      max_output_lines: Optional[int] = None, **parameters) -> Dict[str, Any]:
+    """
+    Check template and parameters for every error generation would hit, without rendering.
+
+    Missing constants and loop inputs, a bad INDEXSHIFT and LOOPLIST sources not
+    matching their loop are reported together, along with the estimated size
+    of the output, so oversized jobs can be stopped before they start.
+
+    Args:
+        template_file: Path to template file
+        max_output_bytes: Fail if the output is estimated to be larger
+        max_output_lines: Fail if the output is estimated to have more lines
+        **parameters: Template parameters, as for generate_file
+
+    Returns:
+        Dictionary with estimated 'bytes' and 'lines' of the output, 'loops'
+        (loop name -> total iterations) and 'warnings', see TemplateProcessor.analyze()
+
+    Raises:
+        ValueError: Listing all errors found, including exceeded limits
+
+    Example:
+        report = validate_template('template.txt', max_output_bytes=10 ** 9, ID='test123', ROWS=10 ** 6)
+    """
+    report = _TEMPLATE_CACHE.get(template_file).analyze(parameters, _new_processor(),
+                                                         max_output_bytes, max_output_lines)
+    if not report['valid']:
+        raise ValueError(f"Template {template_file} is not valid:\n" + '\n'.join(report['errors']))
+    return report
+
+
+async def _run_limited(function, *args, **kwargs) -> Any:
+    """Run a blocking generation on the default executor, at most _ASYNC_CONCURRENCY at a time."""
+    loop = asyncio.get_running_loop()
+    limit, semaphore = _ASYNC_SEMAPHORES.get(loop, (None, None))
+    if limit != _ASYNC_CONCURRENCY:
+        semaphore = asyncio.Semaphore(_ASYNC_CONCURRENCY)
+        _ASYNC_SEMAPHORES[loop] = (_ASYNC_CONCURRENCY, semaphore)
+    async with semaphore:
+        return await loop.run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+
+async def agenerate_file(output_file: Any, template_file: str, *, render_workers: Optional[int] = None,
+                         max_output_bytes: Optional[int] = None, max_output_lines: Optional[int] = None,
+                         output_compression: Optional[str] = None, output_compression_level: Optional[int] = None,
+                         **parameters) -> datetime.datetime:
+    """
+    Generate file from template without blocking the event loop.
+    
+    Template reading, rendering and writing run on the event loop's default
+    executor; at most set_async_concurrency generations run at the same time,
+    the others wait without holding a thread. Arguments are those of generate_file.
+    
+    Returns:
+        Timestamp used in generation
+        
+    Example:
+        timestamps = await asyncio.gather(*(
+            agenerate_file(f'/tmp/customer_{index}.txt', 'template.txt', ID=str(index))
+            for index in range(100)
+        ))
+    """
+    return await _run_limited(generate_file, output_file, template_file, render_workers=render_workers,
+                              max_output_bytes=max_output_bytes, max_output_lines=max_output_lines,
+                              output_compression=output_compression,
+                              output_compression_level=output_compression_level, **parameters)
+
+
+async def agenerate_file_and_return_content(output_file: Any, template_file: str,
+                                            **parameters) -> Tuple[str, datetime.datetime]:
+    """
+    Generate file from template and return content and timestamp without blocking the event loop.
+    
+    Runs generate_file_and_return_content on the default executor, limited like agenerate_file.
+    
+    Returns:
+        Tuple of (generated_content, timestamp)
+        
+    Example:
+        content, now = await agenerate_file_and_return_content('/tmp/output.txt', 'template.txt', ID='test123')
+    """
+    return await _run_limited(generate_file_and_return_content, output_file, template_file, **parameters)
+
+
+def set_async_concurrency(limit: int) -> None:
+    """
+    Set how many agenerate_file and agenerate_file_and_return_content calls run at the same time.
+    
+    Args:
+        limit: Maximum number of concurrent generations (default 8)
+        
+    Example:
+        set_async_concurrency(32)
+    """
+    limit = int(limit)
+    if limit < 1:
+        raise ValueError(f"Async concurrency should be at least 1, but got: {limit}")
+    global _ASYNC_CONCURRENCY
+    _ASYNC_CONCURRENCY = limit
+
+
+def clear_template_cache() -> None:
+    """
+    Drop all parsed templates kept between keyword calls and reset hit/miss counters.
+    
+    Templates are re-read automatically when their file changes, so this is only
+    needed to free memory or to measure cold-start generation.
+    """
+    _TEMPLATE_CACHE.clear()
+
+
+def set_template_cache_size(size: int) -> None:
+    """
+    Set how many parsed templates are kept between keyword calls.
+    
+    Args:
+        size: Maximum number of cached templates, 0 disables caching
+        
+    Example:
+        set_template_cache_size(16)
+    """
+    _TEMPLATE_CACHE.resize(int(size))
+
+
+def get_template_cache_stats() -> Dict[str, int]:
+    """
+    Return template cache statistics.
+    
+    Returns:
+        Dictionary with size, capacity, hits and misses
+    """
+    return _TEMPLATE_CACHE.stats()
+
+
+def set_template_disk_cache(enabled: bool = True) -> None:
+    """
+    Turn on or off keeping parsed templates on disk for other processes.
+    
+    When on, a template not yet parsed in this process is loaded from
+    .tplcache/<template name>.tplc next to it, which is much faster than parsing
+    large templates; the file is written after parsing when missing or outdated.
+    It is only used for the same template text, library version and Python
+    version, so it never needs to be deleted by hand. Useful with pabot, where
+    every worker process would otherwise parse the same templates.
+    
+    Args:
+        enabled: True to read and write .tplcache/ files, False to always parse
+        
+    Example:
+        set_template_disk_cache(True)
+    """
+    _TEMPLATE_CACHE.disk_cache = bool(enabled)
+
+
+def set_template_codegen(enabled: bool = True) -> None:
+    """
+    Turn on or off rendering through Python functions generated from templates.
+    
+    Each template is translated once into a function with native loops and
+    local counters, which renders large loops about three times faster than
+    walking the parsed template. Output is identical either way.
+    
+    Args:
+        enabled: True to use generated functions, False to walk parsed templates
+        
+    Example:
+        set_template_codegen(True)
+    """
+    global _CODEGEN
+    _CODEGEN = bool(enabled)
+
+
+def set_render_profiling(enabled: bool = True) -> None:
+    """
+    Turn per-phase timing of generate_file, generate_file_and_return_content
+    and generate_files renders on or off.
+    
+    Profiled renders run in one process even when render_workers are given, and
+    split (max_output_bytes/max_output_lines) output is not profiled. Profiling
+    adds overhead, so absolute times are higher than without it; compare the
+    phases with each other.
+    
+    Args:
+        enabled: True to record statistics of every render, False to stop
+        
+    Example:
+        set_render_profiling(True)
+    """
+    global _RENDER_PROFILING
+    _RENDER_PROFILING = bool(enabled)
+
+
+def get_last_render_stats(log: bool = False) -> Dict[str, Any]:
+    """
+    Return statistics of the last render made while profiling was on.
+    
+    Args:
+        log: Also write a summary, slowest phase first, to the Robot Framework log
+        
+    Returns:
+        Dictionary with seconds and bytes of the whole render, 'phases' mapping
+        text, variable, date, constant, inc, loopinc, looplist, index, value and
+        loop to seconds, 'placeholders' mapping the same names to match counts and
+        'loops' mapping loop names to iterations
+        
+    Example:
+        set_render_profiling(True)
+        generate_file('/tmp/output.txt', 'template.txt', ROWS=100000)
+        stats = get_last_render_stats(log=True)
+    """
+    if _LAST_RENDER_STATS is None:
+        raise ValueError("No render statistics recorded, call set_render_profiling before generating files")
+    if log:
+        from robot.api import logger
+        logger.info(_LAST_RENDER_STATS.summary())
+    return _LAST_RENDER_STATS.as_dict()
+
+
+class TemplateProcessorLibrary:
+    """
+    Robot Framework library class offering the keywords of this module.
+    
+    Robot Framework uses this class when the library is imported by module name
+    or path. Parsed templates are cached for the whole process, so every
+    instance starts warm. With persistent_inc, INC counters continue across
+    keyword calls of one instance instead of starting from their base in every
+    file; how long they live follows the library scope: GLOBAL (this class)
+    for the whole run, TemplateProcessorLibrarySuiteScope per suite and
+    TemplateProcessorLibraryTestScope per test.
+    
+    Instances can be used from several threads. Rendering never takes a lock:
+    with persistent_inc, a call reserves the INC values it hands out before it
+    renders, so calls sharing the counters still render at the same time. Only
+    calls whose INC values depend on a loop over an iterator or data file hold
+    the counters until they finish.
+    
+    Example:
+        Library    TemplateProcessorLibrary.TemplateProcessorLibrarySuiteScope    persistent_inc=True
+    """
+    
+    ROBOT_LIBRARY_SCOPE = 'GLOBAL'
+    ROBOT_LIBRARY_VERSION = __version__
+    
+    def __init__(self, persistent_inc: bool = False):
+        """
+        Args:
+            persistent_inc: Continue INC counters across keyword calls
+        """
+        self.persistent_inc = bool(persistent_inc)
+        self._inc_values = {}
+        self._inc_lock = threading.Lock()
+    
+    @contextmanager
+    def _processor(self, template_file: str, parameters: Dict[str, Any]) -> Iterator[TemplateProcessor]:
+        """Processor for one keyword call, sharing this instance's INC state when persistent."""
+        processor = _new_processor()
+        if not self.persistent_inc:
+            yield processor
+            return
+        steps = _TEMPLATE_CACHE.get(template_file).inc_steps(parameters)
+        if steps is None:
+            with self._inc_lock:
+                # Work on a copy so a failing render leaves the counters as they were
+                processor.inc_values = dict(self._inc_values)
+                yield processor
+                self._inc_values = processor.inc_values
+            return
+        with self._inc_lock:
+            start = dict(self._inc_values)
+            reserved = {key: start.get(key, 0) + count for key, count in steps.items()}
+            self._inc_values.update(reserved)
+        processor.inc_values = dict(start)
+        try:
+            yield processor
+        except BaseException:
+            with self._inc_lock:
+                # Give the values back unless a later call already reserved values after them
+                if all(self._inc_values.get(key) == count for key, count in reserved.items()):
+                    for key in reserved:
+                        if key in start:
+                            self._inc_values[key] = start[key]
+                        else:
+                            del self._inc_values[key]
+            raise
+    
+    def generate_file(self, output_file: Any, template_file: str, *, render_workers: Optional[int] = None,
+                      max_output_bytes: Optional[int] = None, max_output_lines: Optional[int] = None,
+                      output_compression: Optional[str] = None, output_compression_level: Optional[int] = None,
+                      **parameters) -> datetime.datetime:
+        """
+        Generate file from template, see the generate_file function for all arguments.
+        
+        Returns:
+            Timestamp used in generation
+        """
+        with self._processor(template_file, parameters) as processor:
+            return _generate_file(output_file, template_file, render_workers, max_output_bytes, max_output_lines,
+                                  output_compression, output_compression_level, parameters, processor)
+    
+    def generate_file_and_return_content(self, output_file: Any, template_file: str,
+                                         **parameters) -> Tuple[str, datetime.datetime]:
+        """
+        Generate file from template and return both content and timestamp.
+        
+        Returns:
+            Tuple of (generated_content, timestamp)
+        """
+        with self._processor(template_file, parameters) as processor:
+            return _generate_content(output_file, template_file, parameters, processor)
+    
+    def render_template(self, template_file: str, sink: Any = None, **parameters) -> Optional[str]:
+        """
+        Render a template without writing a file, see the render_template function.
+        
+        Returns:
+            Generated content, None when written to a sink
+        """
+        with self._processor(template_file, parameters) as processor:
+            return _render_template(template_file, sink, parameters, processor)
+    
+    async def agenerate_file(self, output_file: Any, template_file: str, *,
+                             render_workers: Optional[int] = None,
+                             max_output_bytes: Optional[int] = None, max_output_lines: Optional[int] = None,
+                             output_compression: Optional[str] = None, output_compression_level: Optional[int] = None,
+                             **parameters) -> datetime.datetime:
+        """Generate file from template on an executor thread, limited by set_async_concurrency."""
+        return await _run_limited(self.generate_file, output_file, template_file, render_workers=render_workers,
+                                  max_output_bytes=max_output_bytes, max_output_lines=max_output_lines,
+                                  output_compression=output_compression,
+                                  output_compression_level=output_compression_level, **parameters)
+    
+    async def agenerate_file_and_return_content(self, output_file: Any, template_file: str,
+                                                **parameters) -> Tuple[str, datetime.datetime]:
+        """Generate file and return content and timestamp on an executor thread, limited like agenerate_file."""
+        return await _run_limited(self.generate_file_and_return_content, output_file, template_file, **parameters)
+    
+    def reset_inc_counters(self) -> None:
+        """Start INC counters kept with persistent_inc from their base again."""
+        with self._inc_lock:
+            self._inc_values = {}
+    
+    # Every file of these gets fresh counters, whatever persistent_inc is
+    generate_files = staticmethod(generate_files)
+    generate_cached_file = staticmethod(generate_cached_file)
+    validate_template = staticmethod(validate_template)
+    
+    set_async_concurrency = staticmethod(set_async_concurrency)
+    clear_template_cache = staticmethod(clear_template_cache)
+    set_template_cache_size = staticmethod(set_template_cache_size)
+    get_template_cache_stats = staticmethod(get_template_cache_stats)
+    set_template_disk_cache = staticmethod(set_template_disk_cache)
+    set_template_codegen = staticmethod(set_template_codegen)
+    set_render_profiling = staticmethod(set_render_profiling)
+    get_last_render_stats = staticmethod(get_last_render_stats)
+
+
+# Robot Framework before 6.1 would return the coroutine of an async keyword instead of running it
+if not _robot_runs_async(_ROBOT_VERSION):
+    for _name in ('agenerate_file', 'agenerate_file_and_return_content'):
+        getattr(TemplateProcessorLibrary, _name).robot_not_keyword = True
+
+
+class TemplateProcessorLibrarySuiteScope(TemplateProcessorLibrary):
+    """TemplateProcessorLibrary with one instance, and so one set of persistent counters, per suite."""
+    
+    ROBOT_LIBRARY_SCOPE = 'SUITE'
+
+
+class TemplateProcessorLibraryTestScope(TemplateProcessorLibrary):
+    """TemplateProcessorLibrary with one instance, and so one set of persistent counters, per test."""
+    
+    ROBOT_LIBRARY_SCOPE = 'TEST'
@@ -16,12 +16,60 @@ __version__ = "1.0.0"
 __author__ = "Robot Framework Template Processor Contributors"
 __license__ = "Apache-2.0"
 
-from TemplateProcessorCore import TemplateProcessor
-from TemplateProcessorLibrary import generate_file, generate_file_and_return_content
+from TemplateProcessorCore import TemplateProcessor, CompiledTemplate
+from TemplateProcessorLibrary import (
+    TemplateProcessorLibrary,
+    TemplateProcessorLibrarySuiteScope,
+    TemplateProcessorLibraryTestScope,
+    generate_file,
+    generate_file_and_return_content,
+    render_template,
+    generate_files,
+    generate_cached_file,
+    validate_template,
+    agenerate_file,
+    agenerate_file_and_return_content,
+    set_async_concurrency,
+    clear_template_cache,
+    set_template_cache_size,
+    get_template_cache_stats,
+    set_template_disk_cache,
+    set_template_codegen,
+    set_render_profiling,
+    get_last_render_stats,
+    OutputSink,
+    FileSink,
+    StreamSink,
+    MemorySink,
+    CallableSink,
+)
 
 __all__ = [
     "TemplateProcessor",
+    "CompiledTemplate",
+    "TemplateProcessorLibrary",
+    "TemplateProcessorLibrarySuiteScope",
+    "TemplateProcessorLibraryTestScope",
     "generate_file",
     "generate_file_and_return_content",
+    "render_template",
+    "generate_files",
+    "generate_cached_file",
+    "validate_template",
+    "agenerate_file",
+    "agenerate_file_and_return_content",
+    "set_async_concurrency",
+    "clear_template_cache",
+    "set_template_cache_size",
+    "get_template_cache_stats",
+    "set_template_disk_cache",
+    "set_template_codegen",
+    "set_render_profiling",
+    "get_last_render_stats",
+    "OutputSink",
+    "FileSink",
+    "StreamSink",
+    "MemorySink",
+    "CallableSink",
     "__version__",
 ]
@@ -0,0 +1,75 @@
+"""
+Benchmark for nested loop expansion.
+
+Renders a three level loop template (INDEX, VALUE and LOOPLIST references at
+every level) for growing loop sizes and prints time and throughput, so the
+cost per generated line can be checked to stay flat as nesting grows.
+
+Usage:
+    python benchmarks/bench_nested_loops.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TemplateProcessorCore import TemplateProcessor
+
+TEMPLATE = """\
+%%%LOOP@OUTER@o%%%
+outer %%%o.INDEX%%% %%%o.VALUE%%%
+%%%LOOP@MIDDLE@m%%%
+  middle %%%o.INDEX%%%.%%%m.INDEX%%% %%%LOOPLIST@MIDDLE_NAMES%%%
+%%%LOOP@INNER@i%%%
+    inner %%%o.INDEX%%%.%%%m.INDEX%%%.%%%INDEX%%% %%%i.VALUE%%% %%%LOOPLIST@INNER_NAMES%%%
+%%%LOOP@END@i%%%
+%%%LOOP@END@m%%%
+%%%LOOP@END@o%%%
+"""
+
+SIZES = [
+    (10, 100, 10),
+    (100, 100, 10),
+    (1000, 100, 10),
+]
+
+
+def build_parameters(outer: int, middle: int, inner: int) -> dict:
+    return {
+        'OUTER': outer,
+        'MIDDLE': [f'm{i}' for i in range(middle)],
+        'MIDDLE_NAMES': [f'middle-{i}' for i in range(middle)],
+        'INNER': [f'v{i}' for i in range(inner)],
+        'INNER_NAMES': [f'inner-{i}' for i in range(inner)],
+    }
+
+
+def run(sizes, repeat: int) -> None:
+    compiled = TemplateProcessor().compile(TEMPLATE)
+    print(f"{'sizes':>16} {'lines':>10} {'seconds':>9} {'MB/s':>8} {'us/line':>8}")
+    for outer, middle, inner in sizes:
+        parameters = build_parameters(outer, middle, inner)
+        best = None
+        size = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in compiled.iter_render(parameters))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        lines = outer * (1 + middle * (1 + inner))
+        print(f"{outer:>6}x{middle:>4}x{inner:>4} {lines:>10} {best:>9.3f} "
+              f"{size / best / 1e6:>8.1f} {best / lines * 1e6:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=3, help='runs per size, best time is reported')
+    args = parser.parse_args()
+    run(SIZES, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmark suite for TemplateProcessor.
+
+Renders a set of templates covering every placeholder type, loop sizes from
+10^2 to 10^6, nesting depth 1 to 4, LOOPLIST width and large parameter
+dictionaries. For every case it reports render time, peak memory traced by
+tracemalloc and throughput, writes the results as JSON and optionally compares
+them with a stored baseline, exiting with status 1 on regressions.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--output results.json] [--baseline baseline.json]
+                                        [--threshold 0.25] [--max-size 100000] [--filter loop_size]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TemplateProcessorCore import TemplateProcessor
+
+
+class BenchmarkCase:
+    """One template with a parameters factory; size is the number of generated rows."""
+
+    def __init__(self, name: str, template: str, parameters: Callable[[], Dict[str, Any]], size: int):
+        self.name = name
+        self.template = template
+        self.parameters = parameters
+        self.size = size
+
+
+def _row_loop(body: str) -> str:
+    return f"Header\n%%%LOOP@ROWS@rows%%%\n{body}\n%%%LOOP@END@rows%%%\nFooter\n"
+
+
+PLACEHOLDER_ROWS = 10000
+
+PLACEHOLDER_BODIES = {
+    'text': "Row without placeholders",
+    'variable': "Row ${NAME} ${NAME} ${NAME}",
+    'constant': "Row %%%CONSTANT@NAME%%% %%%CONSTANT@NAME%%% %%%CONSTANT@NAME%%%",
+    'now': "Row %%%NOW@-1@%Y-%m-%d%%% %%%NOW@0@%H:%M:%S%%% %%%NOW@30@%Y-%m-%d%%%",
+    'monthdelta': "Row %%%MONTHDELTA@-1@%Y-%m%%% %%%MONTHDELTA@1@%Y-%m%%% %%%MONTHDELTA@12@%Y-%m%%%",
+    'inc': "Row %%%INC@1@1%%% %%%INC@0.5@0.25%%% %%%INC@100@-1%%%",
+    'loopinc': "Row %%%LOOPINC@1@1%%% %%%LOOPINC@0.5@0.25%%% %%%LOOPINC@100@-1%%%",
+    'looplist': "Row %%%LOOPLIST@A%%% %%%LOOPLIST@B%%% %%%LOOPLIST@C%%%",
+    'index': "Row %%%INDEX%%% %%%rows.INDEX%%% %%%rows.INDEX%%%",
+    'value': "Row %%%rows.VALUE%%% %%%rows.VALUE%%% %%%rows.VALUE%%%",
+    'random': "Row %%%RANDOM@1@1000%%% %%%RANDOM@0.5@99.5%%% %%%RANDOMLIST@A%%%",
+}
+
+
+def _placeholder_parameters() -> Dict[str, Any]:
+    rows = [f'value{index}' for index in range(PLACEHOLDER_ROWS)]
+    return {'ROWS': rows, 'NAME': 'customer', 'A': rows, 'B': rows, 'C': rows, 'RANDOMSEED': 1}
+
+
+def _nested_template(depth: int) -> str:
+    opening = ''.join(f"%%%LOOP@L{level}@l{level}%%%\n" for level in range(depth))
+    indexes = '.'.join(f"%%%l{level}.INDEX%%%" for level in range(depth))
+    closing = ''.join(f"%%%LOOP@END@l{level}%%%\n" for level in reversed(range(depth)))
+    return f"Header\n{opening}Row {indexes} %%%INC@1@1%%%\n{closing}Footer\n"
+
+
+def _looplist_template(width: int) -> str:
+    columns = ';'.join(f"%%%LOOPLIST@C{column}%%%" for column in range(width))
+    return _row_loop(f"Row %%%INDEX%%% {columns}")
+
+
+def _large_parameters_template() -> str:
+    return _row_loop("Row %%%CONSTANT@P0%%% ${P1} %%%CONSTANT@P2%%% ${P3}")
+
+
+def build_cases() -> List[BenchmarkCase]:
+    """All benchmark cases, grouped by name prefix."""
+    cases = []
+    for name, body in PLACEHOLDER_BODIES.items():
+        cases.append(BenchmarkCase(f'placeholder_{name}', _row_loop(body), _placeholder_parameters, PLACEHOLDER_ROWS))
+
+    for exponent in range(2, 7):
+        size = 10 ** exponent
+        cases.append(BenchmarkCase(
+            f'loop_size_1e{exponent}', _row_loop("Row %%%INDEX%%%: %%%rows.VALUE%%% %%%INC@1@1%%%"),
+            lambda size=size: {'ROWS': size}, size
+        ))
+
+    for depth in range(1, 5):
+        level_size = round(100000 ** (1 / depth))
+        cases.append(BenchmarkCase(
+            f'nesting_depth_{depth}', _nested_template(depth),
+            lambda depth=depth, level_size=level_size: {f'L{level}': level_size for level in range(depth)},
+            level_size ** depth
+        ))
+
+    for width in (1, 4, 16, 64):
+        cases.append(BenchmarkCase(
+            f'looplist_width_{width}', _looplist_template(width),
+            lambda width=width: dict(
+                {f'C{column}': [f'c{column}_{row}' for row in range(10000)] for column in range(width)},
+                ROWS=10000
+            ),
+            10000
+        ))
+
+    for entries in (1000, 100000):
+        cases.append(BenchmarkCase(
+            f'parameters_{entries}', _large_parameters_template(),
+            lambda entries=entries: dict({f'P{index}': f'value{index}' for index in range(entries)}, ROWS=10000),
+            10000
+        ))
+    return cases
+
+
+def measure(case: BenchmarkCase, repeat: int, memory: bool, codegen: bool = False) -> Dict[str, Any]:
+    """Render a case repeat times and return the best time, output size and peak memory."""
+    parameters = case.parameters()
+    start = time.perf_counter()
+    compiled = TemplateProcessor().compile(case.template)
+    compile_seconds = time.perf_counter() - start
+
+    best = None
+    output_size = 0
+    for _ in range(repeat):
+        processor = TemplateProcessor(codegen=codegen)
+        start = time.perf_counter()
+        output_size = sum(len(chunk) for chunk in compiled.iter_render(parameters, processor))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    result = {
+        'rows': case.size,
+        'compile_seconds': round(compile_seconds, 6),
+        'seconds': round(best, 6),
+        'output_mb': round(output_size / 1e6, 3),
+        'mb_per_s': round(output_size / 1e6 / best, 2) if best else None,
+        'peak_mb': None,
+    }
+    if memory:
+        # Measured in a separate run, tracemalloc slows rendering down considerably
+        tracemalloc.start()
+        try:
+            for _ in compiled.iter_render(parameters, TemplateProcessor(codegen=codegen)):
+                pass
+            result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 3)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> List[str]:
+    """Return names of cases whose time grew by more than threshold relative to the baseline."""
+    regressions = []
+    print(f"\n{'case':<24} {'baseline s':>11} {'current s':>11} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline or not baseline[name].get('seconds'):
+            continue
+        change = result['seconds'] / baseline[name]['seconds'] - 1
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{name:<24} {baseline[name]['seconds']:>11.4f} {result['seconds']:>11.4f} {change:>+7.0%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown reported as regression (default 0.25)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, best time is reported')
+    parser.add_argument('--max-size', type=int, default=10 ** 6, help='skip cases generating more rows')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--codegen', action='store_true', help='render with the code generation backend')
+    args = parser.parse_args(argv)
+
+    cases = [case for case in build_cases() if args.filter in case.name and case.size <= args.max_size]
+    results = {}
+    print(f"{'case':<24} {'rows':>9} {'seconds':>9} {'MB/s':>8} {'peak MB':>8}")
+    for case in cases:
+        result = results[case.name] = measure(case, args.repeat, not args.no_memory, args.codegen)
+        peak = f"{result['peak_mb']:.2f}" if result['peak_mb'] is not None else '-'
+        print(f"{case.name:<24} {case.size:>9} {result['seconds']:>9.4f} {result['mb_per_s']:>8.1f} {peak:>8}")
+
+    if args.output:
+        report = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': 'codegen' if args.codegen else 'nodes',
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
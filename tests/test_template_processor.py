@@ -1,7 +1,9 @@
 """Tests for TemplateProcessor module."""
 
 import unittest
+import tempfile
 import datetime
+import collections
 from unittest.mock import patch
 import sys
 import os
@@ -9,7 +11,9 @@ import os
 # Add parent directory to path to import TemplateProcessorCore
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from TemplateProcessorCore import TemplateProcessor
+from TemplateProcessorCore import TemplateProcessor, CompiledTemplate, PARALLEL_MIN_CHUNK
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 
 
 class TestTemplateProcessor(unittest.TestCase):
@@ -42,6 +46,16 @@ class TestTemplateProcessor(unittest.TestCase):
         result = processor.process("Tomorrow: %%%NOW@1@%Y-%m-%d%%%", {})
         self.assertEqual(result, "Tomorrow: 2023-01-16")
 
+    def test_process_dates_follow_changed_now(self):
+        """Test memoized date results are recomputed when now is replaced."""
+        processor = TemplateProcessor()
+        compiled = processor.compile("%%%NOW@-1@%Y-%m-%d%%% %%%MONTHDELTA@1@%Y-%m%%% %%%NOW@${D}@%d%%%")
+        processor.now = datetime.datetime(2023, 1, 15, 12, 0, 0)
+        self.assertEqual(compiled.render({'D': 2}), "2023-01-14 2023-02 17")
+        self.assertEqual(compiled.render({'D': 3}), "2023-01-14 2023-02 18")
+        processor.now = datetime.datetime(2024, 3, 1, 12, 0, 0)
+        self.assertEqual(compiled.render({'D': 2}), "2024-02-29 2024-04 03")
+
     def test_process_monthdelta_placeholder(self):
         """Test process with MONTHDELTA placeholder."""
         processor = TemplateProcessor()
@@ -102,6 +116,21 @@ class TestTemplateProcessor(unittest.TestCase):
         result = processor.process(template, {})
         self.assertEqual(result, "A: 1.0, B: 2.0, A: 1.1")
 
+    def test_process_inc_exact_decimals(self):
+        """Test INC values stay exact over many steps and for tiny increments."""
+        processor = TemplateProcessor()
+        result = processor.process("%%%LOOP@N@n%%%%%%INC@0.1@0.1%%% %%%LOOP@END@n%%%", {'N': 100000})
+        self.assertTrue(result.endswith("9999.9 10000.0 "))
+        self.assertEqual(processor.process("%%%INC@0@0.00001%%% %%%INC@0@0.00001%%%", {}), "0.0 1e-05")
+
+    def test_advance_counter_skips_ahead(self):
+        """Test advancing a counter by many steps gives the value of the last step."""
+        processor = TemplateProcessor()
+        values = {}
+        self.assertEqual(processor._advance_counter(values, 0.5, 0.125, 1000001), 125000.5)
+        self.assertEqual(processor._next_inc(0.5, 0.125), "0.5")
+        self.assertEqual(processor._advance_counter(values, 0.5, 0.125), 125000.625)
+
     def test_process_loop_with_integer(self):
         """Test process with LOOP placeholder using integer."""
         processor = TemplateProcessor()
@@ -213,6 +242,38 @@ Value: %%%LOOPINC@5.0@1.5%%%
         
         self.assertIn("LOOPLIST 'MYLIST1' must be a list", str(context.exception))
 
+    def test_process_loop_with_iterables(self):
+        """Test loop inputs and LOOPLIST sources may be ranges, tuples and generators."""
+        processor = TemplateProcessor()
+        template = "%%%LOOP@ITEMS@l%%%%%%l.VALUE%%%=%%%LOOPLIST@NAMES%%% %%%LOOP@END@l%%%"
+        parameters = {
+            'ITEMS': range(10, 13),
+            'NAMES': (name for name in ['a', 'b', 'c']),
+        }
+        self.assertEqual(processor.process(template, parameters), "10=a 11=b 12=c ")
+        parameters = {'ITEMS': iter([1, 2]), 'NAMES': ('x', 'y')}
+        self.assertEqual(processor.process(template, parameters), "1=x 2=y ")
+
+    def test_process_loop_iterable_length_mismatch(self):
+        """Test LOOPLIST sources without a length are checked when one side runs out."""
+        processor = TemplateProcessor()
+        template = "%%%LOOP@ITEMS@l%%%%%%LOOPLIST@NAMES%%%%%%LOOP@END@l%%%"
+        with self.assertRaises(ValueError) as context:
+            processor.process(template, {'ITEMS': 3, 'NAMES': iter(['a', 'b'])})
+        self.assertIn("LOOPLIST 'NAMES' length (2) does not match loop size (at least 3)", str(context.exception))
+        with self.assertRaises(ValueError) as context:
+            processor.process(template, {'ITEMS': iter(range(2)), 'NAMES': ['a', 'b', 'c']})
+        self.assertIn("LOOPLIST 'NAMES' length (at least 3) does not match loop size (2)", str(context.exception))
+
+    def test_process_loop_iterator_used_twice(self):
+        """Test a one-shot iterator cannot be the input of a loop that runs more than once."""
+        processor = TemplateProcessor()
+        template = "%%%LOOP@OUTER@o%%%%%%LOOP@INNER@i%%%%%%i.VALUE%%%%%%LOOP@END@i%%%%%%LOOP@END@o%%%"
+        self.assertEqual(processor.process(template, {'OUTER': 1, 'INNER': iter('ab')}), "ab")
+        with self.assertRaises(ValueError) as context:
+            processor.process(template, {'OUTER': 2, 'INNER': iter('ab')})
+        self.assertIn("Loop input 'INNER' is an iterator that is already used up", str(context.exception))
+
     def test_process_complex_template(self):
         """Test process with multiple placeholder types."""
         processor = TemplateProcessor()
@@ -239,6 +300,74 @@ Values: 10.0,11.0
   Item 2: 1"""
         self.assertEqual(result, expected)
 
+    def test_process_robot_variables(self):
+        """Test process replaces ${var} references with scalar parameter values."""
+        processor = TemplateProcessor()
+        parameters = {'Data': '/data/', 'ITEMS': ['a', 'b'], 'COUNT': 3}
+        
+        result = processor.process("Path: ${Data}, Items: ${ITEMS}, Count: ${COUNT}, Other: ${Other}", parameters)
+        self.assertEqual(result, "Path: /data/, Items: ${ITEMS}, Count: 3, Other: ${Other}")
+
+    def test_process_variables_in_ids(self):
+        """Test CONSTANT, LOOP input and LOOPLIST IDs may be given as ${var} references."""
+        processor = TemplateProcessor()
+        parameters = {'KEY': 'ID', 'ID': 'val', 'IN': 'ROWS', 'ROWS': ['a', 'b'], 'COL': 'NAMES', 'NAMES': ['x', 'y']}
+        template = "%%%CONSTANT@${KEY}%%%\n%%%LOOP@${IN}@l%%%\n%%%l.VALUE%%%=%%%LOOPLIST@${COL}%%%\n%%%LOOP@END@l%%%"
+
+        self.assertEqual(processor.process("%%%CONSTANT@${KEY}%%%", parameters), "val")
+        self.assertEqual(processor.process("%%%LOOP@${IN}@l%%%%%%l.VALUE%%%%%%LOOP@END@l%%%", parameters), "ab")
+        self.assertEqual(processor.process(template, parameters), "val\na=x\nb=y")
+        compiled = processor.compile(template)
+        self.assertEqual(compiled.render(parameters, TemplateProcessor(codegen=True)), "val\na=x\nb=y")
+        self.assertTrue(processor.analyze(template, parameters)['valid'])
+
+        with self.assertRaises(ValueError) as context:
+            processor.process("%%%CONSTANT@${KEY}%%%", {'KEY': 'OTHER'})
+        self.assertEqual(str(context.exception), "Missing constant for ID: OTHER in pattern: %%%CONSTANT@OTHER%%%")
+        with self.assertRaises(ValueError) as context:
+            processor.process(template, dict(parameters, COL='MISSING'))
+        self.assertEqual(str(context.exception), "Missing LOOPLIST constant for ID: MISSING")
+
+    def test_process_substituted_values_not_rescanned(self):
+        """Test values inserted into the output are not interpreted as placeholders."""
+        processor = TemplateProcessor()
+        parameters = {'NOTE': '%%%INC@1@1%%%', 'VAR': '%%%CONSTANT@NOTE%%%'}
+        
+        result = processor.process("%%%CONSTANT@NOTE%%% ${VAR} %%%INC@5@1%%%", parameters)
+        self.assertEqual(result, "%%%INC@1@1%%% %%%CONSTANT@NOTE%%% 5.0")
+
+    def test_process_inc_in_document_order(self):
+        """Test INC counters advance in document order inside and outside loops."""
+        processor = TemplateProcessor()
+        template = """A %%%INC@1@1%%%
+%%%LOOP@COUNT@l%%%
+B %%%INC@1@1%%%
+%%%LOOP@END@l%%%
+C %%%INC@1@1%%%"""
+        result = processor.process(template, {'COUNT': 2})
+        self.assertEqual(result, "A 1.0\nB 2.0\nB 3.0\nC 4.0")
+
+    def test_process_unresolved_placeholders_kept(self):
+        """Test loop-only placeholders outside loops and unknown loop names stay as text."""
+        processor = TemplateProcessor()
+        template = "%%%INDEX%%% %%%LOOPINC@1@1%%% %%%LOOPLIST@L%%% %%%other.VALUE%%% %%%LOOP@END@x%%%"
+        result = processor.process(template, {'L': [1]})
+        self.assertEqual(result, template)
+        self.assertEqual(processor.process("%%%NOW@1-1@%Y%%% %%%NOW@--1@%Y%%%", {}),
+                         "%%%NOW@1-1@%Y%%% %%%NOW@--1@%Y%%%")
+
+    def test_process_bad_arguments_fail_when_rendered(self):
+        """Test INC and date arguments that don't parse only raise where they are rendered."""
+        processor = TemplateProcessor()
+        template = "a%%%LOOP@N@l%%%%%%INC@1.2.3@1%%%%%%NOW@-@%Y%%%%%%LOOPINC@1..@1%%%%%%LOOP@END@l%%%b"
+        self.assertEqual(processor.process(template, {'N': 0}), "ab")
+        self.assertEqual(processor.compile(template).render({'N': 0}, TemplateProcessor(codegen=True)), "ab")
+        self.assertTrue(processor.analyze(template, {'N': 0})['valid'])
+        for placeholder in ("%%%INC@1.2.3@1%%%", "%%%NOW@-@%Y%%%"):
+            with self.assertRaises(ValueError):
+                processor.process(placeholder, {})
+            self.assertFalse(processor.analyze(placeholder, {})['valid'])
+
     def test_monthdelta_positive_delta(self):
         """Test _monthdelta with positive delta."""
         processor = TemplateProcessor()
@@ -290,5 +419,600 @@ Values: 10.0,11.0
         self.assertEqual(result, expected)
 
 
+class TestCompiledTemplate(unittest.TestCase):
+    """Test cases for TemplateProcessor.compile() and CompiledTemplate."""
+
+    def test_compile_returns_compiled_template(self):
+        """Test compile returns reusable CompiledTemplate."""
+        processor = TemplateProcessor()
+        compiled = processor.compile("ID: %%%CONSTANT@ID%%%")
+        self.assertIsInstance(compiled, CompiledTemplate)
+        self.assertEqual(compiled.render({'ID': 'a'}), "ID: a")
+        self.assertEqual(compiled.render({'ID': 'b'}), "ID: b")
+
+    def test_render_nested_loops(self):
+        """Test compiled rendering of nested loops with LOOPLIST, LOOPINC and named indexes."""
+        template = """Header %%%INC@1@1%%%
+%%%LOOP@OUTER@outer%%%
+Outer[%%%INDEX%%%]: %%%outer.VALUE%%% %%%LOOPLIST@CODES%%%
+  %%%LOOP@INNER@inner%%%
+  Inner[%%%INDEX%%%/%%%outer.INDEX%%%]: %%%inner.VALUE%%% - %%%LOOPINC@1@0.5%%%
+  %%%LOOP@END@inner%%%
+%%%LOOP@END@outer%%%
+Footer %%%INC@1@1%%%"""
+        parameters = {
+            'OUTER': ['A', 'B'],
+            'CODES': ['x', 'y'],
+            'INNER': 3,
+            'INDEXSHIFT': 1
+        }
+        result = TemplateProcessor().compile(template).render(parameters)
+        self.assertEqual(result, "Header 1.0\nOuter[1]: A x\n  Inner[1/1]: 0 - 1.0\n  Inner[2/1]: 1 - 1.5\n"
+                                 "  Inner[3/1]: 2 - 2.0\nOuter[2]: B y\n  Inner[1/2]: 0 - 1.0\n"
+                                 "  Inner[2/2]: 1 - 1.5\n  Inner[3/2]: 2 - 2.0\nFooter 2.0")
+
+    def test_render_data_templates(self):
+        """Test compiled rendering of example templates matches their expected output in tests/data/expected."""
+        now = datetime.datetime(2024, 1, 31, 13, 45, 7)
+        cases = {
+            'DateTimeEdgeCases': {'ID': 'dt'},
+            'MultipleINC': {'ID': 'inc'},
+            'NestedLoops': {'ID': 'nested', 'OUTERLOOP': ['A', 'B'], 'INNERLOOP': ['1', '2']},
+            'NamedLoopIndex': {'ID': 'named', 'ITEMS': ['a', 'b'], 'OUTER': ['X', 'Y'], 'INNER': [1, 2, 3]},
+            'LoopWithVars': {
+                'MYLOOPINPUT': 3, 'INDEXSHIFT': 1, 'MYLIST1': ['a', 'b', 'c'], 'MYLIST2': [1, 2, 3],
+                'NOTE': 'note', 'start_value': 3, 'inc_value': 1
+            },
+        }
+        for name, parameters in cases.items():
+            with self.subTest(template=name):
+                with open(os.path.join(DATA_DIR, f"{name}_TEMPLATE.txt"), encoding='utf-8') as template_file:
+                    template = template_file.read()
+                with open(os.path.join(DATA_DIR, 'expected', f"{name}.txt"), encoding='utf-8') as expected_file:
+                    expected = expected_file.read()
+                processor = TemplateProcessor()
+                processor.now = now
+                self.assertEqual(processor.compile(template).render(parameters), expected)
+
+    def test_render_uses_given_processor_state(self):
+        """Test render uses now and INC state of the given processor."""
+        compiled = TemplateProcessor().compile("%%%NOW@0@%Y-%m-%d%%% %%%INC@1@1%%%")
+        processor = TemplateProcessor()
+        processor.now = datetime.datetime(2023, 1, 15, 12, 0, 0)
+        self.assertEqual(compiled.render({}, processor), "2023-01-15 1.0")
+        self.assertEqual(compiled.render({}, processor), "2023-01-15 2.0")
+
+    def test_render_robot_variables(self):
+        """Test ${var} references are resolved at render time, lists left untouched."""
+        compiled = TemplateProcessor().compile("${A} ${B} ${C} %%%INC@${A}@1%%%")
+        self.assertEqual(compiled.render({'A': 5, 'B': [1, 2]}), "5 ${B} ${C} 5.0")
+
+    def test_render_resolves_each_variable_once(self):
+        """Test a variable used in every loop iteration is converted to text once per render."""
+        class Counted:
+            calls = 0
+
+            def __str__(self):
+                Counted.calls += 1
+                return 'v'
+
+        compiled = TemplateProcessor().compile("%%%LOOP@ROWS@r%%%\n${V} ${V} %%%INC@${N}@1%%%\n%%%LOOP@END@r%%%")
+        self.assertEqual(compiled.render({'ROWS': 100, 'V': Counted(), 'N': 1}).count('v v'), 100)
+        self.assertEqual(Counted.calls, 1)
+        self.assertEqual(compiled.render({'ROWS': 1, 'V': {'a': 1}, 'N': 1}, TemplateProcessor()), "${V} ${V} 1.0")
+
+    def test_loop_invariants_rendered_once(self):
+        """Test constants and dates inside loops are rendered once per render, only when a loop runs."""
+        class CountingProcessor(TemplateProcessor):
+            calls = 0
+
+            def _constant_value(self, *args):
+                CountingProcessor.calls += 1
+                return super()._constant_value(*args)
+
+        processor = CountingProcessor()
+        processor.now = datetime.datetime(2023, 1, 15, 12, 0, 0)
+        compiled = processor.compile(
+            "%%%LOOP@ROWS@r%%%\n%%%CONSTANT@A%%% %%%NOW@0@%d%%% %%%INDEX%%%\n%%%LOOP@END@r%%%\n"
+            "%%%LOOP@ROWS@p%%%\npad %%%CONSTANT@A%%%\n%%%LOOP@END@p%%%"
+        )
+        result = compiled.render({'ROWS': 5000, 'A': 'a'})
+        self.assertEqual(result, '\n'.join(f"a 15 {row}" for row in range(5000)) + '\n' + '\n'.join(['pad a'] * 5000))
+        self.assertEqual(CountingProcessor.calls, 2)
+        self.assertEqual(compiled.render({'ROWS': 0}), '\n')
+        for rows, count in ((iter(()), 0), (iter('ab'), 2), (3, 3)):
+            self.assertEqual(TemplateProcessor().process("%%%LOOP@R@r%%%[${A}]%%%LOOP@END@r%%%", {'R': rows, 'A': 1}),
+                             "[1]" * count)
+
+    def test_iter_render_yields_chunks(self):
+        """Test iter_render streams large loops in several chunks with the same result."""
+        template = "Start\n%%%LOOP@COUNT@rows%%%\nRow %%%INDEX%%%: %%%LOOPINC@1@1%%%\n%%%LOOP@END@rows%%%\nEnd"
+        parameters = {'COUNT': 10000}
+        chunks = list(TemplateProcessor().iter_render(template, parameters))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), TemplateProcessor().process(template, parameters))
+
+    def test_split_render_joins_to_render(self):
+        """Test split_render gives header, iterations and footer that join to render()."""
+        template = ("Head %%%INC@1@1%%%\n%%%LOOP@ROWS@r%%%\nRow %%%INDEX%%% %%%INC@1@1%%% %%%LOOPINC@5@5%%%\n"
+                    "%%%LOOP@END@r%%%\nFoot %%%INC@1@1%%%")
+        serial = TemplateProcessor()
+        expected = serial.process(template, {'ROWS': 3})
+        processor = TemplateProcessor()
+        header, iterations, separator, footer = processor.compile(template).split_render({'ROWS': 3})
+        self.assertEqual(header, "Head 1.0\n")
+        self.assertEqual(footer, "\nFoot 5.0")
+        self.assertEqual(header + separator.join(iterations) + footer, expected)
+        self.assertEqual(processor.inc_values, serial.inc_values)
+
+    def test_split_render_lazy_loop(self):
+        """Test split_render streams generator loops, unless INC follows the loop."""
+        template = "Head\n%%%LOOP@ROWS@r%%%\nRow %%%r.VALUE%%%\n%%%LOOP@END@r%%%\nFoot"
+        header, iterations, separator, footer = TemplateProcessor().compile(template).split_render(
+            {'ROWS': (value * 2 for value in range(3))})
+        self.assertEqual(list(iterations), ["Row 0", "Row 2", "Row 4"])
+        compiled = TemplateProcessor().compile(template + " %%%INC@1@1%%%")
+        with self.assertRaises(ValueError):
+            compiled.split_render({'ROWS': iter(range(3))})
+
+    def test_split_render_needs_one_loop(self):
+        """Test split_render rejects templates without exactly one top-level loop."""
+        compiled = TemplateProcessor().compile("%%%LOOP@A@a%%%x%%%LOOP@END@a%%%%%%LOOP@A@b%%%y%%%LOOP@END@b%%%")
+        with self.assertRaises(ValueError) as context:
+            compiled.split_render({'A': 1})
+        self.assertIn("exactly one top-level loop", str(context.exception))
+
+    def test_render_errors(self):
+        """Test compiled rendering raises the same errors as process()."""
+        processor = TemplateProcessor()
+        compiled = processor.compile("%%%LOOP@ITEMS@l%%%%%%LOOPLIST@L%%%%%%LOOP@END@l%%%")
+        with self.assertRaises(ValueError) as context:
+            compiled.render({})
+        self.assertIn("Missing loop input for ID: ITEMS", str(context.exception))
+        with self.assertRaises(ValueError) as context:
+            compiled.render({'ITEMS': 2, 'L': ['a']})
+        self.assertIn("length (1) does not match loop size (2)", str(context.exception))
+        with self.assertRaises(ValueError) as context:
+            processor.compile("%%%CONSTANT@X%%%").render({})
+        self.assertIn("Missing constant for ID: X", str(context.exception))
+
+    def test_profiled_render_records_stats(self):
+        """Test profiling keeps output unchanged and counts placeholders, loops and bytes."""
+        template = """${NAME} %%%INC@1@1%%%
+%%%LOOP@ROWS@rows%%%
+%%%INDEX%%% %%%LOOPLIST@L%%% %%%NOW@0@%Y%%%
+%%%LOOP@COLS@cols%%%
+  %%%cols.VALUE%%% ${NAME}
+%%%LOOP@END@cols%%%
+%%%LOOP@END@rows%%%
+Tail é"""
+        parameters = {'NAME': 'n', 'ROWS': 3, 'L': ['a', 'b', 'c'], 'COLS': ['x', 'y']}
+        processor = TemplateProcessor(profile=True)
+        result = processor.compile(template).render(parameters)
+        self.assertEqual(result, TemplateProcessor().process(template, parameters))
+
+        stats = processor.last_render_stats.as_dict()
+        self.assertEqual(stats['bytes'], len(result.encode('utf-8')))
+        self.assertEqual(stats['loops'], {'rows': 3, 'cols': 6})
+        self.assertEqual(stats['placeholders'], {
+            'variable': 7, 'inc': 1, 'index': 3, 'looplist': 3, 'date': 3, 'value': 6
+        })
+        self.assertEqual(set(stats['phases']), {'text', 'loop'} | set(stats['placeholders']))
+        self.assertAlmostEqual(sum(stats['phases'].values()), stats['seconds'])
+        self.assertIn("loop cols: 6 iterations", processor.last_render_stats.summary())
+        self.assertIsNone(TemplateProcessor().last_render_stats)
+
+    def test_cache_key(self):
+        """Test cache keys follow template, parameters and the printed part of now."""
+        compiled = TemplateProcessor().compile("%%%NOW@1@%Y-%m-%d%%% ${A} %%%INC@1@1%%%")
+        now = datetime.datetime(2024, 5, 6, 7, 8, 9)
+        key = compiled.cache_key({'A': [1, 2]}, now)
+        self.assertEqual(key, compiled.cache_key({'A': [1, 2]}, now.replace(hour=23)))
+        self.assertNotEqual(key, compiled.cache_key({'A': [1, 2]}, now.replace(day=7)))
+        self.assertNotEqual(key, compiled.cache_key({'A': [1, 3]}, now))
+        self.assertNotEqual(key, compiled.cache_key({'A': ('1', '2')}, now))
+        self.assertNotEqual(key, TemplateProcessor().compile("%%%NOW@2@%Y-%m-%d%%% ${A}").cache_key({'A': [1, 2]}, now))
+        self.assertIsNone(compiled.cache_key({'A': iter([1, 2])}, now))
+
+        undated = TemplateProcessor().compile("${A}")
+        self.assertEqual(undated.cache_key({'A': 1}, now), undated.cache_key({'A': 1}, datetime.datetime(2000, 1, 1)))
+        timed = TemplateProcessor().compile("%%%NOW@0@%H:%M%%%")
+        self.assertEqual(timed.cache_key({}, now), timed.cache_key({}, now.replace(second=59)))
+        self.assertNotEqual(timed.cache_key({}, now), timed.cache_key({}, now.replace(minute=9)))
+
+        # A day offset can move the printed month, so the key changes with the day
+        shifted = TemplateProcessor().compile("%%%NOW@-1@%Y-%m%%%")
+        first, second = datetime.datetime(2024, 2, 1), datetime.datetime(2024, 2, 2)
+        self.assertNotEqual(shifted.cache_key({}, first), shifted.cache_key({}, second))
+        self.assertEqual(shifted.cache_key({}, second), shifted.cache_key({}, second.replace(hour=23)))
+
+    def test_inc_steps(self):
+        """Test INC values of a render are counted, and unknown when a loop runs over an iterator."""
+        compiled = TemplateProcessor().compile(
+            "%%%INC@1@1%%%\n%%%LOOP@ROWS@r%%%\n%%%INC@1@1%%% %%%INC@${B}@2%%% %%%LOOPINC@1@1%%%\n%%%LOOP@END@r%%%")
+        self.assertEqual(compiled.inc_steps({'ROWS': 3, 'B': 5}), {(1.0, 1.0): 4, (5.0, 2.0): 3})
+        self.assertIsNone(compiled.inc_steps({'ROWS': iter('ab'), 'B': 5}))
+
+    def test_serialized_template_round_trip(self):
+        """Test load_compiled restores an equal template and rejects data of other templates."""
+        template = """%%%NOW@0@%Y%%% ${A} %%%INC@0.5@0.25%%%
+%%%LOOP@ITEMS@outer%%%
+%%%outer.INDEX%%% %%%LOOPLIST@L%%%
+%%%LOOP@INNER@inner%%%
+  %%%LOOPINC@1@1%%% %%%inner.VALUE%%% %%%CONSTANT@A%%%
+%%%LOOP@END@inner%%%
+%%%LOOP@END@outer%%%"""
+        processor = TemplateProcessor()
+        data = processor.compile(template).to_bytes()
+        loaded = processor.load_compiled(data, template)
+        parameters = {'A': 'a', 'ITEMS': 2, 'L': ['x', 'y'], 'INNER': ['p', 'q']}
+        self.assertEqual(loaded.render(parameters), TemplateProcessor().process(template, parameters))
+        self.assertIsNone(processor.load_compiled(data, template + " "))
+        self.assertIsNone(processor.load_compiled(b"damaged", template))
+        self.assertIsNone(processor.load_compiled(data[:len(data) // 2], template))
+
+    def test_codegen_matches_node_rendering(self):
+        """Test the codegen backend renders, counts and fails exactly like node rendering."""
+        template = """${NAME} %%%INC@1@1%%% %%%NOW@-1@%Y-%m-%d%%% %%%INC@${START}@1%%%
+%%%LOOP@ROWS@rows%%%
+%%%INDEX%%%: %%%rows.VALUE%%% %%%LOOPLIST@L%%% %%%CONSTANT@NAME%%% %%%INC@0.5@0.25%%%
+%%%LOOP@COLS@cols%%%
+  %%%cols.INDEX%%%/%%%rows.INDEX%%% %%%LOOPINC@1@1%%% %%%LOOPINC@${START}@1%%% %%%MONTHDELTA@1@%Y-%m%%%
+%%%LOOP@END@cols%%%
+%%%LOOP@END@rows%%%
+Tail %%%INC@1@1%%% ${LIST}"""
+        parameters = {'NAME': 'n', 'START': '1', 'ROWS': ['a', 'b', 'c'], 'L': (1, 2, 3), 'COLS': 2,
+                      'INDEXSHIFT': 1, 'LIST': [1]}
+        nodes, generated = TemplateProcessor(), TemplateProcessor(codegen=True)
+        generated.now = nodes.now
+        compiled = nodes.compile(template)
+        self.assertIsNotNone(compiled.generated_function())
+        for _ in range(2):
+            self.assertEqual(compiled.render(parameters, generated), compiled.render(parameters, nodes))
+        self.assertEqual(generated.inc_values, nodes.inc_values)
+
+        for broken in ({'L': [1, 2]}, {'L': [1, 2, 3, 4]}, {'ROWS': 'text'}, {'INDEXSHIFT': 'x'}):
+            with self.assertRaises(ValueError) as expected:
+                compiled.render(dict(parameters, **broken), TemplateProcessor())
+            with self.assertRaises(ValueError) as context:
+                compiled.render(dict(parameters, **broken), TemplateProcessor(codegen=True))
+            self.assertEqual(str(context.exception), str(expected.exception))
+
+    def test_codegen_for_data_templates(self):
+        """Test every template in tests/data is translated by the codegen backend."""
+        for name in os.listdir(DATA_DIR):
+            if not name.endswith('_TEMPLATE.txt'):
+                continue
+            with open(os.path.join(DATA_DIR, name), encoding='utf-8') as template:
+                compiled = TemplateProcessor().compile(template.read())
+            self.assertIsNotNone(compiled.generated_function(), name)
+
+
+class TestAnalyze(unittest.TestCase):
+    """Test cases for TemplateProcessor.analyze."""
+
+    TEMPLATE = """Head ${X} %%%NOW@0@%Y-%m-%d%%%
+%%%LOOP@ROWS@r%%%
+Row %%%INDEX%%% %%%r.VALUE%%% %%%LOOPLIST@A%%% %%%INC@1@1%%% %%%CONSTANT@C%%%
+%%%LOOP@COLS@c%%%
+  %%%c.INDEX%%%;%%%LOOPINC@0.5@0.25%%%
+%%%LOOP@END@c%%%
+%%%LOOP@END@r%%%
+End é
+"""
+
+    def parameters(self, rows):
+        return {'X': 'x', 'ROWS': [f"v{'x' * (row % 7)}" for row in range(rows)],
+                'A': list(range(990, 990 + rows)), 'C': 'const', 'COLS': 7, 'INDEXSHIFT': -3}
+
+    def test_estimate_matches_output(self):
+        """Test estimated bytes, lines and loop iterations of example and generated templates."""
+        cases = [(self.TEMPLATE, self.parameters(300))]
+        for name, parameters in {
+            'MultipleINC': {'ID': 'inc'},
+            'NamedLoopIndex': {'ID': 'named', 'ITEMS': ['a', 'b'], 'OUTER': ['X', 'Y'], 'INNER': [1, 2, 3]},
+            'LoopEdgeCases': {
+                'ID': 'edge', 'EMPTYLOOP': 0, 'SINGLELOOP': 1, 'LARGELOOP': 100, 'INDEXSHIFT': '10',
+                'SHIFTLOOP': ['A', 'B', 'C'], 'LISTLOOP': ['1', '2'], 'TAGS': ['a', 'b'], 'STATUS': ['x', 'y']
+            },
+        }.items():
+            with open(os.path.join(DATA_DIR, f"{name}_TEMPLATE.txt"), encoding='utf-8') as template_file:
+                cases.append((template_file.read(), parameters))
+        for template, parameters in cases:
+            with self.subTest(template=template[:20]):
+                report = TemplateProcessor().analyze(template, parameters)
+                result = TemplateProcessor().process(template, parameters)
+                self.assertTrue(report['valid'], report['errors'])
+                self.assertEqual(report['bytes'], len(result.encode('utf-8')))
+                self.assertEqual(report['lines'], result.count('\n'))
+        report = TemplateProcessor().analyze(self.TEMPLATE, self.parameters(300))
+        self.assertEqual(report['loops'], {'r': 300, 'c': 2100})
+
+    def test_large_loops_are_not_rendered(self):
+        """Test estimates of huge loops come from loop sizes and samples."""
+        parameters = dict(self.parameters(1), ROWS=range(10 ** 9), A=range(10 ** 9))
+        report = TemplateProcessor().analyze(self.TEMPLATE, parameters, max_bytes=10 ** 9)
+        self.assertEqual(report['loops'], {'r': 10 ** 9, 'c': 7 * 10 ** 9})
+        self.assertGreater(report['bytes'], 10 ** 11)
+        self.assertEqual(report['errors'], [f"Estimated output size {report['bytes']} bytes exceeds the limit "
+                                            f"of 1000000000 bytes"])
+
+    def test_all_errors_reported(self):
+        """Test errors of every placeholder and loop are reported together."""
+        parameters = dict(self.parameters(3), A=[1], COLS='many', INDEXSHIFT='x')
+        del parameters['C']
+        report = TemplateProcessor().analyze(self.TEMPLATE, parameters)
+        self.assertFalse(report['valid'])
+        self.assertEqual(report['errors'], [
+            "INDEXSHIFT must be an integer, but got: x",
+            "LOOPLIST 'A' length (1) does not match loop size (3)",
+            "Missing constant for ID: C in pattern: %%%CONSTANT@C%%%",
+            "Loop input 'COLS' should be a list or int (or another iterable), but got str",
+        ])
+        nested = "%%%LOOP@ROWS@r%%%%%%LOOP@COLS@c%%%x%%%LOOP@END@c%%%%%%LOOP@END@r%%%"
+        report = TemplateProcessor().analyze(nested, {'ROWS': 2, 'COLS': iter('ab')})
+        self.assertIn("Loop input 'COLS' is an iterator that is already used up", report['errors'][0])
+
+    def test_index_shift_ignored_without_loops(self):
+        """Test a bad INDEXSHIFT is only an error when the template has loops that read it."""
+        template = "%%%CONSTANT@C%%% %%%INDEX%%% %%%LOOPLIST@A%%%"
+        parameters = {'C': 'c', 'A': [1], 'INDEXSHIFT': 'x'}
+        self.assertEqual(TemplateProcessor().process(template, parameters), "c %%%INDEX%%% %%%LOOPLIST@A%%%")
+        report = TemplateProcessor().analyze(template, parameters)
+        self.assertTrue(report['valid'], report['errors'])
+        self.assertEqual(report['bytes'], len("c %%%INDEX%%% %%%LOOPLIST@A%%%"))
+
+    def test_iterators_left_untouched(self):
+        """Test loops over iterators make the estimate unknown without consuming them."""
+        rows = iter(['a', 'b'])
+        report = TemplateProcessor().analyze(self.TEMPLATE, dict(self.parameters(2), ROWS=rows), max_bytes=1)
+        self.assertTrue(report['valid'])
+        self.assertIsNone(report['bytes'])
+        self.assertEqual(report['loops'], {'r': None, 'c': None})
+        self.assertEqual(report['warnings'], ["Size of loop 'r' is unknown, its input 'ROWS' is an iterator"])
+        self.assertEqual(list(rows), ['a', 'b'])
+
+
+class TestDataFileSources(unittest.TestCase):
+    """Test cases for loop inputs and LOOPLIST sources read from data files."""
+
+    TEMPLATE = "%%%LOOP@IDS@r%%%[%%%r.VALUE%%%|%%%LOOPLIST@NAMES%%%]%%%LOOP@END@r%%%"
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def data_file(self, name, content):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'w', encoding='utf-8', newline='') as data:
+            data.write(content)
+        return path
+
+    def test_csv_columns(self):
+        """Test CSV columns by header name, quoted line breaks and blank lines."""
+        path = self.data_file('data.csv', 'id,name\r\n1,Ann\r\n2,"Bob\nJr"\r\n\r\n3,Cy\r\n')
+        result = TemplateProcessor().process(self.TEMPLATE, {'IDS': f'file:{path}#id', 'NAMES': f'file:{path}#name'})
+        self.assertEqual(result, "[1|Ann][2|Bob\nJr][3|Cy]")
+
+    def test_cache_key_of_data_files(self):
+        """Test only loop inputs and LOOPLIST sources are keyed by their data file, other values by their text."""
+        path = self.data_file('data.csv', 'id,name\n1,Ann\n')
+        compiled = TemplateProcessor().compile(self.TEMPLATE + " %%%CONSTANT@URL%%% ${IN}")
+        now = datetime.datetime(2024, 5, 6)
+        parameters = {'IDS': f'file:{path}#id', 'NAMES': f'file:{path}#name', 'URL': 'file:///tmp/x', 'IN': 'file:'}
+        key = compiled.cache_key(parameters, now)
+        self.assertIsNotNone(key)
+        self.assertNotEqual(compiled.cache_key(dict(parameters, URL='file:///tmp/y'), now), key)
+        self.data_file('data.csv', 'id,name\n1,Ann\n2,Bob\n')
+        self.assertNotEqual(compiled.cache_key(parameters, now), key)
+        self.assertIsNone(compiled.cache_key(dict(parameters, IDS='file:missing.csv#id'), now))
+
+    def test_jsonl_and_tsv_columns(self):
+        """Test JSONL keys and TSV columns, first column used when none is given."""
+        jsonl = self.data_file('data.jsonl', '{"id": 1, "name": "a"}\n\n{"id": 2, "name": "b"}\n')
+        tsv = self.data_file('data.tsv', 'id\tname\n7\tx\n8\ty\n')
+        processor = TemplateProcessor()
+        self.assertEqual(processor.process(self.TEMPLATE, {'IDS': f'file:{jsonl}#id', 'NAMES': f'file:{tsv}#name'}),
+                         "[1|x][2|y]")
+        self.assertEqual(processor.process(self.TEMPLATE, {'IDS': f'file:{tsv}', 'NAMES': ['p', 'q']}),
+                         "[7|p][8|q]")
+
+    def test_nested_loop_rereads_file(self):
+        """Test a data file loop input can be the input of a nested loop."""
+        path = self.data_file('data.csv', 'id\n1\n2\n')
+        template = "%%%LOOP@OUTER@o%%%%%%LOOP@IDS@r%%%%%%r.VALUE%%%%%%LOOP@END@r%%%;%%%LOOP@END@o%%%"
+        self.assertEqual(TemplateProcessor().process(template, {'OUTER': 2, 'IDS': f'file:{path}'}), "12;12;")
+
+    def test_data_file_errors(self):
+        """Test missing files, columns and keys and length mismatches, also found by analyze()."""
+        csv_path = self.data_file('data.csv', 'id,name\n1,Ann\n2,Bob\n')
+        jsonl_path = self.data_file('data.jsonl', '{"id": 1}\n')
+        processor = TemplateProcessor()
+        cases = [
+            ({'IDS': f'file:{csv_path}#missing', 'NAMES': ['a', 'b']}, ValueError, "Column 'missing' not found"),
+            ({'IDS': f'file:{jsonl_path}#id', 'NAMES': f'file:{jsonl_path}#name'}, ValueError, "has no key 'name'"),
+            ({'IDS': 'file:missing.csv#id', 'NAMES': []}, FileNotFoundError, "Data file not found"),
+            ({'IDS': f'file:{csv_path}.txt', 'NAMES': []}, ValueError, "Unsupported data file"),
+            ({'IDS': 3, 'NAMES': f'file:{csv_path}#name'}, ValueError, "does not match loop size"),
+        ]
+        for parameters, error, message in cases:
+            with self.subTest(message=message):
+                with self.assertRaises(error) as context:
+                    processor.process(self.TEMPLATE, parameters)
+                self.assertIn(message, str(context.exception))
+                self.assertIn(message, '\n'.join(processor.analyze(self.TEMPLATE, parameters)['errors']))
+
+
+class TestRandomValues(unittest.TestCase):
+    """Test cases for RANDOM and RANDOMLIST placeholders."""
+
+    TEMPLATE = (
+        "Head %%%RANDOM@1@6%%% %%%RANDOMLIST@STATES%%%\n"
+        "%%%LOOP@ROWS@r%%%\n"
+        "%%%INDEX%%%;%%%RANDOM@-10@10%%%;%%%RANDOM@0.5@2.25%%%;%%%RANDOMLIST@STATES%%%\n"
+        "%%%LOOP@COLS@c%%%\n"
+        "  %%%RANDOM@${LOW}@${HIGH}%%%\n"
+        "%%%LOOP@END@c%%%\n"
+        "%%%LOOP@END@r%%%\n"
+        "Tail %%%RANDOM@1@x%%%"
+    )
+
+    def parameters(self, rows, **extra):
+        return dict({'ROWS': rows, 'COLS': 2, 'STATES': ['open', 'closed'], 'LOW': 100, 'HIGH': 105,
+                     'RANDOMSEED': 'seed'}, **extra)
+
+    def test_seeded_output_repeats(self):
+        """Test the same seed gives the same output and another seed a different one."""
+        result = TemplateProcessor().process(self.TEMPLATE, self.parameters(50))
+        self.assertEqual(TemplateProcessor().process(self.TEMPLATE, self.parameters(50)), result)
+        self.assertNotEqual(TemplateProcessor().process(self.TEMPLATE, self.parameters(50, RANDOMSEED=2)), result)
+        unseeded = self.parameters(50)
+        del unseeded['RANDOMSEED']
+        self.assertNotEqual(TemplateProcessor().process(self.TEMPLATE, unseeded), result)
+        # Values do not depend on how many iterations follow
+        longer = TemplateProcessor().process(self.TEMPLATE, self.parameters(3000))
+        self.assertTrue(longer.startswith(result.rsplit("\n49;", 1)[0]))
+
+    def test_values_in_range(self):
+        """Test drawn values stay within their bounds with the decimals of the arguments."""
+        result = TemplateProcessor().process(self.TEMPLATE, self.parameters(500))
+        rows = [line.split(';') for line in result.splitlines() if line.count(';') == 3]
+        self.assertEqual(len(rows), 500)
+        self.assertEqual({int(row[1]) for row in rows}, set(range(-10, 11)))
+        self.assertTrue(all(0.5 <= float(row[2]) <= 2.25 and len(row[2].partition('.')[2]) == 2 for row in rows))
+        self.assertEqual({row[3] for row in rows}, {'open', 'closed'})
+        columns = {int(line) for line in result.splitlines() if line.startswith('  ')}
+        self.assertTrue(columns <= set(range(100, 106)))
+        self.assertTrue(result.endswith("Tail %%%RANDOM@1@x%%%"))
+
+    def test_number_formats(self):
+        """Test decimals keep trailing zeros and huge integer spans are drawn exactly."""
+        template = "%%%LOOP@ROWS@r%%%\n%%%RANDOM@0.50@20.00%%%;%%%RANDOM@0@100000000000000000000%%%\n%%%LOOP@END@r%%%"
+        parameters = {'ROWS': 200, 'RANDOMSEED': 1}
+        result = TemplateProcessor().process(template, parameters)
+        rows = [line.split(';') for line in result.splitlines()]
+        self.assertTrue(all(len(row[0].partition('.')[2]) == 2 and 0.5 <= float(row[0]) <= 20 for row in rows))
+        self.assertTrue(all(0 <= int(row[1]) <= 10 ** 20 for row in rows))
+        self.assertGreater(max(int(row[1]) for row in rows), 2 ** 64)
+        report = TemplateProcessor().analyze(template, parameters)
+        self.assertTrue(report['valid'], report['errors'])
+        self.assertAlmostEqual(report['bytes'], len(result), delta=len(result) * 0.05)
+
+    def test_decimal_endpoints_as_likely(self):
+        """Test decimal limits are drawn as often as the values between them."""
+        template = "%%%LOOP@ROWS@r%%%\n%%%RANDOM@0.0@0.2%%%;%%%RANDOM@-0.5@0.5%%%\n%%%LOOP@END@r%%%"
+        result = TemplateProcessor().process(template, {'ROWS': 3000, 'RANDOMSEED': 7})
+        rows = [line.split(';') for line in result.splitlines()]
+        counts = collections.Counter(row[0] for row in rows)
+        self.assertEqual(set(counts), {'0.0', '0.1', '0.2'})
+        self.assertTrue(all(900 <= count <= 1100 for count in counts.values()), counts)
+        self.assertEqual({row[1] for row in rows}, {f"{step / 10:.1f}" for step in range(-5, 6)})
+        """Test split, codegen and serialized templates draw the same values as node rendering."""
+        parameters = self.parameters(2000)
+        compiled = TemplateProcessor().compile(self.TEMPLATE)
+        expected = compiled.render(parameters)
+        header, iterations, separator, footer = compiled.split_render(parameters)
+        self.assertEqual(header + separator.join(iterations) + footer, expected)
+        codegen = TemplateProcessor(codegen=True)
+        self.assertIsNotNone(codegen.compile(self.TEMPLATE).generated_function())
+        self.assertEqual(compiled.render(parameters, codegen), expected)
+        loaded = TemplateProcessor().load_compiled(compiled.to_bytes(), self.TEMPLATE)
+        self.assertEqual(loaded.render(parameters), expected)
+
+    def test_random_errors(self):
+        """Test bad bounds and lists raise errors and are reported by analyze."""
+        for parameters, message in (
+            (self.parameters(1, LOW=7, HIGH=3), "RANDOM minimum 7 is greater than maximum 3"),
+            (self.parameters(1, STATES=[]), "RANDOMLIST 'STATES' must be a non-empty list"),
+            (self.parameters(1, STATES='open'), "RANDOMLIST 'STATES' must be a non-empty list"),
+        ):
+            with self.assertRaises(ValueError) as context:
+                TemplateProcessor().process(self.TEMPLATE, parameters)
+            self.assertIn(message, str(context.exception))
+            self.assertIn(message, TemplateProcessor().analyze(self.TEMPLATE, parameters)['errors'][0])
+        with self.assertRaises(ValueError) as context:
+            TemplateProcessor().process("%%%RANDOMLIST@MISSING%%%", {})
+        self.assertEqual(str(context.exception), "Missing RANDOMLIST list for ID: MISSING")
+
+    def test_unseeded_output_not_cached(self):
+        """Test templates with random values only get a cache key when seeded."""
+        compiled = TemplateProcessor().compile(self.TEMPLATE)
+        now = datetime.datetime(2024, 5, 6)
+        parameters = self.parameters(3)
+        self.assertIsNotNone(compiled.cache_key(parameters, now))
+        del parameters['RANDOMSEED']
+        self.assertIsNone(compiled.cache_key(parameters, now))
+
+
+class TestParallelRendering(unittest.TestCase):
+    """Test cases for rendering top-level loops with worker processes."""
+
+    TEMPLATE = (
+        "Head %%%INC@1@1%%% %%%INC@0.5@0.1%%%\n"
+        "%%%LOOP@ROWS@r%%%\n"
+        "Row %%%INDEX%%% %%%r.VALUE%%% %%%INC@1@1%%% %%%LOOPINC@10@0.1%%% %%%LOOPLIST@NAMES%%%\n"
+        "%%%LOOP@SUB@s%%%\n"
+        "  Sub %%%r.INDEX%%%.%%%s.INDEX%%% %%%INC@0.5@0.1%%% %%%LOOPINC@1@1%%% ${X}\n"
+        "%%%LOOP@END@s%%%\n"
+        "%%%LOOP@END@r%%%\n"
+        "Tail %%%INC@1@1%%% %%%INC@0.5@0.1%%%\n"
+        "%%%LOOP@SUB@q%%%%%%q.INDEX%%%,%%%LOOP@END@q%%%"
+    )
+
+    def parameters(self, rows):
+        return {
+            'ROWS': [f'r{i}' for i in range(rows)],
+            'NAMES': [f'n{i}' for i in range(rows)],
+            'SUB': 3,
+            'X': 'x',
+            'INDEXSHIFT': 1,
+        }
+
+    def render_both(self, template, parameters):
+        serial = TemplateProcessor()
+        parallel = TemplateProcessor(workers=2)
+        parallel.now = serial.now
+        expected = serial.process(template, parameters)
+        self.assertEqual(parallel.process(template, parameters), expected)
+        self.assertEqual(parallel.inc_values, serial.inc_values)
+        return expected
+
+    def test_parallel_output_identical_to_serial(self):
+        """Test chunks continue INC and LOOPINC counters exactly where serial rendering is."""
+        result = self.render_both(self.TEMPLATE, self.parameters(PARALLEL_MIN_CHUNK * 3 + 7))
+        self.assertEqual(result.split("Tail ")[1].split()[0], str(float(PARALLEL_MIN_CHUNK * 3 + 9)))
+
+    def test_parallel_counters_of_empty_loops(self):
+        """Test counters of nested loops that never run are not created by parallel rendering."""
+        template = "%%%LOOP@ROWS@r%%%%%%INDEX%%%%%%LOOP@NONE@n%%%%%%INC@7@1%%%%%%LOOP@END@n%%%\n%%%LOOP@END@r%%%"
+        self.render_both(template, dict(self.parameters(PARALLEL_MIN_CHUNK * 3), NONE=0))
+
+    def test_parallel_small_loop_rendered_serially(self):
+        """Test loops below the chunk size render in the calling process."""
+        result = self.render_both(self.TEMPLATE, self.parameters(10))
+        self.assertEqual(result.split("Tail ")[1].split()[0], "12.0")
+
+    def test_parallel_generator_loop_rendered_serially(self):
+        """Test loops over generators, which cannot be split, still render correctly."""
+        rows = PARALLEL_MIN_CHUNK * 3
+        parameters = self.parameters(rows)
+        expected = TemplateProcessor().process(self.TEMPLATE, parameters)
+        parameters['ROWS'] = (value for value in parameters['ROWS'])
+        self.assertEqual(TemplateProcessor(workers=2).process(self.TEMPLATE, parameters), expected)
+
+    def test_parallel_random_values(self):
+        """Test worker processes draw the same seeded random values as serial rendering."""
+        template = "%%%LOOP@ROWS@r%%%%%%INDEX%%% %%%RANDOM@1@1000%%% %%%RANDOMLIST@NAMES%%%\n%%%LOOP@END@r%%%"
+        self.render_both(template, dict(self.parameters(PARALLEL_MIN_CHUNK * 3), RANDOMSEED=5))
+
+    def test_parallel_errors(self):
+        """Test errors raised in worker processes reach the caller."""
+        parameters = self.parameters(PARALLEL_MIN_CHUNK * 3)
+        del parameters['SUB']
+        with self.assertRaises(ValueError) as context:
+            TemplateProcessor(workers=2).process(self.TEMPLATE, parameters)
+        self.assertIn("Missing loop input for ID: SUB", str(context.exception))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,718 @@
+"""Tests for TemplateProcessorLibrary module."""
+
+import asyncio
+import bz2
+import datetime
+import gzip
+import io
+import lzma
+import threading
+import time
+import typing
+import unittest
+import tempfile
+import os
+import sys
+from unittest.mock import patch
+
+# Add parent directory to path to import TemplateProcessorLibrary
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TemplateProcessorLibrary
+from TemplateProcessorLibrary import (
+    TemplateCache,
+    TemplateProcessorLibrary as LibraryClass,
+    TemplateProcessorLibrarySuiteScope,
+    TemplateProcessorLibraryTestScope,
+    generate_file,
+    generate_file_and_return_content,
+    render_template,
+    generate_files,
+    generate_cached_file,
+    validate_template,
+    agenerate_file,
+    agenerate_file_and_return_content,
+    set_async_concurrency,
+    clear_template_cache,
+    get_template_cache_stats,
+    set_render_profiling,
+    get_last_render_stats,
+    FileSink,
+    MemorySink,
+    CallableSink,
+)
+
+
+class TemplateFileTestCase(unittest.TestCase):
+    """Base class providing a temporary directory with a template file."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.template_file = self.path('Test_TEMPLATE.txt')
+        self.write_template("ID: %%%CONSTANT@ID%%%")
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def write_template(self, content, mtime=None):
+        with open(self.template_file, 'w', encoding='utf-8') as template:
+            template.write(content)
+        if mtime is not None:
+            os.utime(self.template_file, (mtime, mtime))
+
+
+class TestTemplateCache(TemplateFileTestCase):
+    """Test cases for TemplateCache class."""
+
+    def test_cache_hit_and_miss_counters(self):
+        """Test repeated lookups of the same template are cache hits."""
+        cache = TemplateCache()
+        first = cache.get(self.template_file)
+        second = cache.get(self.template_file)
+        self.assertIs(first, second)
+        self.assertEqual(cache.stats(), {'size': 1, 'capacity': 128, 'hits': 1, 'misses': 1})
+
+    def test_cache_invalidated_on_template_change(self):
+        """Test template is parsed again when its mtime or size changes."""
+        cache = TemplateCache()
+        self.write_template("ID: %%%CONSTANT@ID%%%", mtime=1000000)
+        self.assertEqual(cache.get(self.template_file).render({'ID': 'a'}), "ID: a")
+        self.write_template("Changed: %%%CONSTANT@ID%%%", mtime=2000000)
+        self.assertEqual(cache.get(self.template_file).render({'ID': 'a'}), "Changed: a")
+        self.assertEqual(cache.stats()['misses'], 2)
+        self.assertEqual(cache.stats()['size'], 1)
+
+    def test_disk_cache_shares_parsed_templates(self):
+        """Test a second process-like cache loads the .tplcache file instead of parsing."""
+        self.write_template("%%%LOOP@ITEMS@items%%%\n%%%INDEX%%% %%%CONSTANT@ID%%% %%%INC@1@1%%%\n%%%LOOP@END@items%%%")
+        precompiled = self.path(os.path.join('.tplcache', 'Test_TEMPLATE.txt.tplc'))
+        TemplateCache(disk_cache=True).get(self.template_file)
+        self.assertTrue(os.path.exists(precompiled))
+
+        with patch.object(TemplateProcessorLibrary.TemplateProcessor, 'compile') as compile_template:
+            loaded = TemplateCache(disk_cache=True).get(self.template_file)
+        compile_template.assert_not_called()
+        self.assertEqual(loaded.render({'ID': 'a', 'ITEMS': 2}), "0 a 1.0\n1 a 2.0")
+
+        self.write_template("Changed: %%%CONSTANT@ID%%%")
+        self.assertEqual(TemplateCache(disk_cache=True).get(self.template_file).render({'ID': 'a'}), "Changed: a")
+        self.assertEqual(TemplateCache(disk_cache=True).get(self.template_file).render({'ID': 'b'}), "Changed: b")
+
+    def test_disk_cache_ignores_damaged_files(self):
+        """Test unreadable .tplcache content is replaced by a freshly parsed template."""
+        os.mkdir(self.path('.tplcache'))
+        with open(self.path(os.path.join('.tplcache', 'Test_TEMPLATE.txt.tplc')), 'wb') as damaged:
+            damaged.write(b'not a template')
+        self.assertEqual(TemplateCache(disk_cache=True).get(self.template_file).render({'ID': 'a'}), "ID: a")
+        with patch.object(TemplateProcessorLibrary.TemplateProcessor, 'compile') as compile_template:
+            TemplateCache(disk_cache=True).get(self.template_file)
+        compile_template.assert_not_called()
+
+    def test_cache_evicts_least_recently_used(self):
+        """Test cache keeps at most capacity templates."""
+        cache = TemplateCache(capacity=2)
+        names = []
+        for index in range(3):
+            name = self.path(f"T{index}_TEMPLATE.txt")
+            with open(name, 'w', encoding='utf-8') as template:
+                template.write(f"Template {index}")
+            names.append(name)
+        cache.get(names[0])
+        cache.get(names[1])
+        cache.get(names[0])
+        cache.get(names[2])
+        self.assertEqual(cache.stats()['size'], 2)
+        cache.get(names[0])
+        self.assertEqual(cache.stats()['hits'], 2)
+        cache.get(names[1])
+        self.assertEqual(cache.stats()['misses'], 4)
+
+    def test_cache_size_zero_disables_caching(self):
+        """Test capacity 0 never keeps templates."""
+        cache = TemplateCache(capacity=0)
+        cache.get(self.template_file)
+        cache.get(self.template_file)
+        self.assertEqual(cache.stats()['size'], 0)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_cache_resize_rejects_negative(self):
+        """Test negative capacity is rejected."""
+        with self.assertRaises(ValueError):
+            TemplateCache().resize(-1)
+
+    def test_missing_template(self):
+        """Test missing template raises FileNotFoundError."""
+        with self.assertRaises(FileNotFoundError) as context:
+            TemplateCache().get(self.path('Missing_TEMPLATE.txt'))
+        self.assertIn("Template file not found", str(context.exception))
+
+
+class TestGenerateFile(TemplateFileTestCase):
+    """Test cases for generate_file keywords."""
+
+    def setUp(self):
+        super().setUp()
+        clear_template_cache()
+        self.addCleanup(clear_template_cache)
+
+    def test_generate_file_uses_cache(self):
+        """Test keywords share the module template cache."""
+        output_file = self.path('out/Output.txt')
+        generate_file(output_file, self.template_file, ID='first')
+        content, now = generate_file_and_return_content(output_file, self.template_file, ID='second')
+        self.assertEqual(content, "ID: second")
+        with open(output_file, encoding='utf-8') as output:
+            self.assertEqual(output.read(), "ID: second")
+        self.assertEqual(get_template_cache_stats()['hits'], 1)
+        self.assertEqual(get_template_cache_stats()['misses'], 1)
+
+    def test_generate_file_streams_large_loop(self):
+        """Test generate_file writes loop output produced in several chunks."""
+        self.write_template("Header\n%%%LOOP@COUNT@rows%%%\nRow %%%INDEX%%%\n%%%LOOP@END@rows%%%\nFooter\n")
+        output_file = self.path('Large.txt')
+        generate_file(output_file, self.template_file, COUNT=20000)
+        with open(output_file, encoding='utf-8') as output:
+            lines = output.read().split('\n')
+        self.assertEqual(lines[0], "Header")
+        self.assertEqual(lines[1:20001], [f"Row {index}" for index in range(20000)])
+        self.assertEqual(lines[20001:], ["Footer", ""])
+
+    def test_generate_file_with_workers(self):
+        """Test generate_file with worker processes writes the same file as without."""
+        self.write_template("%%%LOOP@COUNT@rows%%%\nRow %%%INDEX%%% %%%INC@1@1%%%\n%%%LOOP@END@rows%%%\nEnd %%%INC@1@1%%%")
+        generate_file(self.path('Serial.txt'), self.template_file, COUNT=5000)
+        generate_file(self.path('Parallel.txt'), self.template_file, render_workers='2', COUNT=5000)
+        with open(self.path('Serial.txt'), encoding='utf-8') as serial, \
+                open(self.path('Parallel.txt'), encoding='utf-8') as parallel:
+            self.assertEqual(parallel.read(), serial.read())
+
+    def test_options_leave_parameter_names_free(self):
+        """Test a template parameter called workers reaches the template and options are keyword-only."""
+        self.write_template("%%%CONSTANT@workers%%% %%%CONSTANT@max_lines%%% %%%CONSTANT@compression%%%")
+        generate_file(self.path('Output.txt'), self.template_file, workers='4 people', max_lines=2, compression='zip')
+        with open(self.path('Output.txt'), encoding='utf-8') as output:
+            self.assertEqual(output.read(), "4 people 2 zip")
+        with self.assertRaises(TypeError):
+            generate_file(self.path('Output.txt'), self.template_file, 2)
+
+    def read_shards(self, prefix):
+        shards = []
+        for name in sorted(name for name in os.listdir(self.temp_dir.name) if name.startswith(prefix)):
+            with open(self.path(name), encoding='utf-8') as output:
+                shards.append(output.read())
+        return shards
+
+    def test_generate_file_sharded_by_lines(self):
+        """Test max_output_lines splits loop iterations over files repeating header and footer."""
+        self.write_template("Head\n%%%LOOP@COUNT@rows%%%\nRow %%%INC@1@1%%%\n%%%LOOP@END@rows%%%\nFoot %%%INC@1@1%%%\n")
+        generate_file(self.path('Out_{shard:02d}.txt'), self.template_file, max_output_lines=5, COUNT=7)
+        self.assertEqual(self.read_shards('Out_'), [
+            "Head\nRow 1.0\nRow 2.0\nRow 3.0\nFoot 8.0\n",
+            "Head\nRow 4.0\nRow 5.0\nRow 6.0\nFoot 8.0\n",
+            "Head\nRow 7.0\nFoot 8.0\n",
+        ])
+
+    def test_generate_file_sharded_by_bytes(self):
+        """Test max_output_bytes keeps every shard within the limit and loses no iteration."""
+        self.write_template("Head\n%%%LOOP@COUNT@rows%%%\nRow %%%INDEX%%% é\n%%%LOOP@END@rows%%%\nFoot\n")
+        generate_file(self.path('Out_{shard}.txt'), self.template_file, max_output_bytes='100', COUNT=1000)
+        shards = self.read_shards('Out_')
+        self.assertGreater(len(shards), 1)
+        self.assertTrue(all(len(shard.encode('utf-8')) <= 100 for shard in shards))
+        rows = [line for shard in shards for line in shard.splitlines() if line.startswith('Row')]
+        self.assertEqual(len(rows), 1000)
+
+    def test_generate_file_sharded_errors(self):
+        """Test sharding rejects names without {shard}, several loops and too small limits."""
+        self.write_template("Head\n%%%LOOP@COUNT@rows%%%\nRow\n%%%LOOP@END@rows%%%\nFoot\n")
+        with self.assertRaises(ValueError):
+            generate_file(self.path('Out.txt'), self.template_file, max_output_lines=5, COUNT=7)
+        with self.assertRaises(ValueError):
+            generate_file(self.path('Out_{shard}.txt'), self.template_file, max_output_bytes=5, COUNT=7)
+        self.write_template("%%%LOOP@COUNT@a%%%A%%%LOOP@END@a%%%%%%LOOP@COUNT@b%%%B%%%LOOP@END@b%%%")
+        with self.assertRaises(ValueError):
+            generate_file(self.path('Out_{shard}.txt'), self.template_file, max_output_lines=5, COUNT=7)
+        self.assertEqual(self.read_shards('Out'), [])
+
+    def test_generate_file_error_keeps_existing_output(self):
+        """Test failing generation leaves previous output and no temporary files."""
+        output_file = self.path('Output.txt')
+        generate_file(output_file, self.template_file, ID='first')
+        with self.assertRaises(ValueError):
+            generate_file(output_file, self.template_file)
+        with open(output_file, encoding='utf-8') as output:
+            self.assertEqual(output.read(), "ID: first")
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ['Output.txt', 'Test_TEMPLATE.txt'])
+
+    def test_set_template_cache_size(self):
+        """Test set_template_cache_size changes module cache capacity."""
+        self.addCleanup(TemplateProcessorLibrary.set_template_cache_size,
+                        TemplateProcessorLibrary.DEFAULT_TEMPLATE_CACHE_SIZE)
+        TemplateProcessorLibrary.set_template_cache_size('0')
+        generate_file(self.path('Output.txt'), self.template_file, ID='a')
+        self.assertEqual(get_template_cache_stats()['size'], 0)
+
+
+class TestCompressedOutput(TemplateFileTestCase):
+    """Test cases for compressed generate_file outputs."""
+
+    def setUp(self):
+        super().setUp()
+        self.write_template("Head\n%%%LOOP@COUNT@rows%%%\nRow %%%INDEX%%% %%%INC@1@1%%% é\n%%%LOOP@END@rows%%%\nFoot\n")
+        generate_file(self.path('Plain.txt'), self.template_file, COUNT=3000)
+        with open(self.path('Plain.txt'), encoding='utf-8') as plain:
+            self.expected = plain.read()
+
+    def read(self, name, opener):
+        with opener(self.path(name), 'rt', encoding='utf-8') as output:
+            return output.read()
+
+    def test_compression_by_extension(self):
+        """Test .gz, .bz2 and .xz outputs are compressed and other extensions are not."""
+        for name, opener in (('Out.txt.gz', gzip.open), ('Out.txt.bz2', bz2.open), ('Out.txt.xz', lzma.open)):
+            generate_file(self.path(name), self.template_file, COUNT=3000)
+            self.assertEqual(self.read(name, opener), self.expected, name)
+        with open(self.path('Out.txt.gz'), 'rb') as output:
+            first = output.read()
+        generate_file(self.path('Out.txt.gz'), self.template_file, COUNT=3000)
+        with open(self.path('Out.txt.gz'), 'rb') as output:
+            self.assertEqual(output.read(), first)
+        self.assertEqual(sorted(name for name in os.listdir(self.temp_dir.name) if name.startswith('.')), [])
+
+    def test_compression_argument_and_level(self):
+        """Test output_compression and output_compression_level override the extension and are checked."""
+        generate_file(self.path('Stored.dat'), self.template_file, output_compression='gzip',
+                      output_compression_level='0', COUNT=3000)
+        generate_file(self.path('Small.dat'), self.template_file, output_compression='GZIP',
+                      output_compression_level=9, COUNT=3000)
+        self.assertEqual(self.read('Stored.dat', gzip.open), self.expected)
+        self.assertGreater(os.path.getsize(self.path('Stored.dat')), len(self.expected))
+        self.assertLess(os.path.getsize(self.path('Small.dat')), len(self.expected) // 4)
+        generate_file(self.path('Plain.gz'), self.template_file, output_compression='none', COUNT=3000)
+        self.assertEqual(self.read('Plain.gz', open), self.expected)
+        for compression, level in (('zip', None), ('bz2', 0), ('xz', 10), ('gzip', 'high')):
+            with self.assertRaises(ValueError):
+                generate_file(self.path('Bad.gz'), self.template_file, output_compression=compression,
+                              output_compression_level=level, COUNT=1)
+        self.assertFalse(os.path.exists(self.path('Bad.gz')))
+
+    def test_compressed_shards(self):
+        """Test shard caps apply to the text of compressed shards."""
+        generate_file(self.path('Out_{shard}.txt.gz'), self.template_file, max_output_lines=1002, COUNT=3000)
+        shards = [self.read(f'Out_{shard}.txt.gz', gzip.open) for shard in range(3)]
+        self.assertEqual([shard.count('\n') for shard in shards], [1002] * 3)
+        self.assertEqual(''.join(shard[5:-5] for shard in shards), self.expected[5:-5])
+
+
+class TestOutputSinks(TemplateFileTestCase):
+    """Test cases for render_template and output sinks."""
+
+    def setUp(self):
+        super().setUp()
+        self.write_template("Head é\n%%%LOOP@COUNT@rows%%%\nRow %%%INDEX%%% %%%INC@1@1%%%\n%%%LOOP@END@rows%%%\nFoot\n")
+        self.expected = render_template(self.template_file, COUNT=20000)
+
+    def test_render_template_returns_content(self):
+        """Test render_template without a sink returns the content and writes nothing."""
+        self.assertEqual(self.expected.splitlines()[-2:], ["Row 19999 20000.0", "Foot"])
+        self.assertEqual(os.listdir(self.temp_dir.name), ['Test_TEMPLATE.txt'])
+
+    def test_memory_and_callable_sinks(self):
+        """Test segments reach buffers and callables unjoined and equal to the content."""
+        text, data, segments = io.StringIO(), io.BytesIO(), []
+        self.assertIsNone(render_template(self.template_file, sink=text, COUNT=20000))
+        render_template(self.template_file, sink=data, COUNT=20000)
+        render_template(self.template_file, sink=segments.append, COUNT=20000)
+        self.assertEqual(text.getvalue(), self.expected)
+        self.assertEqual(data.getvalue(), self.expected.encode('utf-8'))
+        self.assertFalse(data.closed)
+        self.assertGreater(len(segments), 1)
+        self.assertEqual(''.join(segments), self.expected)
+        sink = MemorySink()
+        generate_file(sink, self.template_file, COUNT=20000)
+        self.assertEqual(sink.getvalue(), self.expected)
+        self.assertEqual(os.listdir(self.temp_dir.name), ['Test_TEMPLATE.txt'])
+
+    def test_keywords_take_sinks_as_output(self):
+        """Test output keywords are annotated to take sinks and write BytesIO and MemorySink outputs."""
+        keywords = (generate_file, generate_file_and_return_content, agenerate_file, agenerate_file_and_return_content,
+                    LibraryClass.generate_file, LibraryClass.generate_file_and_return_content,
+                    LibraryClass.agenerate_file, LibraryClass.agenerate_file_and_return_content)
+        for keyword in keywords:
+            self.assertIs(typing.get_type_hints(keyword)['output_file'], typing.Any, keyword.__qualname__)
+        data, sink = io.BytesIO(), MemorySink()
+        content, _ = LibraryClass().generate_file_and_return_content(data, self.template_file, COUNT=20000)
+        LibraryClass().generate_file(sink, self.template_file, COUNT=20000)
+        self.assertEqual(content, self.expected)
+        self.assertEqual(data.getvalue(), self.expected.encode('utf-8'))
+        self.assertEqual(sink.getvalue(), self.expected)
+
+    def test_file_descriptor_and_file_sinks(self):
+        """Test pipes get the UTF-8 content and file sinks write like paths."""
+        read_fd, write_fd = os.pipe()
+        received = []
+        reader = threading.Thread(target=lambda: received.append(os.fdopen(read_fd, 'rb').read()))
+        reader.start()
+        try:
+            render_template(self.template_file, sink=write_fd, COUNT=20000)
+        finally:
+            os.close(write_fd)
+        reader.join()
+        self.assertEqual(received, [self.expected.encode('utf-8')])
+        render_template(self.template_file, sink=FileSink(self.path('out/Out.txt.gz')), COUNT=20000)
+        with gzip.open(self.path('out/Out.txt.gz'), 'rt', encoding='utf-8') as output:
+            self.assertEqual(output.read(), self.expected)
+
+    def test_sink_errors(self):
+        """Test unusable outputs and options that need a file are rejected."""
+        with self.assertRaises(ValueError):
+            render_template(self.template_file, sink=42.0, COUNT=1)
+        with self.assertRaises(ValueError):
+            CallableSink("not callable")
+        with self.assertRaises(ValueError):
+            generate_file(io.StringIO(), self.template_file, output_compression='gzip', COUNT=1)
+        with self.assertRaises(ValueError):
+            generate_file(io.StringIO(), self.template_file, max_output_lines=5, COUNT=1)
+
+
+class TestRenderProfiling(TemplateFileTestCase):
+    """Test cases for set_render_profiling and get_last_render_stats."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(setattr, TemplateProcessorLibrary, '_LAST_RENDER_STATS', None)
+        self.addCleanup(set_render_profiling, False)
+
+    def test_last_render_stats(self):
+        """Test stats are only recorded while profiling is on."""
+        with self.assertRaises(ValueError):
+            get_last_render_stats()
+        generate_file(self.path('Output.txt'), self.template_file, ID='a')
+        with self.assertRaises(ValueError):
+            get_last_render_stats()
+
+        set_render_profiling(True)
+        self.write_template("%%%LOOP@ITEMS@items%%%\n%%%CONSTANT@ID%%%\n%%%LOOP@END@items%%%")
+        generate_file(self.path('Output.txt'), self.template_file, render_workers=2, ID='a', ITEMS=4)
+        stats = get_last_render_stats()
+        self.assertEqual(stats['placeholders'], {'constant': 4})
+        self.assertEqual(stats['loops'], {'items': 4})
+        self.assertEqual(stats['bytes'], os.path.getsize(self.path('Output.txt')))
+
+        content, _ = generate_file_and_return_content(self.path('Output.txt'), self.template_file, ID='b', ITEMS=2)
+        self.assertEqual(get_last_render_stats()['loops'], {'items': 2})
+
+
+class TestGenerateCachedFile(TemplateFileTestCase):
+    """Test cases for generate_cached_file."""
+
+    def setUp(self):
+        super().setUp()
+        self.write_template("ID: %%%CONSTANT@ID%%% %%%INC@1@1%%% %%%NOW@0@%Y%%%")
+        self.output_file = self.path('Output.txt')
+        self.cache_dir = self.path('cache')
+
+    def read_output(self):
+        with open(self.output_file, encoding='utf-8') as output:
+            return output.read()
+
+    def test_hit_leaves_output_in_place(self):
+        """Test second generation with same parameters is a hit that does not rewrite the file."""
+        now, hit = generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')
+        self.assertFalse(hit)
+        self.assertEqual(self.read_output(), f"ID: a 1.0 {now:%Y}")
+        mtime = os.stat(self.output_file).st_mtime_ns
+
+        _, hit = generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')
+        self.assertTrue(hit)
+        self.assertEqual(os.stat(self.output_file).st_mtime_ns, mtime)
+
+        _, hit = generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='b')
+        self.assertFalse(hit)
+        self.assertTrue(self.read_output().startswith("ID: b 1.0"))
+
+    def test_hit_restores_changed_output(self):
+        """Test a hit copies the cached output over a changed or deleted file."""
+        generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')
+        expected = self.read_output()
+        with open(self.output_file, 'w', encoding='utf-8') as output:
+            output.write("edited")
+        self.assertTrue(generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')[1])
+        self.assertEqual(self.read_output(), expected)
+        os.remove(self.output_file)
+        self.assertTrue(generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')[1])
+        self.assertEqual(self.read_output(), expected)
+
+    def test_template_change_and_iterators_miss(self):
+        """Test edited templates and iterator parameters are rendered again."""
+        generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')
+        self.write_template("New %%%CONSTANT@ID%%%")
+        self.assertFalse(generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')[1])
+        self.assertEqual(self.read_output(), "New a")
+        for _ in range(2):
+            self.assertFalse(generate_cached_file(self.output_file, self.template_file, self.cache_dir,
+                                                  ID=iter(['a']))[1])
+        self.assertFalse(any(name.startswith('None') for name in os.listdir(self.cache_dir)))
+
+    def test_library_version_change_misses(self):
+        """Test outputs cached by another library version are not reused."""
+        generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')
+        with patch.object(TemplateProcessorLibrary, '__version__', '0.9.0'):
+            self.assertFalse(generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')[1])
+        self.assertTrue(generate_cached_file(self.output_file, self.template_file, self.cache_dir, ID='a')[1])
+
+
+class TestValidateTemplate(TemplateFileTestCase):
+    """Test cases for validate_template."""
+
+    def setUp(self):
+        super().setUp()
+        self.write_template("%%%CONSTANT@ID%%%\n%%%LOOP@ROWS@r%%%\n%%%INDEX%%% %%%LOOPLIST@L%%%\n%%%LOOP@END@r%%%\n")
+
+    def test_valid_template_report(self):
+        """Test the report of a valid job matches the file generate_file writes."""
+        report = validate_template(self.template_file, ID='abc', ROWS=20, L=['x'] * 20)
+        output_file = self.path('Output.txt')
+        generate_file(output_file, self.template_file, ID='abc', ROWS=20, L=['x'] * 20)
+        self.assertEqual(report['bytes'], os.path.getsize(output_file))
+        self.assertEqual(report['lines'], 21)
+        self.assertEqual(report['loops'], {'r': 20})
+
+    def test_errors_and_budgets_raise_together(self):
+        """Test all errors and exceeded limits are raised in one ValueError."""
+        with self.assertRaises(ValueError) as context:
+            validate_template(self.template_file, ROWS=1000, L=['x'])
+        message = str(context.exception)
+        self.assertIn("Missing constant for ID: ID", message)
+        self.assertIn("LOOPLIST 'L' length (1) does not match loop size (1000)", message)
+        with self.assertRaises(ValueError) as context:
+            validate_template(self.template_file, max_output_bytes=10, max_output_lines=100,
+                              ROWS=1000, L=['x'] * 1000)
+        message = str(context.exception)
+        self.assertIn("Missing constant for ID: ID", message)
+        self.assertIn("exceeds the limit of 10 bytes", message)
+        self.assertIn("Estimated output of 1001 lines exceeds the limit of 100 lines", message)
+
+
+class TestAsyncGeneration(TemplateFileTestCase):
+    """Test cases for agenerate_file and agenerate_file_and_return_content."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(set_async_concurrency, TemplateProcessorLibrary.DEFAULT_ASYNC_CONCURRENCY)
+
+    def test_agenerate_file(self):
+        """Test concurrent async generation writes every file and returns its content."""
+        async def generate():
+            timestamps = await asyncio.gather(*(
+                agenerate_file(self.path(f'Output_{index}.txt'), self.template_file, ID=str(index))
+                for index in range(20)
+            ))
+            content = await agenerate_file_and_return_content(self.path('Content.txt'), self.template_file, ID='c')
+            return timestamps, content
+
+        timestamps, (content, now) = asyncio.run(generate())
+        self.assertTrue(all(isinstance(timestamp, datetime.datetime) for timestamp in timestamps))
+        for index in range(20):
+            with open(self.path(f'Output_{index}.txt'), encoding='utf-8') as output:
+                self.assertEqual(output.read(), f"ID: {index}")
+        self.assertEqual(content, "ID: c")
+        self.assertIsInstance(now, datetime.datetime)
+
+    def test_concurrency_limit(self):
+        """Test no more than the configured number of generations run at once."""
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def slow_generate(*args, **kwargs):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        async def generate():
+            await asyncio.gather(*(agenerate_file(self.path('Output.txt'), self.template_file) for _ in range(10)))
+
+        set_async_concurrency(2)
+        with patch.object(TemplateProcessorLibrary, 'generate_file', slow_generate):
+            asyncio.run(generate())
+        self.assertEqual(peak[0], 2)
+        with self.assertRaises(ValueError):
+            set_async_concurrency(0)
+
+    def test_errors_propagate(self):
+        """Test errors raised on the executor reach the awaiting coroutine."""
+        with self.assertRaises(FileNotFoundError):
+            asyncio.run(agenerate_file(self.path('Output.txt'), self.path('Missing.txt')))
+
+
+class TestLibraryClass(TemplateFileTestCase):
+    """Test cases for the TemplateProcessorLibrary class."""
+
+    def setUp(self):
+        super().setUp()
+        self.write_template("ID: %%%CONSTANT@ID%%% %%%INC@1@1%%%")
+
+    def read(self, name):
+        with open(self.path(name), encoding='utf-8') as output:
+            return output.read()
+
+    def test_scopes_and_keywords(self):
+        """Test scope variants and that every module keyword is offered by the class."""
+        self.assertEqual(LibraryClass.ROBOT_LIBRARY_SCOPE, 'GLOBAL')
+        self.assertEqual(TemplateProcessorLibrarySuiteScope.ROBOT_LIBRARY_SCOPE, 'SUITE')
+        self.assertEqual(TemplateProcessorLibraryTestScope.ROBOT_LIBRARY_SCOPE, 'TEST')
+        library = LibraryClass()
+        keywords = [name for name, value in vars(TemplateProcessorLibrary).items()
+                    if callable(value) and not name.startswith('_') and value.__module__ == 'TemplateProcessorLibrary'
+                    and not isinstance(value, type)]
+        self.assertIn('generate_file', keywords)
+        for name in keywords:
+            self.assertTrue(callable(getattr(library, name)), name)
+
+    def test_counters_restart_by_default(self):
+        """Test INC starts from its base in every call without persistent_inc."""
+        library = LibraryClass()
+        library.generate_file(self.path('A.txt'), self.template_file, ID='a')
+        content, _ = library.generate_file_and_return_content(self.path('B.txt'), self.template_file, ID='b')
+        self.assertEqual(self.read('A.txt'), "ID: a 1.0")
+        self.assertEqual(content, "ID: b 1.0")
+
+    def test_persistent_inc(self):
+        """Test INC continues across calls, survives failing calls and can be reset."""
+        library = LibraryClass(persistent_inc=True)
+        library.generate_file(self.path('A.txt'), self.template_file, ID='a')
+        with self.assertRaises(ValueError):
+            library.generate_file(self.path('A.txt'), self.template_file)
+        content, _ = library.generate_file_and_return_content(self.path('B.txt'), self.template_file, ID='b')
+        self.assertEqual(self.read('A.txt'), "ID: a 1.0")
+        self.assertEqual(content, "ID: b 2.0")
+        self.assertEqual(LibraryClass().generate_file_and_return_content(
+            self.path('C.txt'), self.template_file, ID='c')[0], "ID: c 1.0")
+        library.reset_inc_counters()
+        self.assertEqual(library.generate_file_and_return_content(
+            self.path('C.txt'), self.template_file, ID='c')[0], "ID: c 1.0")
+        self.assertEqual(library.render_template(self.template_file, ID='d'), "ID: d 2.0")
+
+    def test_threads_share_persistent_counters(self):
+        """Test concurrent calls hand out every persistent INC value exactly once."""
+        library = LibraryClass(persistent_inc=True)
+        results = []
+
+        def generate(index):
+            results.append(library.generate_file_and_return_content(
+                self.path(f'Output_{index}.txt'), self.template_file, ID='x')[0])
+
+        threads = [threading.Thread(target=generate, args=(index,)) for index in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), sorted(f"ID: x {value}.0" for value in range(1, 21)))
+
+    def test_persistent_counter_renders_overlap(self):
+        """Test calls sharing persistent counters render at the same time."""
+        library = LibraryClass(persistent_inc=True)
+        barrier = threading.Barrier(2, timeout=5)
+        results, errors = [], []
+
+        class Rendezvous:
+            """Value whose text is only produced once both renders have reached it."""
+
+            def __str__(self):
+                barrier.wait()
+                return 'x'
+
+        def generate(index):
+            try:
+                results.append(library.generate_file_and_return_content(
+                    self.path(f'Output_{index}.txt'), self.template_file, ID=Rendezvous())[0])
+            except threading.BrokenBarrierError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=generate, args=(index,)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(results), ["ID: x 1.0", "ID: x 2.0"])
+
+    def test_async_methods_use_instance_counters(self):
+        """Test async methods continue the instance's INC counters."""
+        library = LibraryClass(persistent_inc=True)
+
+        async def generate():
+            await library.agenerate_file(self.path('A.txt'), self.template_file, ID='a')
+            return await library.agenerate_file_and_return_content(self.path('B.txt'), self.template_file, ID='b')
+
+        self.assertEqual(asyncio.run(generate())[0], "ID: b 2.0")
+
+    def test_async_methods_need_robot_6_1(self):
+        """Test async keywords are only offered to Robot Framework versions that run them."""
+        for version, expected in (('4.1.3', False), ('6.0.2', False), ('6.1', True), ('6.1a1', True),
+                                  ('7.0rc2', True), ('10.0', True), (None, True)):
+            self.assertEqual(TemplateProcessorLibrary._robot_runs_async(version), expected, version)
+        hidden = not TemplateProcessorLibrary._robot_runs_async(TemplateProcessorLibrary._ROBOT_VERSION)
+        self.assertEqual(getattr(LibraryClass.agenerate_file, 'robot_not_keyword', False), hidden)
+
+
+class TestGenerateFiles(TemplateFileTestCase):
+    """Test cases for generate_files batch keyword."""
+
+    def setUp(self):
+        super().setUp()
+        clear_template_cache()
+        self.addCleanup(clear_template_cache)
+        self.write_template("ID: %%%CONSTANT@ID%%% %%%INC@1@1%%%\n%%%LOOP@ITEMS@i%%%\n%%%i.VALUE%%%\n%%%LOOP@END@i%%%\n")
+
+    def jobs(self, count):
+        return [(self.path(f'out/File_{index}.txt'), {'ID': f'c{index}', 'ITEMS': [index, index + 1]})
+                for index in range(count)]
+
+    def assert_files_generated(self, jobs):
+        for output_file, parameters in jobs:
+            with open(output_file, encoding='utf-8') as output:
+                index = parameters['ITEMS'][0]
+                self.assertEqual(output.read(), f"ID: c{index} 1.0\n{index}\n{index + 1}\n")
+
+    def test_generate_files_with_threads(self):
+        """Test each job gets its own file, INC state and timestamp, template parsed once."""
+        jobs = self.jobs(20)
+        timestamps = generate_files(self.template_file, jobs, workers=4)
+        self.assertEqual(len(timestamps), 20)
+        self.assertTrue(all(isinstance(now, datetime.datetime) for now in timestamps))
+        self.assert_files_generated(jobs)
+        self.assertEqual(get_template_cache_stats()['misses'], 1)
+
+    def test_generate_files_with_processes(self):
+        """Test process pool generates the same files."""
+        jobs = self.jobs(5)
+        self.assertEqual(len(generate_files(self.template_file, jobs, workers='2', executor='process')), 5)
+        self.assert_files_generated(jobs)
+
+    def test_process_jobs_keep_processor_options(self):
+        """Test pool processes render with the caller's profiling setting and report their stats."""
+        self.addCleanup(setattr, TemplateProcessorLibrary, '_LAST_RENDER_STATS', None)
+        self.addCleanup(set_render_profiling, False)
+        set_render_profiling(True)
+        generate_files(self.template_file, self.jobs(2), workers=2, executor='process')
+        self.assertEqual(get_last_render_stats()['loops'], {'i': 2})
+
+    def test_generate_files_errors(self):
+        """Test invalid jobs, executor and failing renders raise ValueError."""
+        with self.assertRaises(ValueError):
+            generate_files(self.template_file, [(self.path('Output.txt'),)])
+        with self.assertRaises(ValueError):
+            generate_files(self.template_file, self.jobs(1), executor='fiber')
+        with self.assertRaises(ValueError) as context:
+            generate_files(self.template_file, [(self.path('Output.txt'), {'ITEMS': 1})])
+        self.assertIn("Missing constant for ID: ID", str(context.exception))
+        with self.assertRaises(FileNotFoundError):
+            generate_files(self.path('Missing.txt'), self.jobs(1))
+
+
+if __name__ == '__main__':
+    unittest.main()